@@ -1,6 +1,15 @@
 from oemof.solph import Flow, Transformer, sequence, NonConvex
+from oemof.solph.blocks import Transformer as TransformerBlock
 from oemof.solph.components import GenericStorage
 from oemoflex.facades import TYPEMAP, Facade
+from pyomo.core import (
+    Constraint,
+    Expression,
+    NonNegativeIntegers,
+    NonNegativeReals,
+    Set,
+    Var,
+)
 
 
 class GenericStorage(GenericStorage):
@@ -93,6 +102,36 @@ class MethanationReactor(Transformer, Facade):
     MIX_RATIO_H2 = 1
     MIN_FLOW = 0.2
 
+    # Parameters of the flow from the reactor to the products storage per methanation option.
+    # The nominal value is the methanation rate unless it is given. Classes (e.g. NonConvex) are
+    # instantiated per flow. Only the flow of the selected option is built.
+    METHANATION_OPTIONS = {
+        # 0. No constraints on methanation
+        "no_constraints": {"nominal_value": None},
+        # 1. Fixed methanation rate
+        "fixed_rate": {"fix": 1},
+        # 2. Methanation rate can be optimized
+        "variable_rate": {},
+        # 3. Methanation rate can be optimized and has a "minimum load".
+        "variable_rate_with_min": {"min": 0.5, "nonconvex": NonConvex},
+        # 4. Methanation rate can be optimized,
+        # has a "minimum load" and constraints on ramping up and down
+        "variable_rate_with_min_and_ramping": {
+            "min": 0.1,
+            "positive_gradient": {"ub": 0.01},
+            "negative_gradient": {"ub": 0.01},
+        },
+        # 5. Methanation rate can be optimized
+        # and has constraints on ramping up and down
+        "variable_rate_with_ramping": {
+            "positive_gradient": {"ub": 0.01},
+            "negative_gradient": {"ub": 0.05},
+        },
+        # 6. Methanation rate depends on available educts but is constrained by active
+        # reactor volume.
+        # TODO: Linear dependency on storage level (via extra constraint?)
+    }
+
     def __init__(self, *args, **kwargs):
 
         kwargs.update(
@@ -138,6 +177,26 @@ class MethanationReactor(Transformer, Facade):
 
         self.build_solph_components()
 
+    def build_methanation_flow(self):
+        r"""Returns the flow from the reactor to the products storage of the methanation option."""
+        if self.methanation_option not in self.METHANATION_OPTIONS:
+            raise ValueError(
+                f"Methanation option '{self.methanation_option}' is not valid. Choose one of "
+                f"{list(self.METHANATION_OPTIONS)}."
+            )
+
+        parameters = {
+            "nominal_value": self.methanation_rate,
+            **self.METHANATION_OPTIONS[self.methanation_option],
+        }
+
+        return Flow(
+            **{
+                key: value() if isinstance(value, type) else value
+                for key, value in parameters.items()
+            }
+        )
+
     def build_solph_components(self):
 
         if self.expandable:
@@ -145,6 +204,8 @@ class MethanationReactor(Transformer, Facade):
                 "Investment for methanation class is not implemented."
             )
 
+        methanation_flow = self.build_methanation_flow()
+
         storage_educts = GenericStorage(
             carrier=self.carrier,
             tech=self.tech,
@@ -197,7 +258,7 @@ class MethanationReactor(Transformer, Facade):
                 self.ch4_bus: Flow(
                     nominal_value=self.capacity_discharge,
                     variable_cost=self.marginal_cost,
-                    **self.output_parameters
+                    **self.output_parameters,
                 )
             },
             outflow_conversion_factor=self.efficiency_discharge,
@@ -206,64 +267,302 @@ class MethanationReactor(Transformer, Facade):
 
         self.inputs.update({storage_educts: Flow()})
 
-        methanation_implementation = {}
-        # 0. No constraints on methanation
-        methanation_implementation["no_constraints"] = {storage_products: Flow()}
-        # 1. Fixed methanation rate
-        methanation_implementation["fixed_rate"] = {
-            storage_products: Flow(
-                fixed=True,
-                fix=sequence(1),
-                nominal_value=self.methanation_rate,
+        self.outputs.update({storage_products: methanation_flow})
+
+        self.conversion_factors = {
+            storage_educts: sequence(1),
+            storage_products: sequence(self.efficiency_methanation),
+        }
+
+        self.subnodes = (combine_educts, storage_educts, storage_products)
+
+
+def _scale(value, factor):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value * factor
+    return [v * factor for v in value]
+
+
+class MethanationReactorFleet(MethanationReactor):
+    r"""A fleet of identical methanation reactors.
+
+    The fleet is modelled like a single :class:`MethanationReactor`, whose capacities are the
+    capacities of a unit multiplied by the number of units. Instead of the binary status of the
+    nonconvex flows (option `nonconvex` or methanation option `variable_rate_with_min`), the
+    number of units that are on is an integer variable per flow and timestep, so that the number
+    of integer variables does not grow with the number of units.
+
+    The flows are aggregated exactly: the flow of the fleet is bounded by the minimum and the
+    maximum load of the units that are on. The storages of the units are pooled and the idle
+    time is set for the fleet as a whole, which relaxes the constraints of the individual units.
+    Thus every solution of the individual units is a solution of the fleet with the same costs,
+    and the objective of the fleet is lower than or equal to the objective of the individual
+    units. Both are equal if the storages of the units are operated alike.
+
+    Startup, shutdown and activity costs of the nonconvex flows are carried over and apply per
+    unit. Minimum up- and downtimes, maximum numbers of startups and shutdowns and gradients of
+    nonconvex flows are not supported.
+
+    Parameters
+    ----------
+    units : int
+        Number of identical units. Capacities, storage capacities and the methanation rate are
+        given per unit.
+
+    Further parameters as :class:`MethanationReactor`.
+
+    Examples
+    --------
+    >>> from oemof import solph
+    >>> from oemof_b3 import facades
+    >>> bus_h2 = solph.Bus('h2')
+    >>> bus_co2 = solph.Bus('hco2')
+    >>> bus_ch4 = solph.Bus('ch4')
+    >>> fleet = MethanationReactorFleet(
+    ...     name='fleet',
+    ...     carrier='h2_co2',
+    ...     tech='methanation_reactor',
+    ...     h2_bus=bus_h2,
+    ...     co2_bus=bus_co2,
+    ...     ch4_bus=bus_ch4,
+    ...     units=10,
+    ...     capacity_charge=5,
+    ...     capacity_discharge=5,
+    ...     storage_capacity_educts=10,
+    ...     storage_capacity_products=100,
+    ...     methanation_rate=0.5,
+    ...     efficiency_methanation=0.93,
+    ...     methanation_option='variable_rate',
+    ...     nonconvex=True,
+    ...     )
+    >>> fleet.capacity_charge
+    50
+    """
+    SCALED = [
+        "capacity_charge",
+        "capacity_discharge",
+        "storage_capacity_educts",
+        "storage_capacity_products",
+        "methanation_rate",
+    ]
+
+    # attributes of NonConvex that are not supported for the number of units that are on
+    UNSUPPORTED_NONCONVEX = [
+        "minimum_uptime",
+        "minimum_downtime",
+        "maximum_startups",
+        "maximum_shutdowns",
+    ]
+
+    def __init__(self, *args, **kwargs):
+        # needed when the components are built by MethanationReactor.__init__
+        self.units = int(kwargs.get("units", 1))
+
+        super().__init__(*args, **kwargs)
+
+    def build_solph_components(self):
+
+        for attr in self.SCALED:
+            setattr(self, attr, _scale(getattr(self, attr), self.units))
+
+        super().build_solph_components()
+
+        # the minimum load and the costs of nonconvex flows are set per unit in
+        # MethanationReactorFleetBlock
+        self.unit_flows = []
+        for node in (self,) + self.subnodes:
+            for target, flow in node.outputs.items():
+                if flow.nonconvex is not None:
+                    self._check_nonconvex(flow.nonconvex, node, target)
+                    self.unit_flows.append((node, target, flow.min, flow.nonconvex))
+                    flow.nonconvex = None
+                    flow.min = sequence(0)
+
+    def _check_nonconvex(self, nonconvex, node, target):
+        unsupported = [
+            attr
+            for attr in self.UNSUPPORTED_NONCONVEX
+            if getattr(nonconvex, attr, None) is not None
+        ] + [
+            gradient
+            for gradient in ["positive_gradient", "negative_gradient"]
+            if getattr(nonconvex, gradient)["ub"][0] is not None
+        ]
+        if unsupported:
+            raise NotImplementedError(
+                f"The attributes {unsupported} of the nonconvex flow from '{node.label}' to "
+                f"'{target.label}' are not supported by {type(self).__name__}."
             )
+
+    def constraint_group(self):
+        return MethanationReactorFleetBlock
+
+
+class MethanationReactorFleetBlock(TransformerBlock):
+    r"""Block for the number of units that are on in :class:`MethanationReactorFleet`.
+
+    Besides the relation of inputs and outputs of the Transformer, the following variables and
+    constraints are created:
+
+    **Variables:**
+
+    .. math:: N_{on}(i, o, t) \in \{0, ..., N\}
+
+    .. math:: N_{up}(i, o, t), N_{down}(i, o, t) \ge 0
+
+    (for flows with startup or shutdown costs)
+
+    **Constraints:**
+
+    .. math::
+        N_{on}(i, o, t) \cdot \frac{P_{nom}}{N} \cdot f_{min}(t) \le flow(i, o, t)
+        \le N_{on}(i, o, t) \cdot \frac{P_{nom}}{N} \cdot f_{max}(t)
+
+    .. math::
+        N_{up}(i, o, t) \ge N_{on}(i, o, t) - N_{on}(i, o, t - 1)
+
+        N_{down}(i, o, t) \ge N_{on}(i, o, t - 1) - N_{on}(i, o, t)
+
+    with :math:`N` units of the fleet and the nominal value :math:`P_{nom}` of the fleet.
+    :math:`N_{on}(i, o, -1)` is the initial status of the nonconvex flow times :math:`N`.
+
+    **The following parts of the objective function are created:**
+
+    .. math::
+        \sum_{t} N_{up}(i, o, t) \cdot c_{startup}(t)
+        + N_{down}(i, o, t) \cdot c_{shutdown}(t)
+        + N_{on}(i, o, t) \cdot c_{activity}(t)
+    """
+    CONSTRAINT_GROUP = True
+
+    def _create(self, group=None):
+        if group is None:
+            return None
+
+        super()._create(group)
+
+        m = self.parent_block()
+
+        unit_flows = {
+            (i, o): (n.units, minimum, nonconvex)
+            for n in group
+            for i, o, minimum, nonconvex in n.unit_flows
         }
-        # 2. Methanation rate can be optimized
-        methanation_implementation["variable_rate"] = {
-            storage_products: Flow(nominal_value=self.methanation_rate)
+
+        self.UNIT_FLOWS = Set(initialize=list(unit_flows), ordered=True, dimen=2)
+
+        self.units = {(i, o): units for (i, o), (units, _, _) in unit_flows.items()}
+
+        self.nonconvex = {
+            (i, o): nonconvex for (i, o), (_, _, nonconvex) in unit_flows.items()
         }
-        # 3. Methanation rate can be optimized and has a "minimum load".
-        methanation_implementation["variable_rate_with_min"] = {
-            storage_products: Flow(
-                nominal_value=self.methanation_rate,
-                min=0.5,
-                nonconvex=NonConvex(),
+
+        self.units_on = Var(
+            self.UNIT_FLOWS,
+            m.TIMESTEPS,
+            within=NonNegativeIntegers,
+            bounds=lambda block, i, o, t: (0, self.units[i, o]),
+        )
+
+        def _unit_capacity(i, o):
+            return m.flows[i, o].nominal_value / self.units[i, o]
+
+        def _min_rule(block, i, o, t):
+            minimum = unit_flows[i, o][1][t]
+            return (
+                m.flow[i, o, t]
+                >= self.units_on[i, o, t] * _unit_capacity(i, o) * minimum
             )
-        }
-        # 4. Methanation rate can be optimized,
-        # has a "minimum load" and constraints on ramping up and down
-        methanation_implementation["variable_rate_with_min_and_ramping"] = {
-            storage_products: Flow(
-                nominal_value=self.methanation_rate,
-                min=0.1,
-                positive_gradient={"ub": 0.01},
-                negative_gradient={"ub": 0.01},
+
+        self.min = Constraint(self.UNIT_FLOWS, m.TIMESTEPS, rule=_min_rule)
+
+        def _max_rule(block, i, o, t):
+            maximum = m.flows[i, o].max[t]
+            return (
+                m.flow[i, o, t]
+                <= self.units_on[i, o, t] * _unit_capacity(i, o) * maximum
             )
-        }
-        # 5. Methanation rate can be optimized
-        # and has constraints on ramping up and down
-        methanation_implementation["variable_rate_with_ramping"] = {
-            storage_products: Flow(
-                nominal_value=self.methanation_rate,
-                positive_gradient={"ub": 0.01},
-                negative_gradient={"ub": 0.05},
+
+        self.max = Constraint(self.UNIT_FLOWS, m.TIMESTEPS, rule=_max_rule)
+
+        self.STARTUP_FLOWS = Set(
+            initialize=[
+                flow for flow in unit_flows if self._costs(flow, "startup_costs")
+            ],
+            ordered=True,
+            dimen=2,
+        )
+
+        self.SHUTDOWN_FLOWS = Set(
+            initialize=[
+                flow for flow in unit_flows if self._costs(flow, "shutdown_costs")
+            ],
+            ordered=True,
+            dimen=2,
+        )
+
+        self.startup = Var(self.STARTUP_FLOWS, m.TIMESTEPS, within=NonNegativeReals)
+
+        self.shutdown = Var(self.SHUTDOWN_FLOWS, m.TIMESTEPS, within=NonNegativeReals)
+
+        def _previous_units_on(i, o, t):
+            if t > m.TIMESTEPS[1]:
+                return self.units_on[i, o, t - 1]
+            return self.nonconvex[i, o].initial_status * self.units[i, o]
+
+        def _startup_rule(block, i, o, t):
+            return self.startup[i, o, t] >= self.units_on[i, o, t] - _previous_units_on(
+                i, o, t
             )
-        }
-        # 6. Methanation rate depends on available educts but is constrained by active
-        # reactor volume.
-        # TODO: Linear dependency on storage level (via extra constraint?)
 
-        self.outputs.update(methanation_implementation[self.methanation_option])
+        self.startup_constr = Constraint(
+            self.STARTUP_FLOWS, m.TIMESTEPS, rule=_startup_rule
+        )
 
-        self.conversion_factors = {
-            storage_educts: sequence(1),
-            storage_products: sequence(self.efficiency_methanation),
-        }
+        def _shutdown_rule(block, i, o, t):
+            return (
+                self.shutdown[i, o, t]
+                >= _previous_units_on(i, o, t) - self.units_on[i, o, t]
+            )
 
-        self.subnodes = (combine_educts, storage_educts, storage_products)
+        self.shutdown_constr = Constraint(
+            self.SHUTDOWN_FLOWS, m.TIMESTEPS, rule=_shutdown_rule
+        )
+
+    def _costs(self, flow, name):
+        r"""Returns the costs `name` of the nonconvex flow or None if they are not set."""
+        costs = getattr(self.nonconvex[flow], name)
+        return None if costs[0] is None else costs
+
+    def _objective_expression(self):
+        r"""Objective expression for the startups, shutdowns and activity of the units."""
+        if not hasattr(self, "UNIT_FLOWS"):
+            return 0
+
+        m = self.parent_block()
+
+        costs = 0
+        for name, var, flows in [
+            ("startup_costs", self.startup, self.STARTUP_FLOWS),
+            ("shutdown_costs", self.shutdown, self.SHUTDOWN_FLOWS),
+            ("activity_costs", self.units_on, self.UNIT_FLOWS),
+        ]:
+            for i, o in flows:
+                flow_costs = self._costs((i, o), name)
+                if flow_costs is None:
+                    continue
+                costs += sum(var[i, o, t] * flow_costs[t] for t in m.TIMESTEPS)
+
+        self.costs = Expression(expr=costs)
+
+        return costs
 
 
 TYPEMAP.update(
     {
         "methanation_reactor": MethanationReactor,
+        "methanation_reactor_fleet": MethanationReactorFleet,
     }
 )
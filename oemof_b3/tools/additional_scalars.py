@@ -0,0 +1,321 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module computes the additional scalars that are not part of the datapackage but are used to
+add constraints in `optimize`:
+
+* the emission limit,
+* the electricity/gas relations and
+* the output parameters of backpressure CHPs.
+
+The scalars of all scenarios are filtered into one frame with a column 'scenario' and computed in
+single frame operations. The result is saved in a typed structure (json), which `optimize` reads
+without parsing strings:
+
+.. code-block:: json
+
+    {
+        "emission_limit": 1.5e9,
+        "el_gas_relations": [{"carrier": "heat_central", "region": "B", "factor": 1.0}],
+        "bpchp_output_parameters": {"B-ch4-bpchp": {"gas-heat_central-B": true}}
+    }
+"""
+import ast
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from oemof_b3.tools.data_processing import (
+    load_b3_scalars,
+    load_json,
+    save_json,
+    update_filtered_df,
+)
+
+logger = logging.getLogger(__name__)
+
+EMISSION_VARS = ["emissions_1990", "emissions_not_modeled", "emission_reduction_factor"]
+
+EMISSION_LIMIT = "emission_limit"
+
+EL_GAS_RELATIONS = "el_gas_relations"
+
+BPCHP_OUTPUT_PARAMETERS = "bpchp_output_parameters"
+
+
+def calculate_emission_limit(
+    emissions_1990, emissions_not_modeled, emission_reduction_factor
+):
+    """Calculates the emission limit.
+    Emission limit is calculated by
+    emissions_1990 * (1 - emission_reduction_factor) - emissions_not_modeled
+
+    Works element-wise on scalars as well as on pd.Series of several scenarios."""
+
+    return emissions_1990 * (1 - emission_reduction_factor) - emissions_not_modeled
+
+
+def _parse_dict(value):
+    r"""Parses a dict given as string, e.g. '{"gas-heat_central-B": True}'. Returns an empty
+    dict for values that do not describe a dict, e.g. 'None'."""
+    if isinstance(value, dict):
+        return value
+
+    try:
+        parsed = ast.literal_eval(str(value))
+    except (ValueError, SyntaxError):
+        return {}
+
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _to_builtin(value):
+    r"""Converts numpy scalars to python types to be serializable as json."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def filter_additional_scalars(
+    scalars,
+    scenario_filters,
+    el_gas_relation="electricity_gas_relation",
+    emission="emission",
+):
+    r"""
+    Selects the additional scalars and filters them for each scenario.
+
+    Parameters
+    ----------
+    scalars : pd.DataFrame
+        Scalars in oemof-b3 format
+    scenario_filters : dict
+        Filters (as passed to `update_filtered_df`) per scenario name
+    el_gas_relation : str
+        'var_name' of electricity/gas relations
+    emission : str
+        'carrier' of the scalars to calculate the emission limit
+
+    Returns
+    -------
+    filtered : pd.DataFrame
+        Filtered additional scalars of all scenarios with additional column 'scenario'
+    """
+    selected = scalars.loc[
+        (scalars.var_name == el_gas_relation)
+        | (scalars.carrier == emission)
+        # `output_parameters` of backpressure components are not taken into consideration in
+        # oemof.tabular so far. They are added to the components' output flow towards the heat
+        # bus in script `optimize.py`.
+        | ((scalars.tech == "bpchp") & (scalars.var_name == "output_parameters"))
+    ]
+
+    filtered = pd.concat(
+        {
+            scenario: update_filtered_df(selected, filters)
+            for scenario, filters in scenario_filters.items()
+        },
+        names=["scenario"],
+    )
+
+    return filtered.reset_index(level="scenario")
+
+
+def calculate_additional_scalars(
+    filtered,
+    el_gas_relation="electricity_gas_relation",
+    emission="emission",
+):
+    r"""
+    Computes emission limits, electricity/gas relations and output parameters of backpressure
+    CHPs of all scenarios in `filtered`.
+
+    Parameters
+    ----------
+    filtered : pd.DataFrame
+        Filtered additional scalars with column 'scenario' as returned by
+        `filter_additional_scalars`
+    el_gas_relation : str
+        'var_name' of electricity/gas relations
+    emission : str
+        'carrier' of the scalars to calculate the emission limit
+
+    Returns
+    -------
+    additional_scalars : dict
+        Typed additional scalars per scenario
+    """
+    scenarios = filtered["scenario"].drop_duplicates()
+
+    value = pd.to_numeric(filtered["var_value"], errors="coerce")
+
+    # emission limit: one row per scenario, one column per variable
+    emissions = (
+        filtered.assign(var_value=value)
+        .loc[filtered.carrier == emission]
+        .pivot_table(
+            index="scenario", columns="var_name", values="var_value", aggfunc="first"
+        )
+        .reindex(index=scenarios, columns=EMISSION_VARS)
+    )
+
+    emission_limit = calculate_emission_limit(
+        *(emissions[var_name] for var_name in EMISSION_VARS)
+    )
+
+    # electricity/gas relations that are not None
+    relations = filtered.assign(factor=value).loc[
+        (filtered.var_name == el_gas_relation) & value.notna(),
+        ["scenario", "carrier", "region", "factor"],
+    ]
+
+    # output parameters of backpressure CHPs that are not empty
+    bpchp_out = filtered.loc[
+        (filtered.tech == "bpchp") & (filtered.var_name == "output_parameters")
+    ]
+    bpchp_out = bpchp_out.assign(parameters=bpchp_out.var_value.map(_parse_dict))
+    bpchp_out = bpchp_out.loc[bpchp_out.parameters.astype(bool)]
+
+    grouped_relations = dict(tuple(relations.groupby("scenario")))
+    grouped_bpchp_out = dict(tuple(bpchp_out.groupby("scenario")))
+
+    additional_scalars = {}
+    for scenario in scenarios:
+        limit = emission_limit.get(scenario)
+
+        scenario_relations = grouped_relations.get(scenario, relations.iloc[:0])
+        scenario_bpchp_out = grouped_bpchp_out.get(scenario, bpchp_out.iloc[:0])
+
+        additional_scalars[scenario] = {
+            EMISSION_LIMIT: None if pd.isna(limit) else float(limit),
+            EL_GAS_RELATIONS: [
+                {key: _to_builtin(val) for key, val in relation.items()}
+                for relation in scenario_relations.drop(columns="scenario").to_dict(
+                    "records"
+                )
+            ],
+            BPCHP_OUTPUT_PARAMETERS: {
+                name: {key: _to_builtin(val) for key, val in parameters.items()}
+                for name, parameters in zip(
+                    scenario_bpchp_out["name"], scenario_bpchp_out["parameters"]
+                )
+            },
+        }
+
+    return additional_scalars
+
+
+def to_b3_scalars(filtered, additional_scalars):
+    r"""
+    Returns the filtered additional scalars of one scenario with the emission limit as additional
+    row in oemof-b3 format.
+
+    Parameters
+    ----------
+    filtered : pd.DataFrame
+        Filtered additional scalars of one scenario
+    additional_scalars : dict
+        Typed additional scalars of the scenario
+
+    Returns
+    -------
+    add_scalars : pd.DataFrame
+    """
+    emission_limit_df = pd.DataFrame(
+        {
+            "var_name": EMISSION_LIMIT,
+            "var_value": additional_scalars[EMISSION_LIMIT],
+            "carrier": "emission",
+            "var_unit": "kg_CO2_eq",
+            "scenario_key": "ALL",
+        },
+        index=[0],
+    )
+
+    add_scalars = pd.concat(
+        [filtered.drop(columns="scenario", errors="ignore"), emission_limit_df],
+        sort=False,
+    )
+    add_scalars.reset_index(inplace=True, drop=True)
+    add_scalars.index.name = "id_scal"
+
+    return add_scalars
+
+
+def save_additional_scalars(additional_scalars, path):
+    r"""Saves the typed additional scalars of one scenario to `path` (json)."""
+    save_json(additional_scalars, path)
+
+
+def _default_additional_scalars():
+    return {
+        EMISSION_LIMIT: None,
+        EL_GAS_RELATIONS: [],
+        BPCHP_OUTPUT_PARAMETERS: {},
+    }
+
+
+def read_legacy_additional_scalars(
+    path, el_gas_relation="electricity_gas_relation", emission="emission"
+):
+    r"""
+    Reads the additional scalars of one scenario from the csv file in oemof-b3 format saved by
+    `build_datapackage` before the typed structure was introduced (see :func:`to_b3_scalars`).
+
+    Returns
+    -------
+    additional_scalars : dict
+        Typed additional scalars
+    """
+    scalars = load_b3_scalars(path)
+
+    additional_scalars = _default_additional_scalars()
+    additional_scalars.update(
+        calculate_additional_scalars(
+            scalars.assign(scenario=0), el_gas_relation, emission
+        ).get(0, {})
+    )
+
+    # the emission limit is saved as row of its own
+    limit = pd.to_numeric(
+        scalars.loc[scalars.var_name == EMISSION_LIMIT, "var_value"], errors="coerce"
+    ).dropna()
+    additional_scalars[EMISSION_LIMIT] = None if limit.empty else float(limit.iloc[0])
+
+    return additional_scalars
+
+
+def load_additional_scalars(path, legacy_path=None, **kwargs):
+    r"""
+    Loads the typed additional scalars of one scenario from `path`.
+
+    If the file does not exist, the additional scalars are read from the csv file in
+    `legacy_path` of datapackages built before the typed structure was introduced (see
+    :func:`read_legacy_additional_scalars`, which `kwargs` are passed to).
+
+    Returns
+    -------
+    additional_scalars : dict
+        Typed additional scalars
+
+    Raises
+    ------
+    FileNotFoundError
+        If neither `path` nor `legacy_path` exist
+    """
+    if not os.path.exists(path):
+        if legacy_path is not None and os.path.exists(legacy_path):
+            logger.warning(
+                f"No typed additional scalars in '{path}'. Reading them from '{legacy_path}'."
+            )
+            return read_legacy_additional_scalars(legacy_path, **kwargs)
+
+        raise FileNotFoundError(f"No additional scalars found in '{path}'.")
+
+    additional_scalars = _default_additional_scalars()
+    additional_scalars.update(load_json(path))
+
+    return additional_scalars
@@ -17,6 +17,7 @@ filtering, sorting, merging, aggregating and saving.
 
 import os
 import ast
+import json
 import pandas as pd
 import numpy as np
 
@@ -260,6 +261,45 @@ def save_df(df, path):
     print(f"User info: The DataFrame has been saved to: {path}.")
 
 
+def load_json(path):
+    """
+    This function loads data from a json file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the json file
+
+    Returns
+    -------
+    data : dict or list
+        Data of the json file
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(data, path):
+    """
+    This function saves data as json. The file is written to a temporary file first and moved
+    afterwards, so that parallel jobs never read a half-written file.
+
+    Parameters
+    ----------
+    data : dict or list
+        Data to be saved
+
+    path : str
+        Path to save the json file
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+    os.replace(tmp_path, path)
+
+
 def filter_df(df, column_name, values, inverse=False):
     """
     This function filters a DataFrame.
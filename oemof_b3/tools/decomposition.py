@@ -0,0 +1,738 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module optimizes an oemof.solph EnergySystem by temporal decomposition. The timeindex is
+split into blocks (e.g. weeks or months), whose models are built once and solved in parallel
+processes. The blocks are coupled by the storage levels at their boundaries: the storage content
+at the end of a block has to equal the initial content of the next block and, for balanced
+storages, the content at the end of the last block the initial content of the first block.
+
+The coupling is relaxed with Lagrange multipliers (prices of the storage hand-over), which are
+added to the objective of the blocks as mutable parameters. Each iteration
+
+1. solves the relaxed blocks. The sum of their objectives (or their lower bounds, if solved with
+   a gap) is a lower bound of the objective of the monolithic model.
+2. fixes the boundary storage levels to the mean of the levels the neighbouring blocks chose and
+   solves the blocks again. The sum of their costs is an upper bound, the results of the best
+   upper bound are kept.
+3. updates the multipliers by a subgradient step on the mismatch of the boundary levels.
+
+The iteration stops if the relative gap between the bounds is within the tolerance or after the
+maximal number of iterations.
+
+The status of nonconvex flows is coupled like the storage levels, but without prices: the
+status in the first timestep of the relaxed blocks is free, so that startups and shutdowns at
+the boundaries are not charged. For the upper bound, the status at the end of a block is fixed to
+the relaxed one and handed over as initial status of the next block. The idle time of the
+methanation reactor is kept conservatively in the upper bound by blocking the reactor output in
+the first idle timesteps of each block but the first.
+
+The emission budget is distributed over the blocks proportional to their weighted duration, so
+the bounds refer to the monolithic model with this restriction. Investment and nonconvex flows
+with minimum up- or downtimes, maximum numbers of startups or shutdowns and gradients are not
+supported.
+"""
+import logging
+import math
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+from oemof.solph import processing
+from oemof.solph.components import GenericStorage
+from pyomo import environ as po
+
+from oemof_b3.tools import results_extraction
+from oemof_b3.tools.rolling_horizon import (
+    _get_nonconvex,
+    _get_timeincrement,
+    assemble_results,
+    sliced,
+)
+from oemof_b3.tools.set_idle_time import get_status
+from oemof_b3.tools.solution_cache import results_from_labels, results_to_labels
+from oemof_b3.tools.solver_log import is_infeasible
+
+logger = logging.getLogger(__name__)
+
+# attributes of NonConvex whose constraints couple the timesteps of different blocks
+UNSUPPORTED_NONCONVEX = [
+    "minimum_uptime",
+    "minimum_downtime",
+    "maximum_startups",
+    "maximum_shutdowns",
+]
+
+# blocks with the status of nonconvex flows: name, status variable and the sets of flows with
+# startups and shutdowns, which depend on the initial status in the first timestep
+STATUS_BLOCKS = [
+    ("NonConvexFlow", "status", "STARTUPFLOWS", "SHUTDOWNFLOWS"),
+    ("MethanationReactorFleetBlock", "units_on", "STARTUP_FLOWS", "SHUTDOWN_FLOWS"),
+]
+
+
+def get_blocks(timeindex, period):
+    r"""
+    Returns the blocks of a temporal decomposition.
+
+    Parameters
+    ----------
+    timeindex : pd.DatetimeIndex
+        Timeindex of the EnergySystem
+    period : str or int
+        Pandas period alias, e.g. 'W' (weeks) or 'M' (months), or number of timesteps per block
+
+    Returns
+    -------
+    blocks : list of tuple
+        (start, stop) of each block
+    """
+    n_timesteps = len(timeindex)
+
+    if isinstance(period, int):
+        if period < 1:
+            raise ValueError(f"Period has to be at least 1 timestep, but is {period}.")
+        starts = list(range(0, n_timesteps, period))
+    else:
+        periods = pd.DatetimeIndex(timeindex).to_period(period)
+        starts = [0] + [
+            t for t in range(1, n_timesteps) if periods[t] != periods[t - 1]
+        ]
+
+    return list(zip(starts, starts[1:] + [n_timesteps]))
+
+
+def _lower_bound(meta_results):
+    r"""Returns the lower bound of the solver if it is finite, else the objective."""
+    bound = meta_results.get("problem", {}).get("Lower bound")
+    try:
+        bound = float(bound)
+    except (TypeError, ValueError):
+        bound = None
+
+    if bound is None or not math.isfinite(bound):
+        return meta_results["objective"]
+    return min(bound, meta_results["objective"])
+
+
+def _boundary_vars(model, storage):
+    r"""Returns the variables of the initial and the final content of `storage`."""
+    block = model.GenericStorageBlock
+    return (
+        block.init_content[storage],
+        block.storage_content[storage, model.TIMESTEPS[-1]],
+    )
+
+
+def add_boundary_prices(model, storages):
+    r"""
+    Adds the prices of the initial and the final content of `storages` as mutable parameters
+    `boundary_price_start` and `boundary_price_end` to the objective of `model`. The objective
+    without these prices is kept as expression `cost`.
+    """
+    model.cost = po.Expression(expr=model.objective.expr)
+
+    expr = model.cost
+    if storages:
+        model.boundary_price_start = po.Param(storages, mutable=True, initialize=0)
+        model.boundary_price_end = po.Param(storages, mutable=True, initialize=0)
+        for storage in storages:
+            start, end = _boundary_vars(model, storage)
+            expr += model.boundary_price_start[storage] * start
+            expr -= model.boundary_price_end[storage] * end
+
+    model.del_component(model.objective)
+    model.objective = po.Objective(sense=po.minimize, expr=expr)
+
+
+def add_boundary_status(model, first):
+    r"""
+    Returns the status variables of the nonconvex flows of `model` with startups or shutdowns.
+
+    Unless `model` is the `first` block, the startups and shutdowns in the first timestep are
+    constrained by the mutable parameter `boundary_status` (the status before the first
+    timestep) in the constraints `boundary_startup` and `boundary_shutdown` instead of the
+    initial status of the flows. Both constraints are deactivated, i.e. the status in the first
+    timestep is free.
+    """
+    t = model.TIMESTEPS.first()
+
+    blocks = []
+    statuses = {}
+    for name, status, startup_flows, shutdown_flows in STATUS_BLOCKS:
+        block = getattr(model, name, None)
+        if block is None or not hasattr(block, startup_flows):
+            continue
+        startup_flows = list(getattr(block, startup_flows))
+        shutdown_flows = list(getattr(block, shutdown_flows))
+        blocks.append((block, getattr(block, status), startup_flows, shutdown_flows))
+        for flow in startup_flows + shutdown_flows:
+            statuses[flow] = getattr(block, status)
+
+    if first or not statuses:
+        return statuses
+
+    model.boundary_status = po.Param(list(statuses), mutable=True, initialize=0)
+    model.boundary_startup = po.ConstraintList()
+    model.boundary_shutdown = po.ConstraintList()
+    for block, status, startup_flows, shutdown_flows in blocks:
+        for i, o in startup_flows:
+            block.startup_constr[i, o, t].deactivate()
+            model.boundary_startup.add(
+                block.startup[i, o, t] >= status[i, o, t] - model.boundary_status[i, o]
+            )
+        for i, o in shutdown_flows:
+            block.shutdown_constr[i, o, t].deactivate()
+            model.boundary_shutdown.add(
+                block.shutdown[i, o, t] >= model.boundary_status[i, o] - status[i, o, t]
+            )
+
+    model.boundary_startup.deactivate()
+    model.boundary_shutdown.deactivate()
+
+    return statuses
+
+
+class Subproblems:
+    r"""
+    Models of some blocks of a temporal decomposition, which are built once and re-solved with
+    prices or fixed levels of the boundary storage contents.
+
+    Parameters
+    ----------
+    es : oemof.solph.EnergySystem
+        The energy system
+    blocks : dict
+        (start, stop) per number of the block
+    create_model : callable
+        Returns the model of a block, signature create_model(es, emission_limit)
+    solve : callable
+        Solves the model of a block, signature solve(model, name)
+    emission_limits : dict
+        Emission limit per number of the block, None for no limit
+    """
+
+    def __init__(self, es, blocks, create_model, solve, emission_limits):
+        self.es = es
+        self.blocks = blocks
+        self.solve = solve
+
+        self.storages = [node for node in es.nodes if isinstance(node, GenericStorage)]
+        self.labels = {storage: storage.label for storage in self.storages}
+
+        self.models = {}
+        self.statuses = {}
+        self.pending = {}
+        self.best = {}
+
+        original = {
+            storage: (storage.initial_storage_level, storage.balanced)
+            for storage in self.storages
+        }
+        try:
+            for n, (start, stop) in blocks.items():
+                with sliced(es, start, stop):
+                    for storage in self.storages:
+                        storage.balanced = False
+                        if n > 0:
+                            storage.initial_storage_level = None
+
+                    model = create_model(es, emission_limits[n])
+                    add_boundary_prices(model, self.storages)
+                    statuses = add_boundary_status(model, first=n == 0)
+
+                self.models[n] = model
+                self.statuses[n] = {
+                    (i.label, o.label): status[i, o, model.TIMESTEPS.last()]
+                    for (i, o), status in statuses.items()
+                }
+        finally:
+            for storage, (initial, balanced) in original.items():
+                storage.initial_storage_level = initial
+                storage.balanced = balanced
+
+    def _boundaries(self, model):
+        values = {
+            self.labels[storage]: [
+                po.value(var) for var in _boundary_vars(model, storage)
+            ]
+            for storage in self.storages
+        }
+        return (
+            {label: start for label, (start, _) in values.items()},
+            {label: end for label, (_, end) in values.items()},
+        )
+
+    def _set_boundary_status(self, n, statuses=None):
+        r"""
+        Fixes the status at the end of block `n` and hands over the status before its first
+        timestep per flow label as given in `statuses` ("start", "end"), frees them if
+        `statuses` is None.
+        """
+        model = self.models[n]
+
+        for labels, var in self.statuses[n].items():
+            if statuses is not None and labels in statuses["end"]:
+                var.fix(statuses["end"][labels])
+            else:
+                var.unfix()
+
+        if hasattr(model, "boundary_status"):
+            for (i, o), param in model.boundary_status.items():
+                param.value = (
+                    0 if statuses is None else statuses["start"][i.label, o.label]
+                )
+            for constraint in [model.boundary_startup, model.boundary_shutdown]:
+                if statuses is None:
+                    constraint.deactivate()
+                else:
+                    constraint.activate()
+
+        # the status of the methanation reactor before the block is unknown, its output is
+        # blocked within the idle time
+        idle_time = getattr(model, "idle_time", None)
+        if n > 0 and idle_time is not None:
+            _, f2, idle, _ = idle_time
+            status, _ = get_status(model, f2)
+            for t in list(model.TIMESTEPS)[:idle]:
+                if statuses is None:
+                    status[t].unfix()
+                else:
+                    status[t].fix(0)
+
+    def _is_free_start(self, n, storage):
+        # the initial content of the first block is fixed if an initial level is given
+        return n > 0 or storage.initial_storage_level is None
+
+    def _solve(self, n):
+        start, stop = self.blocks[n]
+        model = self.models[n]
+
+        start_time = time.perf_counter()
+        with sliced(self.es, start, stop):
+            self.solve(model, f"block_{n}")
+
+            infeasible = is_infeasible(model)
+            meta_results = None if infeasible else processing.meta_results(model)
+            results = (
+                None
+                if infeasible
+                else results_to_labels(results_extraction.results(model))
+            )
+
+        return model, meta_results, results, time.perf_counter() - start_time
+
+    def solve_relaxed(self, prices):
+        r"""
+        Solves the blocks with the prices (start, end) of the boundary contents per block and
+        storage label. Returns lower bound, cost, boundary contents and time per block.
+        """
+        solutions = {}
+        for n, model in self.models.items():
+            for storage in self.storages:
+                price_start, price_end = prices[n][self.labels[storage]]
+                model.boundary_price_start[storage] = price_start
+                model.boundary_price_end[storage] = price_end
+
+                start, end = _boundary_vars(model, storage)
+                if self._is_free_start(n, storage):
+                    start.unfix()
+                end.unfix()
+
+            self._set_boundary_status(n)
+
+            model, meta_results, _, duration = self._solve(n)
+            if meta_results is None:
+                raise ValueError(
+                    f"Relaxed block {n} of the decomposition is infeasible."
+                )
+
+            start, end = self._boundaries(model)
+            solutions[n] = {
+                "lower_bound": _lower_bound(meta_results),
+                "cost": po.value(model.cost),
+                "start": start,
+                "end": end,
+                "status": {
+                    labels: round(po.value(var))
+                    for labels, var in self.statuses[n].items()
+                },
+                "time": duration,
+            }
+
+        return solutions
+
+    def solve_fixed(self, levels, statuses):
+        r"""
+        Solves the blocks with the boundary contents (start, end) fixed per block and storage
+        label and the boundary statuses ("start", "end") per block and flow labels. Returns cost
+        and time per block, the cost is infinite if a block is infeasible.
+        """
+        solutions = {}
+        for n, model in self.models.items():
+            for storage in self.storages:
+                model.boundary_price_start[storage] = 0
+                model.boundary_price_end[storage] = 0
+
+                # levels are clipped to the bounds of the variables
+                for var, level, free in zip(
+                    _boundary_vars(model, storage),
+                    levels[n][self.labels[storage]],
+                    [self._is_free_start(n, storage), True],
+                ):
+                    if free:
+                        var.fix(min(max(level, var.lb), var.ub))
+
+            self._set_boundary_status(n, statuses[n])
+
+            model, meta_results, results, duration = self._solve(n)
+
+            self.pending[n] = results
+            solutions[n] = {
+                "cost": np.inf if meta_results is None else po.value(model.cost),
+                "time": duration,
+            }
+
+        return solutions
+
+    def keep(self):
+        r"""Keeps the results of the last fixed solve as the best results."""
+        self.best.update(self.pending)
+
+    def results(self):
+        r"""Returns the best results (labels as keys) per block."""
+        return self.best
+
+
+def _worker(connection, *args):
+    subproblems = Subproblems(*args)
+    while True:
+        command = connection.recv()
+        if command is None:
+            break
+        method, arguments = command
+        try:
+            connection.send((getattr(subproblems, method)(*arguments), None))
+        except Exception as e:
+            connection.send((None, e))
+    connection.close()
+
+
+class _Pool:
+    r"""
+    Solves the subproblems of the blocks in `processes` forked processes, or in this process if
+    `processes` is 1 or forking is not available.
+    """
+
+    def __init__(self, es, blocks, create_model, solve, emission_limits, processes):
+        processes = min(processes, len(blocks))
+        if "fork" not in multiprocessing.get_all_start_methods():
+            processes = 1
+
+        chunks = [
+            {n: blocks[n] for n in range(len(blocks)) if n % processes == i}
+            for i in range(processes)
+        ]
+
+        self.subproblems = None
+        self.connections = []
+        self.processes = []
+
+        if processes == 1:
+            self.subproblems = [
+                Subproblems(es, chunks[0], create_model, solve, emission_limits)
+            ]
+            return
+
+        context = multiprocessing.get_context("fork")
+        for chunk in chunks:
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(child, es, chunk, create_model, solve, emission_limits),
+                daemon=True,
+            )
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def call(self, method, *arguments):
+        r"""Calls `method` of all subproblems and merges their return values."""
+        merged = {}
+        if self.subproblems is not None:
+            for subproblems in self.subproblems:
+                merged.update(getattr(subproblems, method)(*arguments) or {})
+            return merged
+
+        for connection in self.connections:
+            connection.send((method, arguments))
+        for connection in self.connections:
+            value, error = connection.recv()
+            if error is not None:
+                raise error
+            merged.update(value or {})
+        return merged
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
+
+
+def _couplings(storages, n_blocks):
+    r"""
+    Returns the couplings of the boundary contents as (storage label, block a, block b): the
+    content at the end of block a equals the initial content of block b.
+    """
+    couplings = []
+    for storage in storages:
+        for n in range(n_blocks - 1):
+            couplings.append((storage.label, n, n + 1))
+        if storage.balanced:
+            couplings.append((storage.label, n_blocks - 1, 0))
+    return couplings
+
+
+def optimize_decomposition(
+    es,
+    create_model,
+    solve,
+    period,
+    processes=1,
+    max_iterations=20,
+    tolerance=0.01,
+    emission_limit=None,
+):
+    r"""
+    Optimizes `es` by temporal decomposition in blocks with Lagrangian relaxation of the storage
+    hand-over between the blocks.
+
+    Parameters
+    ----------
+    es : oemof.solph.EnergySystem
+        The energy system
+    create_model : callable
+        Returns the model of a block, signature create_model(es, emission_limit)
+    solve : callable
+        Solves the model of a block, signature solve(model, name)
+    period : str or int
+        Pandas period alias, e.g. 'W' or 'M', or number of timesteps per block
+    processes : int
+        Number of processes the blocks are solved in
+    max_iterations : int
+        Maximal number of iterations
+    tolerance : float
+        Relative gap between the bounds at which the iteration stops
+    emission_limit : float or None
+        Emission limit of all timesteps
+
+    Returns
+    -------
+    results : dict
+        Results of the best upper bound in the format of oemof.solph.processing.results
+    meta_results : dict
+        Objective (best upper bound), bounds, wall time and the bounds of all iterations
+    """
+    start_time = time.perf_counter()
+
+    for flow in es.flows().values():
+        if getattr(flow, "investment", None) is not None:
+            raise NotImplementedError("Decomposition does not support investment.")
+
+    storages = [node for node in es.nodes if isinstance(node, GenericStorage)]
+    for storage in storages:
+        if storage.nominal_storage_capacity is None:
+            raise NotImplementedError("Decomposition does not support investment.")
+
+    for (i, o), (nonconvex, _) in _get_nonconvex(es).items():
+        unsupported = [
+            attr
+            for attr in UNSUPPORTED_NONCONVEX
+            if getattr(nonconvex, attr, None) is not None
+        ] + [
+            gradient
+            for gradient in ["positive_gradient", "negative_gradient"]
+            if getattr(nonconvex, gradient)["ub"][0] is not None
+        ]
+        if unsupported:
+            raise NotImplementedError(
+                f"Decomposition does not support the attributes {unsupported} of the "
+                f"nonconvex flow from '{i.label}' to '{o.label}'."
+            )
+
+    blocks = get_blocks(es.timeindex, period)
+    weights = _get_timeincrement(es)
+
+    emission_limits = {
+        n: (
+            None
+            if emission_limit is None
+            else emission_limit * weights[start:stop].sum() / weights.sum()
+        )
+        for n, (start, stop) in enumerate(blocks)
+    }
+
+    couplings = _couplings(storages, len(blocks))
+    fixed_start = {
+        storage.label
+        for storage in storages
+        if storage.initial_storage_level is not None
+    }
+    multipliers = np.zeros(len(couplings))
+
+    logger.info(
+        f"Optimizing by temporal decomposition in {len(blocks)} blocks ('{period}') with "
+        f"{len(couplings)} storage hand-overs in {min(processes, len(blocks))} processes."
+    )
+
+    lower_bound = -np.inf
+    upper_bound = np.inf
+    step_scale = 2.0
+    iterations = []
+
+    pool = _Pool(es, blocks, create_model, solve, emission_limits, processes)
+    try:
+        for iteration in range(max_iterations):
+            # 1. lower bound of the relaxed blocks
+            prices = {
+                n: {storage.label: [0.0, 0.0] for storage in storages}
+                for n in range(len(blocks))
+            }
+            for (label, a, b), multiplier in zip(couplings, multipliers):
+                prices[a][label][1] += multiplier
+                prices[b][label][0] += multiplier
+
+            relaxed = pool.call("solve_relaxed", prices)
+            bound = sum(solution["lower_bound"] for solution in relaxed.values())
+
+            if bound > lower_bound:
+                lower_bound = bound
+            else:
+                step_scale /= 2
+
+            # 2. upper bound with boundary contents fixed to the mean of both sides
+            levels = {
+                n: {
+                    label: [relaxed[n]["start"][label], relaxed[n]["end"][label]]
+                    for label in prices[n]
+                }
+                for n in range(len(blocks))
+            }
+            mismatch = np.zeros(len(couplings))
+            for c, (label, a, b) in enumerate(couplings):
+                end, start = relaxed[a]["end"][label], relaxed[b]["start"][label]
+                mismatch[c] = start - end
+                level = start if b == 0 and label in fixed_start else (start + end) / 2
+                levels[a][label][1] = level
+                levels[b][label][0] = level
+
+            # status at the end of a block as relaxed, handed over to the next block
+            statuses = {n: {"start": {}, "end": {}} for n in range(len(blocks))}
+            for n in range(len(blocks) - 1):
+                statuses[n]["end"] = relaxed[n]["status"]
+                statuses[n + 1]["start"] = relaxed[n]["status"]
+
+            fixed = pool.call("solve_fixed", levels, statuses)
+            cost = sum(solution["cost"] for solution in fixed.values())
+
+            if cost < upper_bound:
+                upper_bound = cost
+                pool.call("keep")
+
+            gap = (
+                (upper_bound - lower_bound) / abs(upper_bound)
+                if math.isfinite(upper_bound) and upper_bound != 0
+                else np.inf
+            )
+            iterations.append(
+                {
+                    "iteration": iteration + 1,
+                    "lower_bound": bound,
+                    "upper_bound": cost,
+                    "best_lower_bound": lower_bound,
+                    "best_upper_bound": upper_bound,
+                    "gap": gap,
+                    "max_mismatch": float(np.abs(mismatch).max(initial=0)),
+                    "time": time.perf_counter() - start_time,
+                    "block_time": max(
+                        relaxed[n]["time"] + fixed[n]["time"] for n in relaxed
+                    ),
+                }
+            )
+
+            logger.info(
+                f"Iteration {iteration + 1} of decomposition: lower bound {lower_bound}, "
+                f"upper bound {upper_bound}, gap {gap:.4%}."
+            )
+
+            if gap <= tolerance or not mismatch.any():
+                break
+
+            # 3. subgradient step towards the best upper bound (Polyak step size)
+            target = (
+                upper_bound
+                if math.isfinite(upper_bound)
+                else lower_bound + abs(lower_bound) * 0.1
+            )
+            step = step_scale * (target - bound) / (mismatch**2).sum()
+            multipliers += step * mismatch
+
+        block_results = pool.call("results")
+    finally:
+        pool.close()
+
+    if not block_results:
+        raise ValueError(
+            "No feasible solution with fixed boundary storage levels was found by the "
+            "decomposition."
+        )
+
+    results = assemble_results(
+        [results_from_labels(block_results[n], es) for n in range(len(blocks))],
+        [(start, stop, stop) for start, stop in blocks],
+    )
+
+    wall_time = time.perf_counter() - start_time
+    meta_results = {
+        "objective": upper_bound,
+        "problem": {"Lower bound": lower_bound, "Upper bound": upper_bound},
+        "solver": {"Wallclock time": wall_time},
+        "decomposition": {
+            "period": period,
+            "blocks": len(blocks),
+            "processes": min(processes, len(blocks)),
+            "lower_bound": lower_bound,
+            "upper_bound": upper_bound,
+            "gap": iterations[-1]["gap"],
+            "iterations": iterations,
+            "wall_time": wall_time,
+        },
+    }
+
+    return results, meta_results
+
+
+def log_bounds(meta_results, reference_meta_results):
+    r"""
+    Logs the bounds and the wall time of a decomposition compared with the objective and the
+    wall time of the monolithic optimization in `reference_meta_results`.
+    """
+    decomposition = meta_results["decomposition"]
+    objective = reference_meta_results["objective"]
+    reference_time = reference_meta_results.get("solver", {}).get("Wallclock time")
+
+    within = decomposition["lower_bound"] <= objective * (1 + 1e-9) and (
+        objective <= decomposition["upper_bound"] * (1 + 1e-9)
+    )
+    logger.info(
+        f"Decomposition bounds [{decomposition['lower_bound']}, "
+        f"{decomposition['upper_bound']}] ({decomposition['wall_time']:.1f} s) "
+        f"{'enclose' if within else 'do not enclose'} the objective of the monolithic "
+        f"optimization {objective}"
+        + ("." if reference_time is None else f" ({float(reference_time):.1f} s).")
+    )
+
+    return within
@@ -0,0 +1,246 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module stores a datapackage as delta relative to a base datapackage, e.g. a scenario of a
+scenario family relative to the family's base scenario. Only the resources that differ from the
+base are kept:
+
+* sequences that are identical to the base are dropped.
+* elements that differ in some rows are reduced to changed and added rows. Rows that are removed
+  are listed in the delta file.
+* resources with different columns or without counterpart in the base are kept completely.
+
+The metadata (``datapackage.json``) of the delta datapackage describes the complete datapackage.
+The complete datapackage is materialized only when it is loaded.
+"""
+import contextlib
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from oemof_b3.tools.data_processing import load_json, save_json
+
+DELTA_FILE = "delta.json"
+
+DATA_DIRS = ["data/elements", "data/sequences"]
+
+BASE = "base"
+
+ROWS = "rows"
+
+FULL = "full"
+
+
+def _list_resources(path):
+    r"""Returns the relative paths of all csv files in the data directories of `path`."""
+    resources = []
+
+    for data_dir in DATA_DIRS:
+        dir_path = os.path.join(path, data_dir)
+        if os.path.exists(dir_path):
+            resources.extend(
+                f"{data_dir}/{f_name}"
+                for f_name in sorted(os.listdir(dir_path))
+                if f_name.endswith(".csv")
+            )
+
+    return resources
+
+
+def _read_csv_as_str(path):
+    r"""Reads a csv file without type conversions to compare data exactly."""
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def is_delta(path):
+    r"""Returns True if the datapackage in `path` is stored as delta."""
+    return os.path.exists(os.path.join(path, DELTA_FILE))
+
+
+def list_resources(path):
+    r"""Returns the relative paths of all resources of a datapackage, including those that a delta
+    datapackage takes from its base."""
+    resources = set(_list_resources(path))
+
+    if is_delta(path):
+        resources.update(load_json(os.path.join(path, DELTA_FILE))["resources"])
+
+    return sorted(resources)
+
+
+def read_resource(path, resource):
+    r"""
+    Reads a single resource of a datapackage, materializing it from the base if the datapackage
+    is stored as delta.
+
+    Parameters
+    ----------
+    path : str
+        Path of the datapackage
+    resource : str
+        Relative path of the resource, e.g. 'data/elements/ch4-gt.csv'
+
+    Returns
+    -------
+    data : pd.DataFrame
+        Data of the resource, read without type conversions
+    """
+    if not is_delta(path):
+        return _read_csv_as_str(os.path.join(path, resource))
+
+    delta = load_json(os.path.join(path, DELTA_FILE))
+
+    base_path = os.path.join(path, delta["base"])
+
+    kind = delta["resources"].get(resource, FULL)
+
+    if kind == FULL:
+        return _read_csv_as_str(os.path.join(path, resource))
+
+    base_data = read_resource(base_path, resource)
+
+    if kind == BASE:
+        return base_data
+
+    # kind == ROWS: update rows of base by changed and added rows
+    changed = _read_csv_as_str(os.path.join(path, resource))
+
+    removed = delta["removed_rows"].get(resource, [])
+
+    data = base_data.loc[~base_data["name"].isin(removed)].set_index("name")
+
+    changed = changed.set_index("name")
+
+    data = pd.concat([data.loc[~data.index.isin(changed.index)], changed])
+
+    return data.reset_index().loc[:, base_data.columns]
+
+
+def write_delta(path, base_path):
+    r"""
+    Reduces the datapackage in `path` to its delta relative to the datapackage in `base_path`.
+
+    Parameters
+    ----------
+    path : str
+        Path of the complete datapackage, which is reduced in place
+    base_path : str
+        Path of the base datapackage, which may itself be stored as delta
+
+    Returns
+    -------
+    delta : dict
+        Kind of storage per resource and removed rows
+    """
+    base_resources = set(_list_resources(base_path))
+
+    delta = {
+        "base": os.path.relpath(base_path, path),
+        "resources": {},
+        "removed_rows": {},
+    }
+
+    for resource in _list_resources(path):
+        if resource not in base_resources:
+            delta["resources"][resource] = FULL
+            continue
+
+        data = _read_csv_as_str(os.path.join(path, resource))
+
+        base_data = read_resource(base_path, resource)
+
+        if data.equals(base_data):
+            delta["resources"][resource] = BASE
+            os.remove(os.path.join(path, resource))
+
+        elif (
+            resource.startswith("data/elements")
+            and list(data.columns) == list(base_data.columns)
+            and "name" in data.columns
+        ):
+            merged = data.merge(base_data, how="left", indicator=True)
+
+            changed = data.loc[(merged["_merge"] == "left_only").values]
+
+            removed = base_data.loc[~base_data["name"].isin(data["name"]), "name"]
+
+            delta["resources"][resource] = ROWS
+            if not removed.empty:
+                delta["removed_rows"][resource] = removed.tolist()
+
+            changed.to_csv(os.path.join(path, resource), index=False)
+
+        else:
+            delta["resources"][resource] = FULL
+
+    save_json(delta, os.path.join(path, DELTA_FILE))
+
+    return delta
+
+
+def materialize(path, destination):
+    r"""
+    Writes the complete datapackage of a delta datapackage in `path` to `destination`.
+    Resources that are taken from the base unchanged are hard-linked if possible.
+
+    Parameters
+    ----------
+    path : str
+        Path of the delta datapackage
+    destination : str
+        Path of the complete datapackage. Must not exist yet.
+
+    Returns
+    -------
+    None
+    """
+    delta = load_json(os.path.join(path, DELTA_FILE))
+
+    base_path = os.path.join(path, delta["base"])
+
+    shutil.copytree(path, destination, ignore=shutil.ignore_patterns(DELTA_FILE))
+
+    for resource, kind in delta["resources"].items():
+        target = os.path.join(destination, resource)
+
+        if kind == BASE and not is_delta(base_path):
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(os.path.join(base_path, resource), target)
+            except OSError:
+                shutil.copy(os.path.join(base_path, resource), target)
+
+        elif kind in [BASE, ROWS]:
+            read_resource(path, resource).to_csv(target, index=False)
+
+
+@contextlib.contextmanager
+def materialized(path):
+    r"""
+    Context manager that yields the path of a complete datapackage. If the datapackage in `path`
+    is stored as delta, it is materialized in a temporary directory, which is removed afterwards.
+
+    Parameters
+    ----------
+    path : str
+        Path of the datapackage
+
+    Yields
+    ------
+    path : str
+        Path of the complete datapackage
+    """
+    if not is_delta(path):
+        yield path
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, os.path.basename(os.path.normpath(path)))
+
+        materialize(path, destination)
+
+        yield destination
@@ -14,22 +14,55 @@ SPDX-License-Identifier: MIT
 
 """
 
+import numbers
+from collections import defaultdict
+
+import numpy as np
 from pyomo import environ as po
+from pyomo.core.expr.numeric_expr import LinearExpression
+from pyomo.repn.beta.matrix import MatrixConstraint
 
 
-def equate_flows(model, flows1, flows2, factor1=1, name="equate_flows"):
+def equate_flows(model, flows1, flows2, factor1=1, name="equate_flows", matrix=False):
     r"""
     Adds a constraint to the given model that sets the sum of two groups of
     flows equal or proportional by a factor.
+
+    The linear expression of each timestep is formed directly from the flow variables and their
+    coefficients (factor1 for flows1, -1 for flows2) instead of summing up expressions. If
+    `matrix` is True, the constraints of all timesteps are emitted at once as sparse matrix
+    (MatrixConstraint), which avoids building any expression. `factor1` may be a mutable pyomo
+    Param (e.g. to re-solve the model for different factors), which requires `matrix` to be False.
     """
+    if matrix and not isinstance(factor1, numbers.Number):
+        raise ValueError(
+            "Constraints with a mutable factor cannot be built as matrix. "
+            "Set 'matrix' to False."
+        )
+
+    flows = list(flows1) + list(flows2)
+    coefficients = [factor1] * len(flows1) + [-1] * len(flows2)
+
+    if not flows:
+        # nothing to equate
+        return model
+
+    if matrix:
+        setattr(
+            model,
+            name,
+            _matrix_constraint(model, flows, coefficients),
+        )
+        return model
 
     def _equate_flow_groups_rule(m):
         for ts in m.TIMESTEPS:
-            sum1_t = sum(m.flow[fi, fo, ts] for fi, fo in flows1)
-            sum2_t = sum(m.flow[fi, fo, ts] for fi, fo in flows2)
-            expr = sum1_t * factor1 == sum2_t
-            if expr is not True:
-                getattr(m, name).add(ts, expr)
+            expr = LinearExpression(
+                constant=0,
+                linear_coefs=list(coefficients),
+                linear_vars=[m.flow[fi, fo, ts] for fi, fo in flows],
+            )
+            getattr(m, name).add(ts, expr == 0)
 
     setattr(
         model,
@@ -45,16 +78,86 @@ def equate_flows(model, flows1, flows2, factor1=1, name="equate_flows"):
     return model
 
 
-def equate_flows_by_keyword(model, keyword1, keyword2, factor1=1, name="equate_flows"):
+def _matrix_constraint(model, flows, coefficients):
+    r"""
+    Returns the constraints sum(coefficients * flows) == 0 of all timesteps as sparse matrix in
+    compressed row format. Row t contains the flows of timestep t.
+    """
+    n_timesteps = len(model.TIMESTEPS)
+    n_flows = len(flows)
+
+    # column t * n_flows + k is the variable of flow k in timestep t
+    variables = [model.flow[fi, fo, ts] for ts in model.TIMESTEPS for fi, fo in flows]
+
+    return MatrixConstraint(
+        nrows=n_timesteps,
+        ncols=n_timesteps * n_flows,
+        nnz=n_timesteps * n_flows,
+        prows=np.arange(0, n_timesteps * n_flows + 1, n_flows),
+        jcols=np.arange(n_timesteps * n_flows),
+        vals=np.tile(np.array(coefficients, dtype=float), n_timesteps),
+        ranges=np.zeros(2 * n_timesteps),
+        range_types=[MatrixConstraint.Equality] * n_timesteps,
+        varmap=variables,
+    )
+
+
+def build_flow_keyword_index(model, index=None):
+    r"""
+    Returns an index of the flows of the given model by the keywords (attributes) set on them.
+
+    The index is built in one pass over all flows and can be passed to every call of
+    equate_flows_by_keyword, instead of scanning all flows for each keyword. Only attributes set
+    on the flow instances are indexed, which holds for keywords given as `output_parameters`.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model
+        The model
+    index : dict
+        Flows (i, o) per keyword that are already known, e.g. the output flows of backpressure
+        CHPs. They are merged with the keywords found on the flows of the model, flows that are
+        not part of the model (e.g. pruned) are dropped.
+
+    Returns
+    -------
+    index : dict
+        List of flows (i, o) per keyword
+    """
+    keyword_index = defaultdict(list)
+    for keyword, flows in (index or {}).items():
+        keyword_index[keyword].extend(flow for flow in flows if flow in model.flows)
+
+    # known flows are scanned as well, as they may carry further keywords
+    known = {keyword: set(flows) for keyword, flows in keyword_index.items()}
+    for (i, o) in model.flows:
+        for keyword in vars(model.flows[i, o]):
+            if (i, o) not in known.get(keyword, ()):
+                keyword_index[keyword].append((i, o))
+
+    return dict(keyword_index)
+
+
+def equate_flows_by_keyword(
+    model,
+    keyword1,
+    keyword2,
+    factor1=1,
+    name="equate_flows",
+    index=None,
+    matrix=False,
+):
     r"""
     This wrapper for equate_flows allows to equate groups of flows by using a
     keyword instead of a list of flows.
+
+    If `index` (see build_flow_keyword_index) is not given, it is built from `model`.
     """
-    flows = {}
-    for n, keyword in enumerate([keyword1, keyword2]):
-        flows[n] = []
-        for (i, o) in model.flows:
-            if hasattr(model.flows[i, o], keyword):
-                flows[n].append((i, o))
-
-    return equate_flows(model, flows[0], flows[1], factor1=factor1, name=name)
+    if index is None:
+        index = build_flow_keyword_index(model)
+
+    flows = [index.get(keyword, []) for keyword in [keyword1, keyword2]]
+
+    return equate_flows(
+        model, flows[0], flows[1], factor1=factor1, name=name, matrix=matrix
+    )
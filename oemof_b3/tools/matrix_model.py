@@ -0,0 +1,916 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module builds the optimization problem of an oemof.solph EnergySystem directly as sparse
+constraint matrix, bypassing the pyomo expression trees built by `oemof.solph.Model`. It writes
+the problem as MPS, solves it with a solver executable (e.g. cbc) and reads the solution back into
+the structure of `oemof.solph.processing.results`.
+
+The constraints are formulated as in oemof.solph 0.4.5 and are vectorized over the timesteps.
+The following blocks are supported, which covers the components of oemof.tabular facades and
+`oemof_b3.facades`:
+
+* flows: bounds, fixed values, variable costs, summed min/max and gradients
+* nonconvex flows: status with min/max and activity costs
+* buses, transformers, links and extraction turbines
+* generic storages without investment
+
+Further, the emission limit, the equate-flows constraint (electricity/gas relations) and the
+linear formulation of the idle time of the methanation reactor are available as methods.
+
+Investment and any other block raise a NotImplementedError.
+"""
+import logging
+import os
+import re
+import subprocess
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from oemof.solph import blocks
+from oemof.solph.components.extraction_turbine_chp import ExtractionTurbineCHPBlock
+from oemof.solph.components.generic_storage import GenericStorageBlock
+from oemof.solph.custom.link import LinkBlock
+from oemof.solph.plumbing import _Sequence, sequence
+from pyomo.core.base.block import SimpleBlock
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVE = "obj"
+
+SUPPORTED_BLOCKS = [
+    blocks.Flow,
+    blocks.NonConvexFlow,
+    blocks.Bus,
+    blocks.Transformer,
+    LinkBlock,
+    ExtractionTurbineCHPBlock,
+    GenericStorageBlock,
+]
+
+
+def _values(seq, n_timesteps):
+    r"""Returns the first `n_timesteps` values of a solph sequence as float array."""
+    if isinstance(seq, _Sequence):
+        return np.full(n_timesteps, np.nan if seq.default is None else seq.default)
+    if isinstance(seq, pd.Series):
+        return seq.values[:n_timesteps].astype(float)
+    return np.asarray(seq[:n_timesteps], dtype=float)
+
+
+class _Variables:
+    r"""A group of variables indexed by keys (and timesteps)."""
+
+    def __init__(self, keys, columns, result_keys):
+        self.keys = keys
+        self.columns = columns
+        self.result_keys = result_keys
+
+    @property
+    def timeindexed(self):
+        return self.columns.ndim == 2
+
+
+class MatrixModel:
+    r"""
+    Optimization problem of an EnergySystem as sparse matrix.
+
+    Parameters
+    ----------
+    es : oemof.solph.EnergySystem
+        The energy system
+
+    Attributes
+    ----------
+    flows : dict
+        Flows of the energy system by (input, output), as `oemof.solph.Model.flows`
+    timeincrement : np.ndarray
+        Duration of the timesteps, used as objective weighting
+    variables : dict
+        Column indices of the variables by name
+    constraints : dict
+        Row indices of the constraints by name
+    """
+
+    def __init__(self, es):
+        self.es = es
+        self.flows = es.flows()
+        self.n_timesteps = len(es.timeindex)
+
+        if es.timeincrement is not None:
+            self.timeincrement = _values(sequence(es.timeincrement), self.n_timesteps)
+        else:
+            self.timeincrement = np.full(
+                self.n_timesteps, es.timeindex.freq.nanos / 3.6e12
+            )
+
+        self.variables = {}
+        self.constraints = {}
+
+        # columns
+        self._lb = []
+        self._ub = []
+        self._cost = []
+        self._integer = []
+        self.n_columns = 0
+
+        # rows in coordinate format
+        self._rows = []
+        self._cols = []
+        self._vals = []
+        self._lower = []
+        self._upper = []
+        self.n_rows = 0
+
+        self.solution = None
+        self.duals = None
+        self.status = None
+
+        self._build()
+
+    def _add_variables(
+        self, name, keys, lb, ub, cost=0, integer=False, result_keys=None
+    ):
+        r"""
+        Adds variables for `keys`. `lb`, `ub` and `cost` are broadcast to shape (len(keys),
+        n_timesteps) for timeindexed variables or (len(keys),) for scalar variables, depending on
+        the shape of `lb`.
+        """
+        lb = np.asarray(lb, dtype=float)
+        shape = lb.shape
+        n = lb.size
+
+        columns = np.arange(self.n_columns, self.n_columns + n).reshape(shape)
+
+        self._lb.append(lb.ravel())
+        self._ub.append(np.broadcast_to(np.asarray(ub, dtype=float), shape).ravel())
+        self._cost.append(np.broadcast_to(np.asarray(cost, dtype=float), shape).ravel())
+        self._integer.append(np.full(n, integer))
+        self.n_columns += n
+
+        self.variables[name] = _Variables(
+            list(keys), columns, result_keys or list(keys)
+        )
+
+        return columns
+
+    def _add_constraints(self, name, cols, vals, lower, upper):
+        r"""
+        Adds rows sum(vals * x[cols]) between `lower` and `upper`.
+
+        `cols` and `vals` have shape (n_rows, n_terms). Terms with a negative column index or
+        a coefficient of zero are dropped.
+        """
+        cols = np.atleast_2d(np.asarray(cols))
+        vals = np.broadcast_to(np.asarray(vals, dtype=float), cols.shape)
+        n_rows = cols.shape[0]
+
+        rows = np.broadcast_to(
+            np.arange(self.n_rows, self.n_rows + n_rows)[:, None], cols.shape
+        )
+        mask = (cols >= 0) & (vals != 0)
+
+        self._rows.append(rows[mask])
+        self._cols.append(cols[mask])
+        self._vals.append(vals[mask])
+        self._lower.append(np.broadcast_to(np.asarray(lower, dtype=float), n_rows))
+        self._upper.append(np.broadcast_to(np.asarray(upper, dtype=float), n_rows))
+
+        self.constraints[name] = np.arange(self.n_rows, self.n_rows + n_rows)
+        self.n_rows += n_rows
+
+        return self.constraints[name]
+
+    def _flow_columns(self, flows):
+        r"""Returns the columns of the flow variables of `flows` with shape (n_flows, T)."""
+        index = self._flow_index
+        return self.variables["flow"].columns[[index[flow] for flow in flows]]
+
+    def _build(self):
+        for group in self.es.groups:
+            if (
+                isinstance(group, type)
+                and issubclass(group, SimpleBlock)
+                and group not in SUPPORTED_BLOCKS
+            ):
+                raise NotImplementedError(
+                    f"The matrix model does not support '{group.__name__}'."
+                )
+
+        self._build_flows()
+        self._build_nonconvex_flows()
+        self._build_buses()
+        self._build_transformers()
+        self._build_links()
+        self._build_extraction_turbines()
+        self._build_storages()
+
+    def _group(self, block):
+        return self.es.groups.get(block, [])
+
+    def _build_flows(self):
+        r"""Flow variables with bounds and costs as in oemof.solph.Model and blocks.Flow."""
+        T = self.n_timesteps
+        flows = list(self.flows)
+        self._flow_index = {flow: k for k, flow in enumerate(flows)}
+
+        lb = np.full((len(flows), T), -np.inf)
+        ub = np.full((len(flows), T), np.inf)
+        cost = np.zeros((len(flows), T))
+
+        for k, (i, o) in enumerate(flows):
+            flow = self.flows[i, o]
+            unidirectional = not hasattr(flow, "bidirectional")
+
+            if flow.integer:
+                raise NotImplementedError(
+                    "The matrix model does not support integer flows."
+                )
+
+            if flow.nominal_value is not None:
+                fix = _values(flow.fix, T)
+                if not np.isnan(fix[0]):
+                    lb[k] = ub[k] = fix * flow.nominal_value
+                else:
+                    ub[k] = _values(flow.max, T) * flow.nominal_value
+                    if not flow.nonconvex:
+                        lb[k] = _values(flow.min, T) * flow.nominal_value
+                    elif unidirectional:
+                        lb[k] = 0
+            elif unidirectional:
+                lb[k] = 0
+
+            variable_costs = _values(flow.variable_costs, T)
+            if not np.isnan(variable_costs[0]):
+                cost[k] = variable_costs * self.timeincrement
+
+        columns = self._add_variables("flow", flows, lb, ub, cost)
+
+        self._build_summed_flows(flows, columns)
+        self._build_gradients(flows, columns)
+
+    def _build_summed_flows(self, flows, columns):
+        for attribute, name, lower, upper in [
+            ("summed_max", "Flow.summed_max", False, True),
+            ("summed_min", "Flow.summed_min", True, False),
+        ]:
+            selected = [
+                k
+                for k, flow in enumerate(flows)
+                if getattr(self.flows[flow], attribute) is not None
+                and self.flows[flow].nominal_value is not None
+            ]
+            if not selected:
+                continue
+            rhs = np.array(
+                [
+                    getattr(self.flows[flows[k]], attribute)
+                    * self.flows[flows[k]].nominal_value
+                    for k in selected
+                ]
+            )
+            self._add_constraints(
+                name,
+                columns[selected],
+                self.timeincrement,
+                rhs if lower else -np.inf,
+                rhs if upper else np.inf,
+            )
+
+    def _build_gradients(self, flows, columns):
+        r"""Gradient variables and constraints of blocks.Flow."""
+        T = self.n_timesteps
+
+        for direction, sign in [("positive", 1), ("negative", -1)]:
+            selected = [
+                k
+                for k, flow in enumerate(flows)
+                if getattr(self.flows[flow], direction + "_gradient")["ub"][0]
+                is not None
+            ]
+            if not selected:
+                continue
+
+            ub = np.array(
+                [
+                    _values(
+                        getattr(self.flows[flows[k]], direction + "_gradient")["ub"], T
+                    )
+                    * self.flows[flows[k]].nominal_value
+                    for k in selected
+                ]
+            )
+            gradient = self._add_variables(
+                f"Flow.{direction}_gradient",
+                [flows[k] for k in selected],
+                np.full(ub.shape, -np.inf),
+                ub,
+            )
+
+            # sign * (flow(t) - flow(t-1)) - gradient(t) <= 0 for t > 0
+            flow_columns = columns[selected]
+            cols = np.stack(
+                [flow_columns[:, 1:], flow_columns[:, :-1], gradient[:, 1:]], axis=-1
+            ).reshape(-1, 3)
+            self._add_constraints(
+                f"Flow.{direction}_gradient_constr", cols, [sign, -sign, -1], -np.inf, 0
+            )
+
+    def _build_nonconvex_flows(self):
+        r"""Status variables, min/max constraints and activity costs of blocks.NonConvexFlow."""
+        group = self._group(blocks.NonConvexFlow)
+        if not group:
+            return
+
+        T = self.n_timesteps
+        flows = [(i, o) for i, o, _ in group]
+
+        activity_costs = np.zeros((len(flows), T))
+        for k, (i, o, flow) in enumerate(group):
+            nonconvex = flow.nonconvex
+            for attribute in [
+                "startup_costs",
+                "shutdown_costs",
+                "maximum_startups",
+                "maximum_shutdowns",
+                "minimum_uptime",
+                "minimum_downtime",
+            ]:
+                value = getattr(nonconvex, attribute)
+                if (
+                    value[0] if isinstance(value, (list, _Sequence)) else value
+                ) is not None:
+                    raise NotImplementedError(
+                        f"The matrix model does not support '{attribute}' of nonconvex flows."
+                    )
+            for attribute in ["positive_gradient", "negative_gradient"]:
+                if getattr(nonconvex, attribute)["ub"][0] is not None:
+                    raise NotImplementedError(
+                        f"The matrix model does not support '{attribute}' of nonconvex flows."
+                    )
+
+            costs = _values(nonconvex.activity_costs, T)
+            if not np.isnan(costs[0]):
+                activity_costs[k] = costs
+
+        status = self._add_variables(
+            "NonConvexFlow.status",
+            flows,
+            np.zeros((len(flows), T)),
+            1,
+            activity_costs,
+            integer=True,
+        )
+
+        flow_columns = self._flow_columns(flows)
+        nominal = np.array([[flow.nominal_value] for _, _, flow in group])
+        minimum = np.array([_values(flow.min, T) for _, _, flow in group]) * nominal
+        maximum = np.array([_values(flow.max, T) for _, _, flow in group]) * nominal
+
+        # status * min * nominal_value <= flow
+        cols = np.stack([status, flow_columns], axis=-1).reshape(-1, 2)
+        vals = np.stack([minimum, -np.ones_like(minimum)], axis=-1).reshape(-1, 2)
+        self._add_constraints("NonConvexFlow.min", cols, vals, -np.inf, 0)
+
+        # status * max * nominal_value >= flow
+        vals = np.stack([maximum, -np.ones_like(maximum)], axis=-1).reshape(-1, 2)
+        self._add_constraints("NonConvexFlow.max", cols, vals, 0, np.inf)
+
+    def _build_buses(self):
+        r"""Balance of blocks.Bus: sum of inflows equals sum of outflows."""
+        buses = []
+        for bus in self._group(blocks.Bus):
+            inflows = [(i, bus) for i in bus.inputs]
+            outflows = [(bus, o) for o in bus.outputs]
+            if not inflows and not outflows:
+                continue
+
+            cols = self._flow_columns(inflows + outflows).T
+            vals = np.array([1] * len(inflows) + [-1] * len(outflows))
+            self._add_constraints(f"Bus.balance[{bus.label}]", cols, vals, 0, 0)
+            buses.append(bus)
+
+        self._balanced_buses = buses
+
+    def _build_transformers(self):
+        r"""Relation of all inputs and outputs of blocks.Transformer."""
+        T = self.n_timesteps
+        for n in self._group(blocks.Transformer):
+            for o in n.outputs:
+                for i in n.inputs:
+                    cols = self._flow_columns([(i, n), (n, o)]).T
+                    vals = np.stack(
+                        [
+                            _values(n.conversion_factors[o], T),
+                            -_values(n.conversion_factors[i], T),
+                        ],
+                        axis=-1,
+                    )
+                    self._add_constraints(
+                        f"Transformer.relation[{n.label},{i.label},{o.label}]",
+                        cols,
+                        vals,
+                        0,
+                        0,
+                    )
+
+    def _build_links(self):
+        r"""Relation of inputs and outputs of LinkBlock."""
+        T = self.n_timesteps
+        for n in self._group(LinkBlock):
+            for (i, o), factor in n.conversion_factors.items():
+                cols = self._flow_columns([(n, o), (i, n)]).T
+                vals = np.stack([np.ones(T), -_values(factor, T)], axis=-1)
+                self._add_constraints(
+                    f"Link.relation[{n.label},{i.label},{o.label}]", cols, vals, 0, 0
+                )
+
+    def _build_extraction_turbines(self):
+        r"""Input/output relation and output relation of ExtractionTurbineCHPBlock."""
+        T = self.n_timesteps
+        for n in self._group(ExtractionTurbineCHPBlock):
+            inflow = list(n.inputs)[0]
+            main_output = list(n.conversion_factor_full_condensation)[0]
+            tapped_output = [o for o in n.outputs if o != main_output][0]
+
+            full_condensation = _values(
+                n.conversion_factor_full_condensation[main_output], T
+            )
+            main = _values(n.conversion_factors[main_output], T)
+            tapped = _values(n.conversion_factors[tapped_output], T)
+
+            cols = self._flow_columns(
+                [(inflow, n), (n, main_output), (n, tapped_output)]
+            ).T
+            vals = np.stack(
+                [
+                    np.ones(T),
+                    -1 / full_condensation,
+                    -(full_condensation - main) / tapped / full_condensation,
+                ],
+                axis=-1,
+            )
+            self._add_constraints(
+                f"ExtractionTurbineCHP.input_output_relation[{n.label}]",
+                cols,
+                vals,
+                0,
+                0,
+            )
+
+            vals = np.stack([np.ones(T), -main / tapped], axis=-1)
+            self._add_constraints(
+                f"ExtractionTurbineCHP.out_flow_relation[{n.label}]",
+                cols[:, 1:],
+                vals,
+                0,
+                np.inf,
+            )
+
+    def _build_storages(self):
+        r"""Storage content, initial content and balances of GenericStorageBlock."""
+        storages = list(self._group(GenericStorageBlock))
+        if not storages:
+            return
+
+        T = self.n_timesteps
+        ti = self.timeincrement
+
+        capacity = np.array([[n.nominal_storage_capacity] for n in storages])
+        content = self._add_variables(
+            "GenericStorageBlock.storage_content",
+            storages,
+            capacity * np.array([_values(n.min_storage_level, T) for n in storages]),
+            capacity * np.array([_values(n.max_storage_level, T) for n in storages]),
+            result_keys=[(n, None) for n in storages],
+        )
+
+        initial = np.array(
+            [
+                np.nan
+                if n.initial_storage_level is None
+                else n.initial_storage_level * n.nominal_storage_capacity
+                for n in storages
+            ]
+        )
+        init_content = self._add_variables(
+            "GenericStorageBlock.init_content",
+            storages,
+            np.where(np.isnan(initial), 0, initial),
+            np.where(np.isnan(initial), capacity[:, 0], initial),
+            result_keys=[(n, None) for n in storages],
+        )
+
+        for k, n in enumerate(storages):
+            inflow = (list(n.inputs)[0], n)
+            outflow = (n, list(n.outputs)[0])
+            flow_columns = self._flow_columns([inflow, outflow])
+
+            loss_rate = _values(n.loss_rate, T)
+            fixed_losses = (
+                _values(n.fixed_losses_relative, T) * n.nominal_storage_capacity
+                + _values(n.fixed_losses_absolute, T)
+            ) * ti
+
+            previous = np.concatenate([[init_content[k]], content[k, :-1]])
+
+            # content(t) - content(t-1) * (1 - loss_rate) ** ti - inflow * eta_i * ti
+            # + outflow / eta_o * ti == - fixed losses
+            cols = np.stack(
+                [content[k], previous, flow_columns[0], flow_columns[1]], -1
+            )
+            vals = np.stack(
+                [
+                    np.ones(T),
+                    -((1 - loss_rate) ** ti),
+                    -_values(n.inflow_conversion_factor, T) * ti,
+                    ti / _values(n.outflow_conversion_factor, T),
+                ],
+                axis=-1,
+            )
+            self._add_constraints(
+                f"GenericStorageBlock.balance[{n.label}]",
+                cols,
+                vals,
+                -fixed_losses,
+                -fixed_losses,
+            )
+
+            if n.balanced:
+                self._add_constraints(
+                    f"GenericStorageBlock.balanced_cstr[{n.label}]",
+                    [[content[k, -1], init_content[k]]],
+                    [1, -1],
+                    0,
+                    0,
+                )
+
+    def emission_limit(self, limit, keyword="emission_factor"):
+        r"""
+        Limits the weighted sum of all flows with attribute `keyword`, as
+        `oemof.solph.constraints.emission_limit`.
+        """
+        flows = [flow for flow in self.flows if hasattr(self.flows[flow], keyword)]
+        if not flows:
+            return
+
+        factors = np.array(
+            [
+                _values(sequence(getattr(self.flows[flow], keyword)), self.n_timesteps)
+                for flow in flows
+            ]
+        )
+        self._add_constraints(
+            f"integral_limit_{keyword}_constraint",
+            self._flow_columns(flows).ravel(),
+            (factors * self.timeincrement).ravel(),
+            -np.inf,
+            limit,
+        )
+
+    def equate_flows(self, flows1, flows2, factor1=1, name="equate_flows"):
+        r"""
+        Sets the sum of `flows1` times `factor1` equal to the sum of `flows2` in every timestep,
+        as `oemof_b3.tools.equate_flows.equate_flows`.
+        """
+        flows = list(flows1) + list(flows2)
+        if not flows:
+            return
+
+        cols = self._flow_columns(flows).T
+        vals = np.array([factor1] * len(flows1) + [-1] * len(flows2))
+        self._add_constraints(name, cols, vals, 0, 0)
+
+    def set_idle_time(
+        self,
+        f1,
+        f2,
+        n,
+        name_constraint="constraint_idle_time",
+        initial_status=None,
+    ):
+        r"""
+        Enforces f1 to be inactive for n timesteps before f2 can be active with the linear
+        formulation of `oemof_b3.tools.set_idle_time.set_idle_time_linear`.
+        """
+        T = self.n_timesteps
+        status = self.variables["NonConvexFlow.status"]
+        x1 = status.columns[status.keys.index(f1)]
+        x2 = status.columns[status.keys.index(f2)]
+
+        initial_status = list(initial_status or [])
+
+        counter = self._add_variables(
+            name_constraint + "_counter",
+            [name_constraint],
+            np.zeros((1, T)),
+            np.inf,
+            result_keys=[(name_constraint + "_counter",) * 2],
+        )[0]
+
+        # C(t) - X1(t) - C(t-1) + X1(t-n-1) == constant of the initial status
+        t = np.arange(T)
+        previous = np.where(t > 0, np.concatenate([[-1], counter[:-1]]), -1)
+        dropped = np.where(t > n, x1[np.maximum(t - n - 1, 0)], -1)
+
+        rhs = np.zeros(T)
+        rhs[0] += sum(initial_status[-(n + 1) :])
+        for ts in range(min(n + 1, T)):
+            if n + 1 - ts <= len(initial_status):
+                rhs[ts] -= initial_status[ts - n - 1]
+
+        cols = np.stack([counter, x1, previous, dropped], axis=-1)
+        self._add_constraints(
+            name_constraint + "_window", cols, [1, -1, -1, 1], rhs, rhs
+        )
+
+        # C(t) + M(t) * X2(t) <= M(t)
+        big_m = np.minimum(t + 1 + len(initial_status), n + 1)
+        cols = np.stack([counter, x2], axis=-1)
+        vals = np.stack([np.ones(T), big_m], axis=-1)
+        self._add_constraints(name_constraint, cols, vals, -np.inf, big_m)
+
+    @property
+    def bounds(self):
+        r"""Returns lower and upper bounds of all variables."""
+        return np.concatenate(self._lb), np.concatenate(self._ub)
+
+    @property
+    def cost(self):
+        return np.concatenate(self._cost)
+
+    @property
+    def integer(self):
+        return np.concatenate(self._integer)
+
+    @property
+    def matrix(self):
+        r"""Returns the constraint matrix (CSR) and the lower and upper bounds of the rows."""
+        A = sparse.csr_matrix(
+            (
+                np.concatenate(self._vals),
+                (np.concatenate(self._rows), np.concatenate(self._cols)),
+            ),
+            shape=(self.n_rows, self.n_columns),
+        )
+        return A, np.concatenate(self._lower), np.concatenate(self._upper)
+
+    def write_mps(self, path):
+        r"""Writes the problem in free MPS format to `path`."""
+        A, lower, upper = self.matrix
+        lb, ub = self.bounds
+        cost = self.cost
+        integer = self.integer
+
+        row_names = np.char.add("c", np.arange(self.n_rows).astype(str))
+        col_names = np.char.add("x", np.arange(self.n_columns).astype(str))
+
+        equal = lower == upper
+        less = ~equal & np.isinf(lower)
+        greater = ~equal & ~less
+        ranged = greater & ~np.isinf(upper)
+        row_types = np.where(equal, "E", np.where(less, "L", "G"))
+        rhs = np.where(less, upper, lower)
+
+        # entries of the columns, objective first. Columns without any entry get an explicit
+        # zero objective entry, as columns only declared in BOUNDS are not accepted by all solvers
+        A = A.tocsc()
+        A.sort_indices()
+        n_entries = np.diff(A.indptr)
+        columns = np.repeat(np.arange(self.n_columns), n_entries)
+        in_objective = (cost != 0) | (n_entries == 0)
+        entries = pd.DataFrame(
+            {
+                "column": np.concatenate([np.flatnonzero(in_objective), columns]),
+                "row": np.concatenate(
+                    [
+                        np.full(np.count_nonzero(in_objective), OBJECTIVE),
+                        row_names[A.indices],
+                    ]
+                ),
+                "value": np.concatenate([cost[in_objective], A.data]),
+            }
+        )
+        entries["integer"] = integer[entries["column"].values]
+        entries = entries.sort_values(["integer", "column"], kind="stable")
+        entries["column"] = col_names[entries["column"].values]
+
+        def _write(f, df):
+            df.insert(0, "indent", "")
+            df.to_csv(f, sep=" ", header=False, index=False, float_format="%.17g")
+
+        with open(path, "w") as f:
+            f.write("NAME oemof_b3 FREE\nROWS\n N obj\n")
+            _write(f, pd.DataFrame({"type": row_types, "name": row_names}))
+
+            f.write("COLUMNS\n")
+            continuous = entries.loc[~entries["integer"], ["column", "row", "value"]]
+            _write(f, continuous)
+            if integer.any():
+                f.write(" MARKER 'MARKER' 'INTORG'\n")
+                _write(f, entries.loc[entries["integer"], ["column", "row", "value"]])
+                f.write(" MARKER 'MARKER' 'INTEND'\n")
+
+            f.write("RHS\n")
+            nonzero = rhs != 0
+            _write(
+                f,
+                pd.DataFrame(
+                    {"name": "rhs", "row": row_names[nonzero], "value": rhs[nonzero]}
+                ),
+            )
+
+            if ranged.any():
+                f.write("RANGES\n")
+                _write(
+                    f,
+                    pd.DataFrame(
+                        {
+                            "name": "rng",
+                            "row": row_names[ranged],
+                            "value": (upper - lower)[ranged],
+                        }
+                    ),
+                )
+
+            f.write("BOUNDS\n")
+            _write(f, self._bounds_frame(col_names, lb, ub, integer))
+            f.write("ENDATA\n")
+
+    @staticmethod
+    def _bounds_frame(col_names, lb, ub, integer):
+        r"""Returns the bounds section of the MPS file (defaults are lb 0 and ub inf)."""
+        fixed = lb == ub
+        free = np.isneginf(lb) & np.isposinf(ub)
+        frames = [
+            ("FX", fixed, lb),
+            ("FR", free & ~fixed, lb),
+            ("MI", np.isneginf(lb) & ~free, lb),
+            ("LO", ~fixed & ~np.isinf(lb) & ((lb != 0) | integer), lb),
+            ("UP", ~fixed & ~np.isinf(ub), ub),
+        ]
+        bounds = pd.concat(
+            [
+                pd.DataFrame(
+                    {
+                        "type": kind,
+                        "name": "bnd",
+                        "column": col_names[mask],
+                        "value": values[mask],
+                        "order": np.flatnonzero(mask),
+                    }
+                )
+                for kind, mask, values in frames
+            ]
+        ).sort_values("order", kind="stable")
+
+        # no value for free and minus infinity bounds
+        bounds["value"] = bounds["value"].where(~bounds["type"].isin(["FR", "MI"]), "")
+
+        return bounds.drop(columns="order")
+
+    def read_solution(self, path):
+        r"""
+        Reads the solution file written by cbc with '-printingOptions all'.
+
+        Returns
+        -------
+        status : str
+            First line of the solution file, e.g. 'Optimal - objective value 10.00000000'
+        """
+        solution = np.full(self.n_columns, np.nan)
+        duals = np.full(self.n_rows, np.nan)
+
+        with open(path) as f:
+            status = f.readline().strip()
+            for line in f:
+                tokens = line.split()
+                if tokens[0] == "**":
+                    tokens = tokens[1:]
+                name = tokens[1]
+                if name[0] == "x":
+                    solution[int(name[1:])] = float(tokens[2])
+                elif name[0] == "c":
+                    duals[int(name[1:])] = float(tokens[3])
+
+        self.solution = solution
+        self.duals = duals
+        self.status = status
+
+        return status
+
+    def solve(
+        self,
+        solver="cbc",
+        cmdline_options=None,
+        logfile=None,
+        keepfiles=False,
+        tmpdir=None,
+    ):
+        r"""
+        Writes the problem as MPS, solves it with the executable of `solver` (only cbc is
+        supported) and reads the solution.
+        """
+        if solver != "cbc":
+            raise NotImplementedError(
+                f"Solving matrix models with solver '{solver}' is not supported."
+            )
+
+        tmpdir = tmpdir or os.path.dirname(os.path.abspath(logfile or "."))
+        mps_file = os.path.join(tmpdir, "matrix_model.mps")
+        solution_file = os.path.join(tmpdir, "matrix_model.sol")
+
+        self.write_mps(mps_file)
+
+        cmd = [solver]
+        for key, value in (cmdline_options or {}).items():
+            cmd.extend([f"-{key}", str(value)])
+        cmd.extend(
+            [
+                "-printingOptions",
+                "all",
+                "-import",
+                mps_file,
+                "-solve",
+                "-solu",
+                solution_file,
+            ]
+        )
+
+        logger.info(f"Solving matrix model with '{' '.join(cmd)}'.")
+
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+        if logfile is not None:
+            with open(logfile, "w") as f:
+                f.write(output.stdout)
+
+        status = self.read_solution(solution_file)
+
+        if not keepfiles:
+            os.remove(mps_file)
+            os.remove(solution_file)
+
+        logger.info(f"Solved matrix model: {status}")
+
+        if not re.match("Optimal", status):
+            logger.warning(f"Solver did not find an optimal solution: '{status}'.")
+
+        return status
+
+    def objective(self):
+        r"""Returns the value of the objective of the solution."""
+        return float(self.cost @ self.solution)
+
+    def results(self, duals=False):
+        r"""
+        Returns the solution in the structure of `oemof.solph.processing.results`: a dict with
+        scalars (Series) and sequences (DataFrame) per flow (i, o) and node (n, None).
+
+        If `duals` is True, the duals of the bus balances are added to the sequences of the
+        buses.
+        """
+        sequences = defaultdict(dict)
+        scalars = defaultdict(dict)
+
+        for name, variables in self.variables.items():
+            column = name.split(".")[-1]
+            values = self.solution[variables.columns]
+            for key, value in zip(variables.result_keys, values):
+                if variables.timeindexed:
+                    sequences[key][column] = value
+                else:
+                    scalars[key][column] = value
+
+        if duals:
+            for bus in self._balanced_buses:
+                rows = self.constraints[f"Bus.balance[{bus.label}]"]
+                sequences[(bus, None)]["duals"] = self.duals[rows]
+
+        results = {}
+        for key in set(sequences) | set(scalars):
+            df = pd.DataFrame(sequences.get(key, {}), index=self.es.timeindex)
+            df = df.reindex(sorted(df.columns), axis=1)
+            df.columns.name = "variable_name"
+
+            series = pd.Series(scalars.get(key, {}), dtype=float).sort_index()
+            series.index.name = "variable_name"
+
+            results[key] = {"scalars": series, "sequences": df}
+
+        return results
+
+    def meta_results(self):
+        r"""Returns meta results with the objective and the status of the solver."""
+        return {
+            "objective": self.objective(),
+            "problem": {
+                "Number of constraints": self.n_rows,
+                "Number of variables": self.n_columns,
+                "Number of nonzeros": sum(len(vals) for vals in self._vals),
+            },
+            "solver": {"Status": self.status},
+        }
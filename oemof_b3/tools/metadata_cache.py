@@ -0,0 +1,275 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module caches the metadata (``datapackage.json``) that oemof.tabular infers for an
+EnergyDatapackage. The schema only depends on the model structure and the facade attributes,
+so it is inferred once per model structure and reused for all scenarios that share it. On reuse,
+only the scenario name and the resource paths are patched in and the cached schema is validated
+against the actual data.
+"""
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+from oemof_b3 import model
+from oemof_b3.tools.data_processing import load_json, save_json
+from oemof_b3.model import (
+    bus_attrs_update,
+    component_attrs_update,
+    facade_attsr_update,
+)
+
+logger = logging.getLogger(__name__)
+
+FOREIGN_KEY_DESCRIPTORS_FILE = os.path.join(
+    os.path.dirname(model.__file__), "foreign_key_descriptors.json"
+)
+
+METADATA_FILENAME = "datapackage.json"
+
+NUMERIC_TYPES = ["integer", "number"]
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def hash_model_structure(model_structure, foreign_keys_update):
+    r"""
+    Returns a hash of everything the inferred schema of an EnergyDatapackage depends on: the model
+    structure, the updates of bus and component attributes, the facade attributes and the foreign
+    keys.
+
+    Parameters
+    ----------
+    model_structure : dict
+        Model structure with regions, links, busses and components
+    foreign_keys_update : dict
+        Update of the foreign keys passed to `infer_metadata`
+
+    Returns
+    -------
+    key : str
+        Hex digest of the sha256 hash
+    """
+    facade_attrs = {
+        f_name: _read_text(os.path.join(facade_attsr_update, f_name))
+        for f_name in sorted(os.listdir(facade_attsr_update))
+    }
+
+    content = {
+        "model_structure": model_structure,
+        "bus_attrs_update": bus_attrs_update,
+        "component_attrs_update": component_attrs_update,
+        "foreign_keys_update": foreign_keys_update,
+        "facade_attrs": facade_attrs,
+        "foreign_key_descriptors": _read_text(FOREIGN_KEY_DESCRIPTORS_FILE),
+    }
+
+    dumped = json.dumps(content, sort_keys=True, default=str)
+
+    return hashlib.sha256(dumped.encode("utf-8")).hexdigest()
+
+
+def update_metadata(basepath, entries):
+    r"""
+    Adds `entries` to the top level of the metadata of the datapackage in `basepath`.
+
+    Parameters
+    ----------
+    basepath : str
+        Path of the datapackage
+    entries : dict
+        Entries to add
+
+    Returns
+    -------
+    None
+    """
+    metadata_file = os.path.join(basepath, METADATA_FILENAME)
+
+    metadata = load_json(metadata_file)
+
+    metadata.update(entries)
+
+    save_json(metadata, metadata_file)
+
+
+def _reconcile_field_type(field, column, resource_name):
+    r"""
+    Checks if the data in `column` can be read with the type of `field`. Integer fields that
+    contain floats are widened to numbers and string fields that are numeric (e.g. because they
+    were empty when the metadata was inferred) get a numeric type. Raises a ValueError if the data
+    cannot be read with the cached type.
+    """
+    data = column.dropna()
+
+    if data.empty:
+        return field
+
+    is_numeric = pd.api.types.is_numeric_dtype(data) and not pd.api.types.is_bool_dtype(
+        data
+    )
+
+    field_type = field["type"]
+
+    if field_type == "integer" and is_numeric and not (data % 1 == 0).all():
+        logger.info(
+            f"Field '{field['name']}' of resource '{resource_name}' contains floats. "
+            f"Changing its type from 'integer' to 'number'."
+        )
+        return dict(field, type="number")
+
+    if field_type == "string" and is_numeric:
+        new_type = "integer" if (data % 1 == 0).all() else "number"
+        logger.info(
+            f"Field '{field['name']}' of resource '{resource_name}' is numeric. "
+            f"Changing its type from 'string' to '{new_type}'."
+        )
+        return dict(field, type=new_type)
+
+    if field_type in NUMERIC_TYPES and not is_numeric:
+        raise ValueError(
+            f"Field '{field['name']}' of resource '{resource_name}' is of type '{field_type}' "
+            f"in the cached metadata, but contains non-numeric data."
+        )
+
+    if field_type == "boolean" and not data.isin([True, False]).all():
+        raise ValueError(
+            f"Field '{field['name']}' of resource '{resource_name}' is of type 'boolean' "
+            f"in the cached metadata, but contains non-boolean data."
+        )
+
+    return field
+
+
+def patch_and_validate_descriptor(descriptor, basepath, name):
+    r"""
+    Patches a cached descriptor with the name of the datapackage and the paths of its resources
+    and validates it against the data in `basepath`.
+
+    Raises a ValueError if resources or fields of the cached descriptor and the csv files in
+    `basepath` diverge.
+
+    Parameters
+    ----------
+    descriptor : dict
+        Cached metadata
+    basepath : str
+        Path of the datapackage
+    name : str
+        Name of the datapackage, i.e. the scenario name
+
+    Returns
+    -------
+    patched : dict
+        Metadata of the datapackage in `basepath`
+    """
+    patched = dict(descriptor, name=name)
+
+    data_files = set()
+    for directory in ["elements", "sequences"]:
+        dir_path = os.path.join(basepath, "data", directory)
+        if os.path.exists(dir_path):
+            data_files.update(
+                f"data/{directory}/{f_name}"
+                for f_name in os.listdir(dir_path)
+                if f_name.endswith(".csv")
+            )
+
+    resources = []
+    for resource in descriptor["resources"]:
+        directory = os.path.basename(os.path.dirname(resource["path"]))
+        path = f"data/{directory}/{resource['name']}.csv"
+
+        if path not in data_files:
+            raise ValueError(
+                f"Resource '{resource['name']}' of the cached metadata has no data in "
+                f"'{basepath}'. Cached metadata and datapackage diverge."
+            )
+        data_files.remove(path)
+
+        data = pd.read_csv(os.path.join(basepath, path))
+
+        field_names = [field["name"] for field in resource["schema"]["fields"]]
+        if field_names != list(data.columns):
+            raise ValueError(
+                f"Columns of resource '{resource['name']}' diverge from the cached metadata.\n"
+                f"Cached: {field_names}\nActual: {list(data.columns)}"
+            )
+
+        fields = [
+            _reconcile_field_type(field, data[field["name"]], resource["name"])
+            for field in resource["schema"]["fields"]
+        ]
+
+        schema = dict(resource["schema"], fields=fields)
+
+        resources.append(dict(resource, path=path, schema=schema))
+
+    if data_files:
+        raise ValueError(
+            f"There are resources in '{basepath}' that are not in the cached metadata: "
+            f"{sorted(data_files)}. Cached metadata and datapackage diverge."
+        )
+
+    patched["resources"] = resources
+
+    return patched
+
+
+def infer_metadata_cached(
+    edp, basepath, name, model_structure, foreign_keys_update, cache_dir
+):
+    r"""
+    Infers the metadata of an EnergyDatapackage that has been saved to `basepath`. If metadata
+    for the same model structure has already been inferred, it is taken from `cache_dir` instead.
+
+    Parameters
+    ----------
+    edp : oemoflex.EnergyDatapackage
+        EnergyDatapackage that has been saved to `basepath`
+    basepath : str
+        Path of the datapackage
+    name : str
+        Name of the datapackage, i.e. the scenario name
+    model_structure : dict
+        Model structure with regions, links, busses and components
+    foreign_keys_update : dict
+        Update of the foreign keys passed to `infer_metadata`
+    cache_dir : str
+        Directory of the cached metadata
+
+    Returns
+    -------
+    None
+    """
+    key = hash_model_structure(model_structure, foreign_keys_update)
+
+    cache_file = os.path.join(cache_dir, f"{key}.json")
+
+    metadata_file = os.path.join(basepath, METADATA_FILENAME)
+
+    if os.path.exists(cache_file):
+        descriptor = patch_and_validate_descriptor(
+            load_json(cache_file), basepath, name
+        )
+
+        save_json(descriptor, metadata_file)
+
+        logger.info(f"Used cached metadata '{cache_file}'.")
+
+    else:
+        edp.infer_metadata(foreign_keys_update=foreign_keys_update)
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+        save_json(load_json(metadata_file), cache_file)
+
+        logger.info(f"Saved inferred metadata to cache '{cache_file}'.")
@@ -0,0 +1,185 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module profiles the phases of an optimization, e.g. loading the EnergySystem, building the
+model, adding constraints, solving and extracting results. For each phase, the wall time and the
+resident set size (RSS) of the process are measured. The RSS is sampled in a background thread to
+capture the peak within the phase. The solver runs in a separate process, thus its memory is
+recorded as peak RSS of all child processes.
+
+Further, the number of constraints and variables per block of a pyomo model are counted.
+All measurements are saved as json.
+"""
+import contextlib
+import os
+import threading
+import time
+
+from pyomo import environ as po
+
+from oemof_b3.tools.data_processing import save_json
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+MB = 1024**2
+
+
+def get_rss():
+    r"""Returns the resident set size of the process in bytes or None if it is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def get_children_peak_rss():
+    r"""Returns the peak resident set size of all child processes in bytes or None."""
+    if resource is None:
+        return None
+    # ru_maxrss is given in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+def _to_mb(value):
+    return None if value is None else round(value / MB, 3)
+
+
+class _RSSSampler(threading.Thread):
+    r"""Samples the resident set size until it is stopped and keeps the peak."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = get_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss = get_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def count_model_components(model):
+    r"""
+    Counts constraints and variables per top-level component and block of a pyomo model.
+
+    Constraints and variables of blocks (e.g. NonConvexFlow) are counted in total per block.
+    Constraints and variables on the model itself (e.g. constraint_idle_time, equate_flows_*,
+    integral_limit_emission_factor_constraint) are counted per component.
+
+    Returns
+    -------
+    counts : dict
+        Number of constraints and variables per component name
+    """
+    counts = {}
+
+    for block in model.component_objects(po.Block, descend_into=False):
+        counts[block.local_name] = {
+            "constraints": sum(
+                1 for _ in block.component_data_objects(po.Constraint, active=True)
+            ),
+            "variables": sum(1 for _ in block.component_data_objects(po.Var)),
+        }
+
+    for constraint in model.component_objects(po.Constraint, descend_into=False):
+        counts[constraint.local_name] = {"constraints": len(constraint), "variables": 0}
+
+    for var in model.component_objects(po.Var, descend_into=False):
+        counts[var.local_name] = {"constraints": 0, "variables": len(var)}
+
+    return counts
+
+
+class Profiler:
+    r"""
+    Measures wall time and memory of phases and counts model components.
+
+    Phases with the same name (e.g. solving the windows of a rolling horizon) are accumulated.
+
+    Examples
+    --------
+    >>> profiler = Profiler()
+    >>> with profiler.phase("build"):
+    ...     pass
+    >>> profiler.phases["build"]["calls"]
+    1
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.phases = {}
+        self.blocks = {}
+        self.totals = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        sampler = _RSSSampler(self.interval)
+        sampler.start()
+
+        rss_start = get_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            rss_peak = sampler.stop()
+            rss_end = get_rss()
+
+            record = self.phases.setdefault(
+                name,
+                {
+                    "calls": 0,
+                    "time": 0.0,
+                    "rss_start": _to_mb(rss_start),
+                    "rss_end": None,
+                    "rss_peak": None,
+                    "children_rss_peak": None,
+                },
+            )
+            record["calls"] += 1
+            record["time"] += duration
+            record["rss_end"] = _to_mb(rss_end)
+            record["rss_peak"] = max(
+                filter(None, [record["rss_peak"], _to_mb(rss_peak)]), default=None
+            )
+            record["children_rss_peak"] = _to_mb(get_children_peak_rss())
+
+    def count(self, model):
+        r"""Counts constraints and variables of `model`. Counts of several models (e.g. windows
+        of a rolling horizon) are summed up."""
+        for name, counts in count_model_components(model).items():
+            record = self.blocks.setdefault(name, {"constraints": 0, "variables": 0})
+            record["constraints"] += counts["constraints"]
+            record["variables"] += counts["variables"]
+
+        for key, value in [
+            ("constraints", model.nconstraints()),
+            ("variables", model.nvariables()),
+        ]:
+            self.totals[key] = self.totals.get(key, 0) + value
+
+    def to_dict(self):
+        return {"phases": self.phases, "blocks": self.blocks, "totals": self.totals}
+
+    def save(self, path):
+        r"""Saves the measurements as json to `path`."""
+        save_json(self.to_dict(), path)
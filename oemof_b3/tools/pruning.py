@@ -0,0 +1,347 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module prunes an EnergySystem before the oemof.solph.Model is built:
+
+- Inert nodes are removed. These are sources, sinks, transformers and storages without
+  investment whose flows are all zero, e.g. because their capacity is zero. Transformers are
+  inert as soon as all their outputs are zero. Nodes whose flows only lead to inert nodes become
+  inert as well. Buses without any flow left are removed, too.
+- Fixed flows of sources and sinks, e.g. of `volatile` and `load` components with a profile, are
+  summed per bus and replaced by a single fixed flow per bus and direction, whose variable costs
+  are weighted so that the objective does not change. Flows with further attributes (e.g.
+  `emission_factor` or keywords of constraints) are kept, as they may be used by constraints.
+
+The pruned EnergySystem shares the nodes with the original one. The removed flows are detached
+from the nodes until the results are restored with :meth:`Pruning.restore`, which adds zero or
+fixed results for all pruned flows and storages.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from oemof.solph import Bus, EnergySystem, Flow, Sink, Source, Transformer
+from oemof.solph.components import GenericStorage
+
+logger = logging.getLogger(__name__)
+
+# nodes whose flows are all zero if they are inert
+PRUNABLE = (Source, Sink, Transformer, GenericStorage)
+
+# attributes of fixed flows that may differ from the defaults of a flow when flows are merged
+MERGEABLE_ATTRIBUTES = ["fix", "nominal_value", "variable_costs", "min", "max"]
+
+
+def _values(sequence, n_timesteps):
+    return np.array([sequence[t] for t in range(n_timesteps)], dtype=float)
+
+
+def _edges(node):
+    return [(node, o) for o in node.outputs] + [(i, node) for i in node.inputs]
+
+
+def is_zero_flow(flow, n_timesteps):
+    r"""Returns True if `flow` is zero in all timesteps because of its parameters."""
+    if flow.investment is not None or flow.nominal_value is None:
+        return False
+
+    if flow.nominal_value == 0:
+        return True
+
+    bound = flow.fix if flow.fix[0] is not None else flow.max
+    return not _values(bound, n_timesteps).any()
+
+
+def is_mergeable_fixed_flow(flow):
+    r"""
+    Returns True if `flow` is fixed and all other attributes are at their defaults, so that its
+    values can be added to the values of other fixed flows.
+    """
+    if flow.fix[0] is None or flow.nominal_value is None:
+        return False
+
+    default = Flow()
+    for attribute, value in vars(flow).items():
+        if attribute in MERGEABLE_ATTRIBUTES or attribute.startswith("_"):
+            continue
+        if attribute not in vars(default):
+            # custom attribute, e.g. emission_factor or keyword of a constraint
+            if value:
+                return False
+            continue
+        default_value = getattr(default, attribute)
+        if attribute in ["positive_gradient", "negative_gradient"]:
+            if value["ub"][0] is not None:
+                return False
+        elif value is not default_value and value != default_value:
+            return False
+
+    return True
+
+
+class Pruning:
+    r"""
+    Record of the nodes and flows removed from an EnergySystem by :func:`prune`.
+
+    Parameters
+    ----------
+    es : oemof.solph.EnergySystem
+        The original EnergySystem
+    """
+
+    def __init__(self, es):
+        self.es = es
+        self.n_timesteps = len(es.timeindex)
+
+        # flows detached from the nodes as (i, o): flow
+        self.edges = {}
+
+        # values of the pruned flows as (i, o): array
+        self.flows = {}
+
+        self.nodes = []
+        self.storages = []
+        self.buses = []
+        self.aggregated = []
+
+    @property
+    def counts(self):
+        r"""Returns the number of removed nodes, buses and flows."""
+        return {
+            "nodes": len(self.nodes),
+            "buses": len(self.buses),
+            "zero_flows": sum(not values.any() for values in self.flows.values()),
+            "fixed_flows": sum(values.any() for values in self.flows.values()),
+            "aggregated_nodes": len(self.aggregated),
+        }
+
+    def detach(self, node):
+        r"""Detaches all flows of `node` and records their values."""
+        for i, o in _edges(node):
+            flow = i.outputs[o]
+            self.edges[(i, o)] = flow
+            del i.outputs[o]
+
+    def restore_edges(self):
+        r"""Attaches the detached flows again."""
+        for (i, o), flow in self.edges.items():
+            i.outputs[o] = flow
+
+    def restore(self, results):
+        r"""
+        Attaches the detached flows again and returns `results` with zero or fixed results for
+        the pruned flows and storages. Results of aggregated nodes are removed.
+        """
+        return dict(self.restore_items(results.items()))
+
+    def restore_items(self, results):
+        r"""
+        Like :meth:`restore`, but for an iterable of (key, result), e.g. results yielded per
+        flow or node. Yields (key, result).
+        """
+        self.restore_edges()
+
+        aggregated = set(self.aggregated)
+        for key, value in results:
+            if not aggregated.intersection(key):
+                yield key, value
+
+        def _result(values, name):
+            sequences = pd.DataFrame({name: values}, index=self.es.timeindex)
+            sequences.columns.name = "variable_name"
+            scalars = pd.Series(dtype=float)
+            scalars.index.name = "variable_name"
+            return {"scalars": scalars, "sequences": sequences}
+
+        for key, values in self.flows.items():
+            yield key, _result(values, "flow")
+
+        for storage in self.storages:
+            yield (storage, None), _result(
+                np.zeros(self.n_timesteps), "storage_content"
+            )
+
+
+def _is_inert(node, zero_flows, n_timesteps):
+    if not isinstance(node, PRUNABLE):
+        return False
+
+    if isinstance(node, GenericStorage) and (
+        node.investment is not None or node.nominal_storage_capacity != 0
+    ):
+        return False
+
+    edges = _edges(node)
+    if not edges:
+        return False
+
+    # all flows of transformers are zero if all outputs or all inputs are zero
+    if isinstance(node, Transformer):
+        for side in [
+            [(node, o) for o in node.outputs],
+            [(i, node) for i in node.inputs],
+        ]:
+            if side and all(
+                edge in zero_flows
+                and _values(
+                    node.conversion_factors[edge[edge[0] is node]], n_timesteps
+                ).all()
+                for edge in side
+            ):
+                return True
+
+    return all(edge in zero_flows for edge in edges)
+
+
+def _zero_bus_flows(bus, zero_flows):
+    r"""
+    Returns the flows of a balanced bus that are zero, but not yet in `zero_flows`: all outputs
+    if all inputs are zero and vice versa, as flows are not negative.
+    """
+    if not bus.balanced:
+        return set()
+
+    inputs = {(i, bus) for i in bus.inputs}
+    outputs = {(bus, o) for o in bus.outputs}
+
+    zero = set()
+    if inputs <= zero_flows:
+        zero.update(outputs)
+    if outputs <= zero_flows:
+        zero.update(inputs)
+
+    return zero - zero_flows
+
+
+def _prune_inert(es, pruning):
+    flows = es.flows()
+    zero_flows = {
+        edge for edge, flow in flows.items() if is_zero_flow(flow, pruning.n_timesteps)
+    }
+
+    inert = []
+    found = True
+    while found:
+        found = False
+        for node in es.nodes:
+            if isinstance(node, Bus):
+                edges = _zero_bus_flows(node, zero_flows)
+                if edges:
+                    zero_flows.update(edges)
+                    found = True
+                continue
+            if node in inert or not _is_inert(node, zero_flows, pruning.n_timesteps):
+                continue
+            inert.append(node)
+            # flows of inert nodes are zero
+            zero_flows.update(_edges(node))
+            found = True
+
+    for node in inert:
+        for edge in _edges(node):
+            pruning.flows[edge] = np.zeros(pruning.n_timesteps)
+        pruning.detach(node)
+
+        if isinstance(node, GenericStorage):
+            pruning.storages.append(node)
+        pruning.nodes.append(node)
+
+    return inert
+
+
+def _merge_fixed(es, pruning, removed):
+    groups = {}
+    for node in es.nodes:
+        if node in removed or not isinstance(node, (Source, Sink)):
+            continue
+        edges = _edges(node)
+        if len(edges) != 1:
+            continue
+        (i, o) = edges[0]
+        bus = o if i is node else i
+        flow = i.outputs[o]
+        if isinstance(bus, Bus) and is_mergeable_fixed_flow(flow):
+            groups.setdefault((bus, i is node), []).append(node)
+
+    aggregated = []
+    for (bus, supply), nodes in groups.items():
+        if len(nodes) < 2:
+            continue
+
+        total = np.zeros(pruning.n_timesteps)
+        costs = np.zeros(pruning.n_timesteps)
+        for node in nodes:
+            (i, o) = _edges(node)[0]
+            flow = i.outputs[o]
+            values = _values(flow.fix, pruning.n_timesteps) * flow.nominal_value
+            total += values
+            costs += _values(flow.variable_costs, pruning.n_timesteps) * values
+
+            pruning.flows[(i, o)] = values
+            pruning.detach(node)
+            pruning.nodes.append(node)
+
+        nominal_value = np.abs(total).max()
+        if nominal_value == 0:
+            continue
+
+        # weighted variable costs give the same costs as the single flows
+        flow = Flow(
+            nominal_value=nominal_value,
+            fix=list(total / nominal_value),
+            variable_costs=list(
+                np.divide(costs, total, out=np.zeros_like(costs), where=total != 0)
+            ),
+        )
+        if supply:
+            node = Source(label=f"{bus.label}-fixed_supply", outputs={bus: flow})
+        else:
+            node = Sink(label=f"{bus.label}-fixed_demand", inputs={bus: flow})
+
+        aggregated.append(node)
+        pruning.aggregated.append(node)
+
+    return aggregated
+
+
+def prune(es, fixed=True):
+    r"""
+    Returns an EnergySystem without inert nodes and with merged fixed flows (if `fixed` is
+    True) together with the :class:`Pruning` to restore the results.
+
+    Parameters
+    ----------
+    es : oemof.solph.EnergySystem
+        The EnergySystem to prune
+    fixed : bool
+        Merge fixed flows of sources and sinks per bus
+
+    Returns
+    -------
+    pruned : oemof.solph.EnergySystem
+        EnergySystem sharing the remaining nodes with `es`
+    pruning : Pruning
+        The record of the pruned nodes and flows
+    """
+    pruning = Pruning(es)
+
+    removed = set(_prune_inert(es, pruning))
+    aggregated = _merge_fixed(es, pruning, removed) if fixed else []
+    removed.update(pruning.nodes)
+
+    for node in es.nodes:
+        if isinstance(node, Bus) and node not in removed and not _edges(node):
+            pruning.buses.append(node)
+            removed.add(node)
+
+    pruned = EnergySystem(timeindex=es.timeindex, timeincrement=es.timeincrement)
+    pruned.add(*[node for node in es.nodes if node not in removed], *aggregated)
+
+    logger.info(
+        "Pruned "
+        + ", ".join(f"{count} {name}" for name, count in pruning.counts.items())
+        + "."
+    )
+
+    return pruned, pruning
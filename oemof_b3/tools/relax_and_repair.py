@@ -0,0 +1,292 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module solves an oemof.solph.Model with nonconvex flows (e.g. the methanation reactor with
+`nonconvex` or the `variable_rate_with_min` option) heuristically instead of as MILP:
+
+1. The integer variables are relaxed and the LP relaxation is solved. Its objective is a lower
+   bound of the objective of the MILP.
+2. The relaxed status of each nonconvex flow is rounded and repaired: on-periods shorter than
+   the minimum uptime are extended, off-periods shorter than the minimum downtime between
+   on-periods are closed and conflicts with the idle time (e.g. the output of the methanation
+   reactor must not be active within n timesteps after the input was active) are resolved in
+   favour of the flow with the higher relaxed status. On-periods that become shorter than the
+   minimum uptime by this are switched off.
+3. The statuses are fixed and the LP is solved again, which gives a feasible solution, whose
+   objective is an upper bound. Further integer variables (e.g. the number of units that are on
+   of a :class:`oemof_b3.facades.MethanationReactorFleet`) are rounded to the nearest integer.
+
+The lower bound is written to the solver results of the model, so that it is reported as
+'Lower bound' in `oemof.solph.processing.meta_results` next to the objective. If the repaired
+statuses are infeasible, the MILP is solved instead.
+"""
+import logging
+import time
+
+import numpy as np
+from pyomo import environ as po
+
+from oemof_b3.tools.solver_log import is_infeasible
+
+logger = logging.getLogger(__name__)
+
+RELAXED_DOMAINS = {
+    "Binary": po.UnitInterval,
+    "Boolean": po.UnitInterval,
+    "NonNegativeIntegers": po.NonNegativeReals,
+    "PositiveIntegers": po.PositiveReals,
+    "NonPositiveIntegers": po.NonPositiveReals,
+    "NegativeIntegers": po.NegativeReals,
+}
+
+
+def relax(model):
+    r"""
+    Relaxes the integer variables of `model` to continuous variables with the same bounds.
+
+    Returns
+    -------
+    domains : list of tuple
+        (variable, domain) of the relaxed variables to restore them with :func:`restore`
+    """
+    domains = []
+    for var in model.component_data_objects(po.Var):
+        if var.is_continuous():
+            continue
+        domains.append((var, var.domain))
+        var.domain = RELAXED_DOMAINS.get(var.domain.name, po.Reals)
+    return domains
+
+
+def restore(domains):
+    r"""Restores the domains of variables relaxed by :func:`relax`."""
+    for var, domain in domains:
+        var.domain = domain
+
+
+def _runs(status):
+    r"""Returns (start, stop) of the on-periods of a status array."""
+    padded = np.concatenate([[0], status, [0]])
+    changes = np.flatnonzero(np.diff(padded))
+    return list(zip(changes[::2], changes[1::2]))
+
+
+def repair_up_down_time(status, minimum_uptime=0, minimum_downtime=0):
+    r"""
+    Extends on-periods shorter than `minimum_uptime` and closes off-periods shorter than
+    `minimum_downtime` between on-periods.
+    """
+    status = status.copy()
+
+    if minimum_downtime:
+        runs = _runs(status)
+        for (_, stop), (start, _) in zip(runs[:-1], runs[1:]):
+            if start - stop < minimum_downtime:
+                status[stop:start] = 1
+
+    if minimum_uptime:
+        for start, stop in _runs(status):
+            if stop - start < minimum_uptime:
+                status[start : start + minimum_uptime] = 1
+
+    return status
+
+
+def drop_short_runs(status, minimum_uptime=0):
+    r"""Switches off on-periods shorter than `minimum_uptime`."""
+    status = status.copy()
+    if minimum_uptime:
+        for start, stop in _runs(status):
+            if stop - start < minimum_uptime:
+                status[start:stop] = 0
+    return status
+
+
+def repair_idle_time(status_1, status_2, n, relaxed_1, relaxed_2, initial_status=None):
+    r"""
+    Resolves conflicts with the idle time: `status_2` can only be on at t if `status_1` has
+    been off from t - n to t. Conflicts are resolved in favour of the flow with the higher
+    relaxed status in the conflicting timesteps. Statuses before the first timestep
+    (`initial_status` of flow 1) cannot be changed.
+
+    Returns
+    -------
+    status_1, status_2 : np.ndarray
+        Repaired statuses
+    """
+    status_1 = status_1.copy()
+    status_2 = status_2.copy()
+    initial_status = np.asarray(initial_status or [], dtype=float)[-n:]
+
+    for t in np.flatnonzero(status_2):
+        window = slice(max(t - n, 0), t + 1)
+        conflicts = np.flatnonzero(status_1[window]) + window.start
+        initial = initial_status[len(initial_status) - max(n - t, 0) :]
+
+        if initial.any() or (
+            len(conflicts) and relaxed_2[t] < relaxed_1[conflicts].mean()
+        ):
+            status_2[t] = 0
+        else:
+            status_1[conflicts] = 0
+
+    return status_1, status_2
+
+
+def _get_status(model):
+    r"""Returns the status variables per nonconvex flow (i, o) ordered by timestep."""
+    if not hasattr(model, "NonConvexFlow"):
+        return {}
+
+    status = model.NonConvexFlow.status
+    return {
+        (i, o): [status[i, o, t] for t in model.TIMESTEPS]
+        for i, o in model.NonConvexFlow.NONCONVEX_FLOWS
+    }
+
+
+def round_and_repair(model, threshold=0.5, idle_time=None):
+    r"""
+    Rounds the relaxed statuses of the nonconvex flows of `model` and repairs them.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model
+        Model with the solution of the LP relaxation
+    threshold : float
+        Relaxed status from which a flow is switched on
+    idle_time : tuple
+        (f1, f2, n, initial_status): flows (i, o) between which the idle time of n timesteps is
+        set and status of f1 before the first timestep
+
+    Returns
+    -------
+    statuses : dict
+        Repaired status (array) per nonconvex flow (i, o)
+    changes : int
+        Number of statuses changed by the repair
+    """
+    relaxed = {
+        flow: np.array([var.value or 0 for var in variables], dtype=float)
+        for flow, variables in _get_status(model).items()
+    }
+    rounded = {
+        flow: (values >= threshold).astype(float) for flow, values in relaxed.items()
+    }
+
+    statuses = {}
+    for (i, o), status in rounded.items():
+        nonconvex = model.flows[i, o].nonconvex
+        statuses[(i, o)] = repair_up_down_time(
+            status,
+            nonconvex.minimum_uptime or 0,
+            nonconvex.minimum_downtime or 0,
+        )
+
+    if idle_time is not None:
+        f1, f2, n, initial_status = idle_time
+        if f1 in statuses and f2 in statuses:
+            statuses[f1], statuses[f2] = repair_idle_time(
+                statuses[f1],
+                statuses[f2],
+                n,
+                relaxed[f1],
+                relaxed[f2],
+                initial_status,
+            )
+            for flow in [f1, f2]:
+                statuses[flow] = drop_short_runs(
+                    statuses[flow], model.flows[flow].nonconvex.minimum_uptime or 0
+                )
+
+    changes = int(sum((statuses[flow] != rounded[flow]).sum() for flow in statuses))
+
+    return statuses, changes
+
+
+def solve_relax_and_repair(model, solve, threshold=0.5, idle_time=None):
+    r"""
+    Solves `model` by LP relaxation, rounding and repair of the statuses of the nonconvex flows
+    and a second LP with the statuses fixed.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model
+        The model
+    solve : callable
+        Solves the model, signature solve(model)
+    threshold : float
+        Relaxed status from which a flow is switched on
+    idle_time : tuple
+        See :func:`round_and_repair`
+
+    Returns
+    -------
+    info : dict
+        Lower bound (LP relaxation), objective, gap, number of repaired statuses, times and
+        whether the MILP had to be solved instead
+    """
+    start = time.perf_counter()
+
+    domains = relax(model)
+    # variables fixed here, variables fixed before (e.g. by the caller) stay fixed
+    fixed = []
+    try:
+        solve(model)
+        lower_bound = po.value(model.objective)
+        time_relaxed = time.perf_counter() - start
+
+        statuses, changes = round_and_repair(model, threshold, idle_time)
+        variables = _get_status(model)
+        for flow, status in statuses.items():
+            for var, value in zip(variables[flow], status):
+                if not var.fixed:
+                    var.fix(value)
+                    fixed.append(var)
+
+        # further integer variables, e.g. the number of units that are on of fleets
+        for var, _ in domains:
+            if not var.fixed:
+                var.fix(round(var.value or 0))
+                fixed.append(var)
+
+        solve(model)
+        infeasible = is_infeasible(model)
+    finally:
+        for var in fixed:
+            var.unfix()
+        restore(domains)
+
+    if infeasible:
+        logger.warning(
+            "The statuses repaired from the LP relaxation are infeasible. Solving the MILP "
+            "instead."
+        )
+        solve(model)
+
+    objective = po.value(model.objective)
+    gap = (objective - lower_bound) / abs(objective) if objective else 0.0
+
+    # report the bound of the LP relaxation as lower bound of the solution
+    solver_results = getattr(model, "solver_results", None)
+    if solver_results is not None:
+        solver_results.problem.lower_bound = lower_bound
+
+    info = {
+        "lower_bound": lower_bound,
+        "objective": objective,
+        "gap": gap,
+        "nonconvex_flows": len(statuses),
+        "repaired_statuses": changes,
+        "milp": infeasible,
+        "time_relaxed": time_relaxed,
+        "time": time.perf_counter() - start,
+    }
+
+    logger.info(
+        f"Solved LP relaxation with bound {lower_bound} and repaired {changes} statuses of "
+        f"{len(statuses)} nonconvex flows. Objective {objective}, gap {gap:.4%}."
+    )
+
+    return info
@@ -0,0 +1,200 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module extracts the results of a solved oemof.solph.Model in the structure of
+`oemof.solph.processing.results`, but without building a DataFrame with one row per variable.
+
+`oemof.solph.processing.results` maps, groups, sorts and pivots every single variable value in
+pandas, which takes longer than building the model for models with 8760 timesteps and hundreds
+of flows. Here, the values of each pyomo variable are read at once with `get_values` into a
+NumPy array and written into one array per flow or node indexed by variable and timestep, from
+which the scalars and sequences are sliced. :func:`iter_results` yields the results flow by
+flow, e.g. to write them without holding the results of all flows.
+"""
+from collections import defaultdict
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+from oemof.network.network import Node
+from oemof.solph import processing
+from pyomo.core.base.piecewise import IndexedPiecewise
+from pyomo.core.base.var import Var
+
+
+def _is_node_tuple(index):
+    return all(isinstance(n, Node) for n in index)
+
+
+def _split_indices(var, indices):
+    r"""
+    Returns the oemof tuples and timesteps of the `indices` of `var` as in
+    `oemof.solph.processing`. The oemof tuples are returned as function of the position in
+    `indices`, so that they are not built for all indices at once. Timesteps are None for
+    scalars. The indices of a pyomo variable are assumed to be of the same kind.
+    """
+    first = indices[0]
+
+    if isinstance(first, Node):
+        return lambda n: (indices[n],), None
+
+    if not isinstance(first, tuple):
+        # standalone variables are identified by their block and name
+        name = (var.name.split(".")[0], var.name.split(".")[-1])
+        if first is None:
+            return lambda n: name, None
+        return lambda n: name, indices
+
+    if _is_node_tuple(first):
+        return indices.__getitem__, None
+
+    return lambda n: indices[n][:-1], [index[-1] for index in indices]
+
+
+def iter_variable_values(model):
+    r"""
+    Yields the indices (list) and values (array) of the variables of `model` one by one as
+    (var, (indices, values)). The indices are those of the variable, no copies.
+    """
+    for var in model.component_objects(Var, descend_into=True):
+        # drop the auxiliary variables introduced by pyomo's Piecewise
+        if isinstance(var.parent_block().parent_component(), IndexedPiecewise):
+            continue
+
+        if not len(var):
+            continue
+
+        # bulk read of the values of all indices, faster than reading the values one by one
+        values = var.get_values()
+
+        yield var, (list(values), np.array(list(values.values()), dtype=float))
+
+
+def get_variable_values(model):
+    r"""
+    Returns the indices and values of all variables of `model` by variable.
+
+    Returns
+    -------
+    values : dict
+        Indices (list) and values (array) per pyomo variable
+    """
+    return dict(iter_variable_values(model))
+
+
+def _duals(model):
+    r"""Returns the duals of the bus balances of `model` as list per bus."""
+    duals = defaultdict(list)
+    if model.dual is not None:
+        balance = model.Bus.balance
+        for bus, t in sorted(balance.keys()):
+            duals[bus].append(model.dual[balance[bus, t]])
+    return duals
+
+
+def iter_results(model):
+    r"""
+    Yields the results of the solved `model` per flow or node as (key, result), see
+    :func:`results`.
+
+    The values of the variables are read at once, but the DataFrames are built per flow or
+    node, so that the results can be written one by one without holding all of them.
+    """
+    n_timesteps = len(model.es.timeindex)
+
+    # variable name -> (timesteps, values) per oemof tuple
+    columns = defaultdict(dict)
+    # the indices of a variable are released once they are grouped
+    for var, (indices, values) in iter_variable_values(model):
+        variable_name = var.name.split(".")[-1]
+        oemof_tuple_at, timesteps = _split_indices(var, indices)
+
+        if timesteps is not None:
+            timesteps = np.array(timesteps)
+            if not (
+                np.issubdtype(timesteps.dtype, np.integer)
+                and timesteps.min() >= 0
+                and timesteps.max() < n_timesteps
+            ):
+                yield from processing.results(model).items()
+                return
+
+        # indices of a flow or node are contiguous, e.g. (i, o, 0), (i, o, 1), ...
+        for oemof_tuple, group in groupby(range(len(indices)), key=oemof_tuple_at):
+            group = list(group)
+            positions = slice(group[0], group[-1] + 1)
+            column = (
+                None if timesteps is None else timesteps[positions],
+                values[positions],
+            )
+
+            if variable_name in columns[oemof_tuple]:
+                column = tuple(
+                    None if a is None else np.concatenate([a, b])
+                    for a, b in zip(columns[oemof_tuple][variable_name], column)
+                )
+            columns[oemof_tuple][variable_name] = column
+
+    # dual variables of the bus constraints
+    duals = _duals(model)
+
+    for oemof_tuple in sorted(columns):
+        # release the values of each flow or node once its result is built
+        variables = columns.pop(oemof_tuple)
+        variable_names = sorted(variables)
+
+        # scalars are written to the first timestep, as in the pivot of processing.results
+        array = np.full((n_timesteps, len(variable_names)), np.nan)
+        for j, variable_name in enumerate(variable_names):
+            timesteps, values = variables[variable_name]
+            if timesteps is None:
+                array[0, j] = values[0]
+            else:
+                array[timesteps, j] = values
+
+        df = pd.DataFrame(
+            array,
+            index=model.es.timeindex,
+            columns=pd.Index(variable_names, name="variable_name"),
+        )
+
+        # variables without any value are dropped like in processing.results
+        df = df.loc[:, df.notnull().any()]
+        if df.empty:
+            continue
+
+        condition = df.isnull().any()
+        try:
+            scalars = df.loc[:, condition].dropna().iloc[0]
+        except IndexError:
+            raise IndexError(
+                "Cannot access index on result data. "
+                "Did the optimization terminate without errors?"
+            )
+
+        key = oemof_tuple if len(oemof_tuple) > 1 else (oemof_tuple[0], None)
+        sequences = df.loc[:, ~condition]
+        if key[1] is None and key[0] in duals:
+            sequences = sequences.copy()
+            sequences["duals"] = duals.pop(key[0])
+
+        yield key, {"scalars": scalars, "sequences": sequences}
+
+    for bus, values in duals.items():
+        yield (bus, None), {
+            "sequences": pd.DataFrame({"duals": values}, index=model.es.timeindex),
+            "scalars": pd.Series(dtype=float),
+        }
+
+
+def results(model):
+    r"""
+    Returns the results of the solved `model` like `oemof.solph.processing.results`.
+
+    The result is a dict keyed by flows (i, o) and nodes (n, None) holding a Series of the
+    scalars and a DataFrame of the sequences, e.g. `results[(i, o)]["sequences"]["flow"]`.
+    Variables with a timestep not in the timesteps of the model are not supported, the results
+    are extracted with `oemof.solph.processing.results` then.
+    """
+    return dict(iter_results(model))
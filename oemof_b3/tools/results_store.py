@@ -0,0 +1,342 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module stores the results of an optimized EnergySystem in a compact, compressed columnar
+format instead of pickling the whole EnergySystem with `es.dump`:
+
+- ``results.npz``: compressed NumPy archive with the timeindex and one array per sequence
+  variable (e.g. 'flow', 'storage_content', 'duals') with one column per flow or node
+- ``results.json``: labels of the columns of the arrays, scalars and meta results
+- ``es_graph.oemof``: the pickled EnergySystem with its parameters, but without results
+
+The arrays are only read when they are accessed, so consumers load only the variables they ask
+for, e.g. :meth:`ResultsStore.sequences` for the flows or :attr:`ResultsStore.meta_results` for
+the objective.
+
+Results can be written component by component with :class:`ResultsWriter` as they are extracted
+from a model, so that the model is released before the store is written.
+
+EnergySystems dumped with `es.dump` are still restored by :func:`restore_energysystem`.
+"""
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from oemof.solph import EnergySystem
+
+RESULTS_ARRAYS = "results.npz"
+
+RESULTS_JSON = "results.json"
+
+GRAPH = "es_graph.oemof"
+
+ES_DUMP = "es_dump.oemof"
+
+SEQUENCES = "sequences/"
+
+
+def _label(element):
+    # keys of standalone variables, e.g. of the idle time, consist of strings
+    return getattr(element, "label", element)
+
+
+def _key(labels):
+    return tuple(labels)
+
+
+def _to_results(sequences, scalars, timeindex, nodes=None):
+    r"""
+    Returns sequences and scalars by key (labels) in the structure of
+    `oemof.solph.processing.results`. The keys are mapped to `nodes` if given.
+    """
+    if nodes is not None:
+        nodes = {node.label: node for node in nodes}
+
+    results = {}
+    for key in sorted(set(sequences) | set(scalars), key=str):
+        df = pd.DataFrame(sequences.get(key, {}), index=timeindex)
+        df = df.reindex(sorted(df.columns), axis=1)
+        df.columns.name = "variable_name"
+
+        series = pd.Series(scalars.get(key, {}), dtype=float).sort_index()
+        series.index.name = "variable_name"
+
+        if nodes is not None:
+            key = tuple(nodes.get(label, label) for label in key)
+        results[key] = {"scalars": series, "sequences": df}
+
+    return results
+
+
+class ResultsWriter:
+    r"""
+    Collects results per flow or node as arrays and writes them to a results store.
+
+    Results can be added as they are extracted from a model, e.g. from
+    :func:`oemof_b3.tools.results_extraction.iter_results`, so that the DataFrames of a
+    component are released right after it is added and the model can be released before the
+    store is written.
+
+    Parameters
+    ----------
+    timeindex : pd.DatetimeIndex
+        Timeindex of the EnergySystem
+    """
+
+    def __init__(self, timeindex):
+        self.timeindex = pd.DatetimeIndex(timeindex)
+
+        # array per variable name by key (labels)
+        self.sequences = defaultdict(dict)
+        self.scalars = {}
+
+    def __len__(self):
+        return len(set(self.sequences) | set(self.scalars))
+
+    def add(self, key, result):
+        r"""Adds the `result` (scalars and sequences) of the flow or node `key`."""
+        key = _key(_label(node) for node in key)
+
+        for variable_name, values in result["sequences"].items():
+            self.sequences[key][variable_name] = values.to_numpy(dtype=float)
+
+        if not result["scalars"].empty:
+            self.scalars[key] = {
+                str(name): float(value) for name, value in result["scalars"].items()
+            }
+
+    def update(self, results):
+        r"""Adds `results`, a dict or an iterable of (key, result)."""
+        if isinstance(results, dict):
+            results = results.items()
+
+        for key, result in results:
+            self.add(key, result)
+
+    def results(self, nodes=None):
+        r"""Returns the results in the structure of `oemof.solph.processing.results`."""
+        return _to_results(self.sequences, self.scalars, self.timeindex, nodes)
+
+    def write(self, es, path):
+        r"""
+        Writes the collected results and the meta results of `es` to a results store in
+        `path`. The EnergySystem is pickled without results, its attributes are kept.
+        """
+        columns = defaultdict(list)
+        arrays = defaultdict(list)
+        for key, variables in self.sequences.items():
+            for variable_name, values in variables.items():
+                columns[variable_name].append(list(key))
+                arrays[variable_name].append(values)
+
+        np.savez_compressed(
+            os.path.join(path, RESULTS_ARRAYS),
+            timeindex=self.timeindex.asi8,
+            **{
+                SEQUENCES + variable_name: np.column_stack(arrays.pop(variable_name))
+                for variable_name in list(arrays)
+            },
+        )
+
+        with open(os.path.join(path, RESULTS_JSON), "w") as f:
+            json.dump(
+                {
+                    "timeindex": {
+                        "freq": self.timeindex.freqstr,
+                        "tz": (
+                            None
+                            if self.timeindex.tz is None
+                            else str(self.timeindex.tz)
+                        ),
+                    },
+                    "columns": columns,
+                    "scalars": [
+                        {"key": list(key), "values": values}
+                        for key, values in self.scalars.items()
+                    ],
+                    "meta_results": es.meta_results,
+                },
+                f,
+                default=str,
+            )
+
+        # pickle the graph without results
+        results = getattr(es, "results", None)
+        es.results = None
+        try:
+            es.dump(path, GRAPH)
+        finally:
+            es.results = results
+
+
+def write_results(es, path):
+    r"""
+    Writes the results and meta results of `es` to a results store in `path`.
+
+    The EnergySystem is pickled without results, its attributes are kept.
+    """
+    writer = ResultsWriter(es.timeindex)
+    writer.update(es.results)
+    writer.write(es, path)
+
+
+class ResultsStore:
+    r"""
+    Read access to a results store written by :func:`write_results`.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the results store
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, RESULTS_JSON)) as f:
+            self._json = json.load(f)
+
+        self._columns = {
+            variable_name: [_key(labels) for labels in columns]
+            for variable_name, columns in self._json["columns"].items()
+        }
+        self._timeindex = None
+
+    @staticmethod
+    def exists(path):
+        r"""Returns True if there is a results store in `path`."""
+        return os.path.exists(os.path.join(path, RESULTS_JSON))
+
+    def _load_array(self, name):
+        with np.load(os.path.join(self.path, RESULTS_ARRAYS)) as arrays:
+            return arrays[name]
+
+    @property
+    def meta_results(self):
+        r"""Meta results, e.g. the objective."""
+        return self._json["meta_results"]
+
+    @property
+    def variables(self):
+        r"""Names of the sequence variables."""
+        return list(self._columns)
+
+    @property
+    def timeindex(self):
+        if self._timeindex is None:
+            timeindex = pd.DatetimeIndex(self._load_array("timeindex"))
+            if self._json["timeindex"]["tz"] is not None:
+                timeindex = timeindex.tz_localize("UTC").tz_convert(
+                    self._json["timeindex"]["tz"]
+                )
+            self._timeindex = pd.DatetimeIndex(
+                timeindex, freq=self._json["timeindex"]["freq"]
+            )
+        return self._timeindex
+
+    def keys(self):
+        r"""Returns the keys (labels) of all flows and nodes with results."""
+        keys = {key for columns in self._columns.values() for key in columns}
+        keys.update(_key(scalars["key"]) for scalars in self._json["scalars"])
+        return sorted(keys, key=str)
+
+    def _sequences(self, variable_name, keys=None):
+        columns = self._columns[variable_name]
+        array = self._load_array(SEQUENCES + variable_name)
+
+        if keys is not None:
+            positions = {key: n for n, key in enumerate(columns)}
+            columns = [key for key in keys if key in positions]
+            array = array[:, [positions[key] for key in columns]]
+
+        return columns, array
+
+    def sequences(self, variable_name, keys=None):
+        r"""
+        Returns the sequences of one variable as DataFrame with one column per key.
+
+        Parameters
+        ----------
+        variable_name : str
+            Name of the variable, e.g. 'flow'
+        keys : list of tuple
+            Keys (labels) to return, all if None
+        """
+        columns, array = self._sequences(
+            variable_name, None if keys is None else [_key(key) for key in keys]
+        )
+
+        return pd.DataFrame(
+            array,
+            index=self.timeindex,
+            columns=pd.MultiIndex.from_tuples(columns, names=["from", "to"]),
+        )
+
+    def scalars(self, keys=None):
+        r"""Returns the scalars per key (labels)."""
+        keys = None if keys is None else {_key(key) for key in keys}
+        return {
+            _key(scalars["key"]): scalars["values"]
+            for scalars in self._json["scalars"]
+            if keys is None or _key(scalars["key"]) in keys
+        }
+
+    def results(self, nodes=None, keys=None, variables=None):
+        r"""
+        Returns results in the structure of `oemof.solph.processing.results`.
+
+        Parameters
+        ----------
+        nodes : iterable
+            Nodes of the EnergySystem the keys are mapped to. The keys are labels if None.
+        keys : list of tuple
+            Keys (labels) to load, all if None
+        variables : list of str
+            Sequence variables to load, all if None
+        """
+        keys = None if keys is None else [_key(key) for key in keys]
+
+        sequences = defaultdict(dict)
+        for variable_name in variables or self.variables:
+            columns, array = self._sequences(variable_name, keys)
+            for n, key in enumerate(columns):
+                sequences[key][variable_name] = array[:, n]
+
+        scalars = self.scalars(keys)
+
+        return _to_results(sequences, scalars, self.timeindex, nodes)
+
+
+def restore_energysystem(path, results=True):
+    r"""
+    Restores an EnergySystem from a results store or from `es.dump` in `path`.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the results store
+    results : bool
+        Load the results
+
+    Returns
+    -------
+    es : oemof.solph.EnergySystem
+    """
+    es = EnergySystem()
+
+    if not ResultsStore.exists(path):
+        es.restore(path, ES_DUMP)
+        return es
+
+    es.restore(path, GRAPH)
+
+    store = ResultsStore(path)
+    es.meta_results = store.meta_results
+
+    if results:
+        es.results = store.results(nodes=es.nodes)
+
+    return es
@@ -0,0 +1,435 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module optimizes an oemof.solph EnergySystem with a rolling horizon. The timeindex is split
+into windows of `horizon` timesteps, which are extended by `overlap` timesteps. The windows are
+solved one after another and only the results of the first `horizon` timesteps of each window are
+kept. Between the windows, the following state is handed over:
+
+* the storage level of all GenericStorages at the end of the kept timesteps. Storages are not
+  balanced within the windows. Storages that are balanced in the EnergySystem have to end
+  the last window at least at the level they started the first window with. If no initial storage
+  level is given, storages start empty.
+* the status of all nonconvex flows at the end of the kept timesteps as their initial status,
+  so that startups and shutdowns are only counted once. For the flows of fleets, it is the
+  share of units that are on.
+* the status of the flows given in `status_flows` (e.g. for the idle time of the methanation
+  reactor), which is passed to `create_model`.
+* the remaining emission budget, which is distributed over the windows proportional to their
+  weighted duration.
+
+The results of the windows are assembled to the same shape as the results of a monolithic
+optimization. The objective of the assembled results contains variable costs and costs of
+nonconvex flows (startup, shutdown, activity), which are the costs of the dispatch models of
+oemof-B3. Investment is not supported.
+"""
+import contextlib
+import logging
+import numbers
+
+import numpy as np
+import pandas as pd
+from oemof.solph import processing, sequence
+from oemof.solph.components import GenericStorage
+
+from oemof_b3.tools import results_extraction
+
+logger = logging.getLogger(__name__)
+
+
+def get_windows(n_timesteps, horizon, overlap=0):
+    r"""
+    Returns the windows of a rolling horizon.
+
+    Parameters
+    ----------
+    n_timesteps : int
+        Number of timesteps
+    horizon : int
+        Number of timesteps whose results are kept per window
+    overlap : int
+        Number of timesteps the windows are extended by
+
+    Returns
+    -------
+    windows : list of tuple
+        (start, stop, stop_overlap) of each window
+    """
+    if horizon < 1:
+        raise ValueError(f"Horizon has to be at least 1, but is {horizon}.")
+    if overlap < 0:
+        raise ValueError(f"Overlap must not be negative, but is {overlap}.")
+
+    return [
+        (
+            start,
+            min(start + horizon, n_timesteps),
+            min(start + horizon + overlap, n_timesteps),
+        )
+        for start in range(0, n_timesteps, horizon)
+    ]
+
+
+def _is_timeseries(value, n_timesteps):
+    r"""Returns True if `value` is a numeric sequence that covers the timeindex."""
+    if isinstance(value, (np.ndarray, pd.Series)):
+        return value.ndim == 1 and len(value) >= n_timesteps
+    if isinstance(value, list):
+        return (
+            len(value) >= n_timesteps
+            and len(value) > 0
+            and isinstance(value[0], numbers.Number)
+        )
+    return False
+
+
+def _slice(value, start, stop):
+    if isinstance(value, pd.Series):
+        # positional access, solph accesses sequences by timestep
+        return value.values[start:stop]
+    return value[start:stop]
+
+
+def _get_timeincrement(es):
+    r"""Returns the timeincrement of all timesteps as solph.Model does."""
+    if es.timeincrement is not None:
+        return np.array(es.timeincrement, dtype=float)[: len(es.timeindex)]
+    return np.full(len(es.timeindex), es.timeindex.freq.nanos / 3.6e12)
+
+
+@contextlib.contextmanager
+def sliced(es, start, stop):
+    r"""
+    Context manager that restricts the EnergySystem to the timesteps `start` to `stop`.
+
+    The timeindex, the timeincrement and all sequences of nodes, flows and their nonconvex
+    attributes (including dicts like conversion factors) are sliced and restored afterwards.
+    """
+    n_timesteps = len(es.timeindex)
+
+    originals = []
+
+    def _replace(container, key, value):
+        originals.append((container, key, value))
+        if isinstance(container, dict):
+            container[key] = _slice(value, start, stop)
+        else:
+            setattr(container, key, _slice(value, start, stop))
+
+    objects = list(es.nodes) + list(es.flows().values())
+    objects += [
+        flow.nonconvex
+        for flow in es.flows().values()
+        if getattr(flow, "nonconvex", None) is not None
+    ]
+
+    for obj in objects:
+        for key, value in list(getattr(obj, "__dict__", {}).items()):
+            if _is_timeseries(value, n_timesteps):
+                _replace(obj, key, value)
+            elif isinstance(value, dict):
+                for dict_key, dict_value in list(value.items()):
+                    if _is_timeseries(dict_value, n_timesteps):
+                        _replace(value, dict_key, dict_value)
+
+    timeindex = es.timeindex
+    timeincrement = es.timeincrement
+
+    es.timeindex = timeindex[start:stop]
+    if timeincrement is not None:
+        es.timeincrement = _slice(timeincrement, start, stop)
+
+    try:
+        yield es
+    finally:
+        es.timeindex = timeindex
+        es.timeincrement = timeincrement
+
+        for container, key, value in reversed(originals):
+            if isinstance(container, dict):
+                container[key] = value
+            else:
+                setattr(container, key, value)
+
+
+def _get_nonconvex(es):
+    r"""
+    Returns the NonConvex and the number of units of all nonconvex flows, including the flows of
+    fleets, whose NonConvex is kept by the fleet.
+    """
+    nonconvex = {
+        (i, o): (flow.nonconvex, 1)
+        for (i, o), flow in es.flows().items()
+        if getattr(flow, "nonconvex", None) is not None
+    }
+    for node in es.nodes:
+        for i, o, _, unit_nonconvex in getattr(node, "unit_flows", []):
+            nonconvex[(i, o)] = (unit_nonconvex, node.units)
+
+    return nonconvex
+
+
+def _get_used_emissions(es, results, kept, weights):
+    r"""Returns the emissions of the kept timesteps of a window."""
+    used = 0
+    for (i, o), flow in es.flows().items():
+        if not hasattr(flow, "emission_factor"):
+            continue
+        emission_factor = sequence(flow.emission_factor)
+        flow_values = results[(i, o)]["sequences"]["flow"].values[:kept]
+        used += sum(
+            flow_values[t] * emission_factor[t] * weights[t] for t in range(kept)
+        )
+    return used
+
+
+def assemble_results(window_results, windows):
+    r"""
+    Assembles the results of all windows to the shape of the results of a monolithic
+    optimization. Sequences of the kept timesteps are concatenated, scalars are taken from the
+    first window.
+    """
+    assembled = {}
+    for key, first in window_results[0].items():
+        sequences = pd.concat(
+            [
+                results[key]["sequences"].iloc[: stop - start]
+                for results, (start, stop, _) in zip(window_results, windows)
+            ]
+        )
+        assembled[key] = {"scalars": first["scalars"], "sequences": sequences}
+
+    return assembled
+
+
+def calculate_objective(es, results):
+    r"""
+    Calculates variable costs and costs of nonconvex flows of `results` in the same way as the
+    objective of solph.Model.
+    """
+    weights = _get_timeincrement(es)
+    n_timesteps = len(weights)
+
+    objective = 0
+    for (i, o), flow in es.flows().items():
+        if (i, o) not in results:
+            continue
+        df = results[(i, o)]["sequences"]
+
+        variable_costs = sequence(flow.variable_costs)
+        if variable_costs[0] is not None and "flow" in df:
+            costs = np.array([variable_costs[t] for t in range(n_timesteps)])
+            objective += (df["flow"].values * weights * costs).sum()
+
+        nonconvex = getattr(flow, "nonconvex", None)
+        if nonconvex is None:
+            continue
+
+        for attribute, variable in [
+            ("startup_costs", "startup"),
+            ("shutdown_costs", "shutdown"),
+            ("activity_costs", "status"),
+        ]:
+            costs = sequence(getattr(nonconvex, attribute, None))
+            if costs[0] is not None and variable in df:
+                costs = np.array([costs[t] for t in range(n_timesteps)])
+                objective += (df[variable].values * costs).sum()
+
+    return objective
+
+
+def optimize_rolling_horizon(
+    es,
+    create_model,
+    solve,
+    horizon,
+    overlap=0,
+    emission_limit=None,
+    status_flows=None,
+):
+    r"""
+    Optimizes `es` window by window.
+
+    Parameters
+    ----------
+    es : oemof.solph.EnergySystem
+        The energy system
+    create_model : callable
+        Returns the model of a window with signature
+        create_model(es, emission_limit, initial_status). `initial_status` contains the status of
+        all previous timesteps per flow in `status_flows`.
+    solve : callable
+        Solves the model of a window, signature solve(model)
+    horizon : int
+        Number of timesteps whose results are kept per window
+    overlap : int
+        Number of timesteps the windows are extended by
+    emission_limit : float or None
+        Emission limit of all timesteps
+    status_flows : list of tuple
+        Labels (input, output) of nonconvex flows whose status is handed over
+
+    Returns
+    -------
+    results : dict
+        Results in the format of oemof.solph.processing.results
+    meta_results : dict
+        Meta results of the last window with the objective of the assembled results and
+        information about the windows
+    """
+    for flow in es.flows().values():
+        if getattr(flow, "investment", None) is not None:
+            raise NotImplementedError(
+                "Rolling horizon optimization does not support investment."
+            )
+
+    storages = [node for node in es.nodes if isinstance(node, GenericStorage)]
+    for storage in storages:
+        if storage.nominal_storage_capacity is None:
+            raise NotImplementedError(
+                "Rolling horizon optimization does not support investment."
+            )
+
+    status_flows = [
+        (i, o)
+        for (i, o) in es.flows()
+        if (i.label, o.label) in [tuple(labels) for labels in (status_flows or [])]
+    ]
+
+    weights = _get_timeincrement(es)
+    windows = get_windows(len(es.timeindex), horizon, overlap)
+
+    logger.info(
+        f"Optimizing with rolling horizon in {len(windows)} windows of {horizon} timesteps "
+        f"and an overlap of {overlap} timesteps."
+    )
+
+    original = {
+        storage: (
+            storage.initial_storage_level,
+            storage.balanced,
+            storage.min_storage_level,
+        )
+        for storage in storages
+    }
+    nonconvex = _get_nonconvex(es)
+    original_status = {
+        flow: flow_nonconvex.initial_status
+        for flow, (flow_nonconvex, _) in nonconvex.items()
+    }
+    start_levels = {storage: storage.initial_storage_level or 0 for storage in storages}
+    levels = dict(start_levels)
+    statuses = {flow: [] for flow in status_flows}
+    remaining_emissions = emission_limit
+
+    window_results = []
+    window_objectives = []
+    try:
+        for n, (start, stop, stop_overlap) in enumerate(windows):
+            kept = stop - start
+            is_last = stop == len(weights)
+
+            with sliced(es, start, stop_overlap):
+                for storage in storages:
+                    storage.initial_storage_level = levels[storage]
+                    storage.balanced = False
+
+                    if is_last and original[storage][1]:
+                        # end the last window at least at the level of the first window
+                        min_level = sequence(storage.min_storage_level)
+                        min_level = [min_level[t] for t in range(stop_overlap - start)]
+                        min_level[-1] = max(min_level[-1], start_levels[storage])
+                        storage.min_storage_level = min_level
+
+                window_limit = None
+                if emission_limit is not None:
+                    window_limit = (
+                        remaining_emissions
+                        * weights[start:stop_overlap].sum()
+                        / weights[start:].sum()
+                    )
+
+                model = create_model(
+                    es,
+                    window_limit,
+                    {(i.label, o.label): list(statuses[(i, o)]) for i, o in statuses},
+                )
+                solve(model)
+
+                results = results_extraction.results(model)
+                meta_results = processing.meta_results(model)
+
+                # hand over state of the last kept timestep
+                for storage in storages:
+                    content = results[(storage, None)]["sequences"][
+                        "storage_content"
+                    ].iloc[kept - 1]
+                    levels[storage] = (
+                        min(max(content / storage.nominal_storage_capacity, 0), 1)
+                        if storage.nominal_storage_capacity
+                        else 0
+                    )
+
+                for flow, (flow_nonconvex, units) in nonconvex.items():
+                    # number of units that are on for fleets
+                    sequences = results[flow]["sequences"]
+                    column = "status" if "status" in sequences else "units_on"
+                    flow_nonconvex.initial_status = (
+                        round(sequences[column].iloc[kept - 1]) / units
+                    )
+
+                for flow in status_flows:
+                    sequences = results[flow]["sequences"]
+                    column = "status" if "status" in sequences else "units_on"
+                    statuses[flow].extend(sequences[column].round().iloc[:kept])
+
+                if emission_limit is not None:
+                    remaining_emissions -= _get_used_emissions(
+                        es, results, kept, weights[start:stop]
+                    )
+
+            window_results.append(results)
+            window_objectives.append(meta_results["objective"])
+
+            logger.info(
+                f"Solved window {n + 1}/{len(windows)} ({es.timeindex[start]} to "
+                f"{es.timeindex[stop_overlap - 1]}) with objective "
+                f"{meta_results['objective']}."
+            )
+
+    finally:
+        for storage, (initial, balanced, min_level) in original.items():
+            storage.initial_storage_level = initial
+            storage.balanced = balanced
+            storage.min_storage_level = min_level
+
+        for flow, (flow_nonconvex, _) in nonconvex.items():
+            flow_nonconvex.initial_status = original_status[flow]
+
+    results = assemble_results(window_results, windows)
+
+    meta_results["objective"] = calculate_objective(es, results)
+    meta_results["rolling_horizon"] = {
+        "horizon": horizon,
+        "overlap": overlap,
+        "windows": len(windows),
+        "window_objectives": window_objectives,
+    }
+
+    return results, meta_results
+
+
+def log_objective_gap(objective, reference_objective):
+    r"""Logs and returns the relative gap of `objective` to `reference_objective`."""
+    if reference_objective == 0:
+        gap = np.inf if objective else 0
+    else:
+        gap = (objective - reference_objective) / abs(reference_objective)
+
+    logger.info(
+        f"Objective of rolling horizon optimization {objective} deviates by {gap:.4%} "
+        f"from the objective of the reference {reference_objective}."
+    )
+
+    return gap
@@ -0,0 +1,342 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module optimizes the scenarios of a scenario group concurrently on one node, sharing a budget
+of solver threads and memory between the solves instead of letting each solver decide how many
+threads it uses.
+
+The size of each model is estimated from its datapackage as number of components times number of
+timesteps. The memory budget of a scenario is the peak memory of its last optimization if it has
+been recorded, otherwise it is estimated from the size. Scenarios are started in the order of their
+expected wall time (longest first), which is taken from the recorded wall times or estimated from
+the size. A scenario is started if its memory budget fits into the free memory. The free threads
+are shared between the scenarios that can be started together in proportion to their size. The
+threads of a running solver cannot be changed, but the threads of each finished solve are handed
+over to the scenarios started next.
+
+Wall time, threads and memory of each optimization are appended to a history file, which is used
+in later schedules.
+"""
+import concurrent.futures
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from oemof_b3.tools.delta_datapackage import list_resources, read_resource
+from oemof_b3.tools.data_processing import load_json
+
+logger = logging.getLogger(__name__)
+
+ELEMENTS = "data/elements/"
+
+SEQUENCES = "data/sequences/"
+
+# memory of the optimization of a model of size 0 and per component and timestep
+MEMORY_BASE_MB = 300
+
+MEMORY_PER_SIZE_MB = 0.005
+
+# command line option of the number of threads per solver
+THREADS_OPTIONS = {"cbc": "threads", "gurobi": "Threads", "cplex": "threads"}
+
+HISTORY_COLUMNS = [
+    "scenario",
+    "size",
+    "threads",
+    "memory_budget",
+    "memory_peak",
+    "wall_time",
+    "returncode",
+    "start",
+]
+
+
+def estimate_model_size(preprocessed):
+    r"""
+    Estimates the size of the model of a datapackage as number of components (rows of all
+    elements) times number of timesteps (rows of the longest sequence).
+
+    Parameters
+    ----------
+    preprocessed : str
+        Path of the datapackage, which may be stored as delta
+
+    Returns
+    -------
+    size : int
+        Estimated size of the model
+    """
+    n_components = 0
+    n_timesteps = 1
+    for resource in list_resources(preprocessed):
+        data = read_resource(preprocessed, resource)
+        if resource.startswith(ELEMENTS):
+            n_components += len(data)
+        elif resource.startswith(SEQUENCES):
+            n_timesteps = max(n_timesteps, len(data))
+
+    return n_components * n_timesteps
+
+
+def read_memory_peak(profile, since=None):
+    r"""
+    Returns the peak memory in MB of an optimization (process and solver) from its profile
+    ``logs/{scenario}_profile.json`` or None if it is not available. If `since` (a timestamp in
+    s) is given, profiles written before are not available, as they are left from an earlier
+    optimization.
+    """
+    if not os.path.exists(profile):
+        return None
+
+    if since is not None and os.path.getmtime(profile) < since:
+        return None
+
+    phases = load_json(profile)["phases"].values()
+
+    rss_peak = [phase["rss_peak"] for phase in phases if phase["rss_peak"]]
+    children_rss_peak = [
+        phase["children_rss_peak"] for phase in phases if phase["children_rss_peak"]
+    ]
+    if not rss_peak:
+        return None
+
+    return max(rss_peak) + max(children_rss_peak, default=0)
+
+
+def load_history(path):
+    r"""Loads the recorded optimizations from the history file in `path`."""
+    if path is None or not os.path.exists(path):
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    return pd.read_csv(path)
+
+
+def save_history(records, path):
+    r"""Appends the records of optimizations to the history file in `path`."""
+    records = pd.DataFrame(records, columns=HISTORY_COLUMNS)
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    records.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def estimate_jobs(jobs, history):
+    r"""
+    Estimates size, memory budget and expected wall time of the jobs.
+
+    Parameters
+    ----------
+    jobs : list of dict
+        Jobs with 'scenario' and 'preprocessed' and optionally the 'profile' of a previous
+        optimization. Size ('size'), memory budget in MB ('memory') and expected wall time in s
+        ('expected_time') are added.
+    history : pd.DataFrame
+        Recorded optimizations, see :func:`load_history`
+
+    Returns
+    -------
+    jobs : list of dict
+        The jobs
+    """
+    successful = history.loc[history["returncode"] == 0]
+    latest = successful.groupby("scenario").last()
+
+    # wall time per size of the recorded optimizations for scenarios without records
+    time_per_size = (
+        successful["wall_time"] / successful["size"].clip(lower=1)
+    ).median()
+    if pd.isna(time_per_size):
+        time_per_size = 1.0
+
+    for job in jobs:
+        job["size"] = estimate_model_size(job["preprocessed"])
+
+        record = (
+            latest.loc[job["scenario"]] if job["scenario"] in latest.index else None
+        )
+
+        memory = None
+        if record is not None and not pd.isna(record["memory_peak"]):
+            memory = record["memory_peak"]
+        elif job.get("profile") is not None:
+            memory = read_memory_peak(job["profile"])
+        if memory is None:
+            memory = MEMORY_BASE_MB + MEMORY_PER_SIZE_MB * job["size"]
+        job["memory"] = float(memory)
+
+        if record is not None:
+            job["expected_time"] = float(record["wall_time"])
+        else:
+            job["expected_time"] = time_per_size * job["size"]
+
+    return jobs
+
+
+def fitting_jobs(pending, free_memory):
+    r"""Returns the pending jobs that can be started together within the free memory."""
+    jobs = []
+    for job in pending:
+        if job["memory"] <= free_memory:
+            jobs.append(job)
+            free_memory -= job["memory"]
+    return jobs
+
+
+def share_threads(free_threads, job, candidates, max_threads=None):
+    r"""
+    Returns the threads of `job` as share of the free threads proportional to its size among the
+    jobs that can be started together (`candidates`, including `job`). Each job gets at least one
+    thread.
+    """
+    candidates = candidates[:free_threads]
+    total_size = sum(max(candidate["size"], 1) for candidate in candidates)
+
+    if len(candidates) <= 1:
+        threads = free_threads
+    else:
+        threads = int(free_threads * max(job["size"], 1) / total_size)
+        # keep a thread for each of the other candidates
+        threads = min(threads, free_threads - len(candidates) + 1)
+
+    if max_threads is not None:
+        threads = min(threads, max_threads)
+
+    return max(threads, 1)
+
+
+def schedule(jobs, run, threads, memory_mb, max_threads=None):
+    r"""
+    Runs the jobs concurrently within a budget of threads and memory.
+
+    Parameters
+    ----------
+    jobs : list of dict
+        Jobs with 'scenario', 'size', 'memory' and 'expected_time', see :func:`estimate_jobs`
+    run : callable
+        Runs a job, signature run(job, threads) -> returncode
+    threads : int
+        Number of threads shared by the jobs
+    memory_mb : float
+        Memory in MB shared by the jobs
+    max_threads : int
+        Maximum number of threads per job, None for no limit
+
+    Returns
+    -------
+    records : list of dict
+        Scenario, size, threads, memory budget, wall time, returncode and start time per job
+    """
+    pending = sorted(jobs, key=lambda job: job["expected_time"], reverse=True)
+    running = {}
+    records = []
+
+    free_threads = threads
+    free_memory = memory_mb
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+        while pending or running:
+            while pending and free_threads > 0:
+                candidates = fitting_jobs(pending, free_memory)
+                if not candidates and not running:
+                    # start the job anyway, it would never fit
+                    logger.warning(
+                        f"The memory budget of {pending[0]['memory']:.0f} MB of scenario "
+                        f"'{pending[0]['scenario']}' exceeds the available {memory_mb} MB."
+                    )
+                    candidates = pending[:1]
+                if not candidates:
+                    break
+
+                job = candidates[0]
+                job_threads = share_threads(free_threads, job, candidates, max_threads)
+
+                pending.remove(job)
+                free_threads -= job_threads
+                free_memory -= job["memory"]
+
+                logger.info(
+                    f"Starting scenario '{job['scenario']}' (size {job['size']}) with "
+                    f"{job_threads} threads and {job['memory']:.0f} MB memory."
+                )
+                start = time.time()
+                future = executor.submit(run, job, job_threads)
+                running[future] = (job, job_threads, start)
+
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                job, job_threads, start = running.pop(future)
+                wall_time = time.time() - start
+
+                free_threads += job_threads
+                free_memory += job["memory"]
+
+                try:
+                    returncode = future.result()
+                except Exception:
+                    logger.exception(f"Scenario '{job['scenario']}' failed.")
+                    returncode = -1
+
+                logger.info(
+                    f"Finished scenario '{job['scenario']}' after {wall_time:.1f} s with "
+                    f"returncode {returncode}."
+                )
+
+                memory_peak = None
+                if job.get("profile") is not None:
+                    memory_peak = read_memory_peak(job["profile"], since=start)
+
+                records.append(
+                    {
+                        "scenario": job["scenario"],
+                        "size": job["size"],
+                        "threads": job_threads,
+                        "memory_budget": job["memory"],
+                        "memory_peak": memory_peak,
+                        "wall_time": wall_time,
+                        "returncode": returncode,
+                        "start": pd.Timestamp(start, unit="s").isoformat(),
+                    }
+                )
+
+    return records
+
+
+def run_optimize(job, threads, solver="cbc"):
+    r"""
+    Runs ``scripts/optimize.py`` for a job with 'preprocessed', 'optimized' and 'logfile' in a
+    separate process, passing the number of threads to the solver as command line option, which
+    overrides ``optimize.cmdline_options`` of the settings. The optimization is profiled, so that
+    its peak memory is recorded.
+
+    Returns
+    -------
+    returncode : int
+        Return code of the process
+    """
+    env = dict(os.environ)
+    env["DYNACONF_OPTIMIZE__PROFILE"] = "true"
+    if solver in THREADS_OPTIONS:
+        env[f"DYNACONF_OPTIMIZE__CMDLINE_OPTIONS__{THREADS_OPTIONS[solver]}"] = str(
+            threads
+        )
+    else:
+        logger.warning(f"Cannot set the number of threads of solver '{solver}'.")
+
+    cmd = [
+        sys.executable,
+        os.path.join("scripts", "optimize.py"),
+        job["preprocessed"],
+        job["optimized"],
+        job["logfile"],
+    ]
+
+    return subprocess.run(cmd, env=env).returncode
@@ -9,7 +9,35 @@ SPDX-License-Identifier: MIT
 from pyomo import environ as po
 
 
-def set_idle_time(model, f1, f2, n, name_constraint="constraint_idle_time"):
+FORMULATIONS = ["bilinear", "linear"]
+
+FLEET_BLOCK = "MethanationReactorFleetBlock"
+
+
+def get_status(model, flow):
+    r"""
+    Returns the status variable of `flow` indexed by timestep and the number of units.
+
+    For flows of a :class:`oemof_b3.facades.MethanationReactorFleet`, the status is the number
+    of units that are on, otherwise the binary status of the nonconvex flow.
+    """
+    i, o = flow
+    fleet = getattr(model, FLEET_BLOCK, None)
+    if fleet is not None and (i, o) in fleet.UNIT_FLOWS:
+        return {t: fleet.units_on[i, o, t] for t in model.TIMESTEPS}, fleet.units[i, o]
+
+    return {t: model.NonConvexFlow.status[i, o, t] for t in model.TIMESTEPS}, 1
+
+
+def set_idle_time(
+    model,
+    f1,
+    f2,
+    n,
+    name_constraint="constraint_idle_time",
+    formulation="bilinear",
+    initial_status=None,
+):
     r"""
     Enforces f1 to be inactive for n timesteps before f2 can be active.
 
@@ -21,21 +49,50 @@ def set_idle_time(model, f1, f2, n, name_constraint="constraint_idle_time"):
     .. math:: X_2(t) \cdot \sum_{s=0}^t X_1(s) = 0 \forall t < n
     .. math:: X_2(t) \cdot \sum_{s=t-n}^t X_1(s) = 0 \forall t \le n
 
+    With `formulation` "linear", the constraint is formulated exactly but linear, see
+    `set_idle_time_linear`.
+
+    `initial_status` is the status of f1 in the timesteps before the first timestep (most recent
+    last), e.g. handed over from the previous window of a rolling horizon.
     """
-    # make sure that idle time is not longer than number of timesteps
+    # make sure that idle time is not longer than number of timesteps, unless the status of
+    # previous timesteps is handed over
     n_timesteps = len(model.TIMESTEPS)
-    assert n_timesteps > n, (
-        f"Selected idle time {n}"
-        f"is longer than total number of timesteps {n_timesteps}"
-    )
+    if initial_status is None:
+        assert n_timesteps > n, (
+            f"Selected idle time {n}"
+            f"is longer than total number of timesteps {n_timesteps}"
+        )
+
+    if formulation not in FORMULATIONS:
+        raise ValueError(
+            f"Formulation '{formulation}' is not valid. Choose one of {FORMULATIONS}."
+        )
+
+    if formulation == "linear":
+        return set_idle_time_linear(model, f1, f2, n, name_constraint, initial_status)
+
+    if hasattr(model, FLEET_BLOCK) and any(
+        flow in getattr(model, FLEET_BLOCK).UNIT_FLOWS for flow in [f1, f2]
+    ):
+        raise NotImplementedError(
+            "The idle time of fleets can only be set with the linear formulation."
+        )
+
+    initial_status = list(initial_status or [])
 
     def _idle_rule(m):
         # In the first n steps, the status of f1 has to be inactive
         # for f2 to be active
         for ts in list(m.TIMESTEPS)[:n]:
+            # status of f1 before the first timestep within the window
+            previous = sum(initial_status[-(n - ts) :])
             expr = (
                 m.NonConvexFlow.status[f2[0], f2[1], ts]
-                * sum(m.NonConvexFlow.status[f1[0], f1[1], t] for t in range(ts + 1))
+                * (
+                    sum(m.NonConvexFlow.status[f1[0], f1[1], t] for t in range(ts + 1))
+                    + previous
+                )
                 == 0
             )
             if expr is not True:
@@ -67,3 +124,80 @@ def set_idle_time(model, f1, f2, n, name_constraint="constraint_idle_time"):
     )
 
     return model
+
+
+def set_idle_time_linear(
+    model, f1, f2, n, name_constraint="constraint_idle_time", initial_status=None
+):
+    r"""
+    Enforces f1 to be inactive for n timesteps before f2 can be active, formulated linear.
+
+    A counter :math:`C(t)` of the timesteps in which f1 has been active within the window of
+    the constraint is updated by a sliding window. If f2 is active, the counter has to be zero.
+    :math:`C(t)` only takes integer values as it is determined by the binary status variables,
+    thus the formulation is exact. Each constraint has at most four terms, the number of terms
+    is O(T) instead of O(T n).
+
+    **Constraints:**
+
+    .. math:: C(t) = C(t-1) + X_1(t) - X_1(t-n-1) \forall t
+
+    with :math:`C(-1) = 0` and :math:`X_1(s) = 0 \forall s < 0`
+
+    .. math:: C(t) \le M(t) \cdot (1 - X_2(t)) \forall t
+
+    with :math:`M(t) = \min(t + 1, n + 1)`, the maximal number of active timesteps of f1 in
+    the window.
+
+    If `initial_status` of f1 before the first timestep is given (most recent last), it is
+    taken into account for :math:`C(-1)` and :math:`X_1(s), s < 0`.
+
+    For the flows of a fleet of N units, :math:`X_1` and :math:`X_2` are the numbers of units
+    that are on. The constraint of the units is summed up to
+
+    .. math:: C(t) \le M(t) \cdot (N - X_2(t)) \forall t
+
+    which allows units to be charged while others are discharged.
+    """
+    status_1, units = get_status(model, f1)
+    status_2, _ = get_status(model, f2)
+
+    initial_status = list(initial_status or [])
+
+    setattr(
+        model,
+        name_constraint + "_counter",
+        po.Var(model.TIMESTEPS, within=po.NonNegativeReals),
+    )
+
+    counter = getattr(model, name_constraint + "_counter")
+
+    def _counter_rule(m, ts):
+        expr = counter[ts] - status_1[ts]
+        if ts > 0:
+            expr -= counter[ts - 1]
+        else:
+            expr -= sum(initial_status[-(n + 1) :])
+        if ts > n:
+            expr += status_1[ts - n - 1]
+        elif n + 1 - ts <= len(initial_status):
+            expr += initial_status[ts - n - 1]
+        return expr == 0
+
+    setattr(
+        model,
+        name_constraint + "_window",
+        po.Constraint(model.TIMESTEPS, rule=_counter_rule),
+    )
+
+    def _idle_rule(m, ts):
+        big_m = min(ts + 1 + len(initial_status), n + 1)
+        return counter[ts] + big_m * status_2[ts] <= big_m * units
+
+    setattr(
+        model,
+        name_constraint,
+        po.Constraint(model.TIMESTEPS, rule=_idle_rule),
+    )
+
+    return model
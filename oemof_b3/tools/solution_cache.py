@@ -0,0 +1,260 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module caches the results of solved models by a canonical hash of the model. The hash
+covers the structure and all coefficients of the model as well as the solver options, so
+re-running an optimization after changes that do not alter the model (e.g. edits of the
+Snakefile, log settings or re-touched input files) restores the cached results instead of
+solving again.
+
+The hash of a pyomo model is computed from its LP file written with symbolic labels, which
+writes the model a second time. The hash of a :class:`oemof_b3.tools.matrix_model.MatrixModel` is
+computed from its arrays directly. Whether duals are received is part of the hash, as they are
+part of the results.
+
+Results are stored with the labels of the nodes instead of the nodes themselves and are mapped
+to the nodes of the EnergySystem when they are restored. They are stored entry by entry while
+they are extracted from the model, so that they are not collected at once. The cache directory
+has a size limit; the least recently used entries are evicted when it is exceeded.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from oemof_b3.tools.matrix_model import MatrixModel
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = ".pkl"
+
+# options that do not change the solution
+IGNORED_SOLVE_KWARGS = ["logfile", "tee", "keepfiles", "symbolic_solver_labels"]
+
+CHUNK_SIZE = 2**20
+
+
+def _hash_options(sha, solver, solve_kwargs, cmdline_options, receive_duals):
+    options = {
+        "solver": solver,
+        "receive_duals": bool(receive_duals),
+        "solve_kwargs": {
+            key: value
+            for key, value in dict(solve_kwargs or {}).items()
+            if key not in IGNORED_SOLVE_KWARGS
+        },
+        "cmdline_options": dict(cmdline_options or {}),
+    }
+    sha.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+
+
+def _hash_matrix_model(sha, model):
+    A, lower, upper = model.matrix
+    lb, ub = model.bounds
+    A.sort_indices()
+
+    for array in [A.indptr, A.indices, A.data, lower, upper, lb, ub]:
+        sha.update(np.ascontiguousarray(array).tobytes())
+    sha.update(model.cost.tobytes())
+    sha.update(model.integer.tobytes())
+
+    # keys of the variables determine how the solution is mapped to the results
+    labels = {
+        name: [str(key) for key in variables.result_keys]
+        for name, variables in model.variables.items()
+    }
+    sha.update(json.dumps(labels, sort_keys=True).encode("utf-8"))
+
+
+def _hash_pyomo_model(sha, model):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "model.lp")
+        model.write(path, io_options={"symbolic_solver_labels": True})
+
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+
+
+def hash_model(
+    model, solver, solve_kwargs=None, cmdline_options=None, receive_duals=False
+):
+    r"""
+    Returns the canonical hash of a model and the options it is solved with.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model or oemof_b3.tools.matrix_model.MatrixModel
+        The model, with all constraints added
+    solver : str
+        Name of the solver
+    solve_kwargs : dict
+        Keyword arguments of the solve method. Options that do not change the solution (e.g.
+        logfile) are ignored.
+    cmdline_options : dict
+        Options of the solver
+    receive_duals : bool
+        Whether the duals are part of the results
+
+    Returns
+    -------
+    key : str
+        Hex digest of the sha256 hash
+    """
+    sha = hashlib.sha256()
+
+    sha.update(type(model).__name__.encode("utf-8"))
+
+    if isinstance(model, MatrixModel):
+        _hash_matrix_model(sha, model)
+    else:
+        _hash_pyomo_model(sha, model)
+
+    _hash_options(sha, solver, solve_kwargs, cmdline_options, receive_duals)
+
+    return sha.hexdigest()
+
+
+def _label(element):
+    return getattr(element, "label", element)
+
+
+def results_to_labels(results):
+    r"""Replaces the nodes in the keys of `results` by their labels."""
+    return {tuple(map(_label, key)): value for key, value in results.items()}
+
+
+def results_from_labels(results, es):
+    r"""Replaces the labels in the keys of `results` by the nodes of `es`."""
+    nodes = {node.label: node for node in es.nodes}
+
+    def _node(label):
+        return nodes.get(label, label) if label is not None else None
+
+    return {tuple(map(_node, key)): value for key, value in results.items()}
+
+
+class SolutionCache:
+    r"""
+    Directory of cached results by model hash with least recently used eviction.
+
+    Parameters
+    ----------
+    directory : str
+        Path of the cache directory, created if it does not exist
+    max_size : int or None
+        Maximal size of the cache in bytes, unlimited if None
+    """
+
+    def __init__(self, directory, max_size=None):
+        self.directory = directory
+        self.max_size = max_size
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key, es):
+        r"""
+        Returns the cached results and meta results for `key` mapped to the nodes of `es` or
+        None if there are none.
+        """
+        path = self._path(key)
+
+        results = {}
+        try:
+            with open(path, "rb") as f:
+                meta_results = pickle.load(f)
+                while True:
+                    try:
+                        labels, result = pickle.load(f)
+                    except EOFError:
+                        break
+                    results[labels] = result
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            logger.warning(f"Removing corrupted cache entry '{path}'.")
+            os.remove(path)
+            return None
+
+        # mark as recently used
+        os.utime(path)
+
+        return results_from_labels(results, es), meta_results
+
+    def put(self, key, results, meta_results):
+        r"""Stores results and meta results for `key` and evicts old entries if necessary."""
+        for _ in self.stream(key, results, meta_results):
+            pass
+
+    def stream(self, key, results, meta_results):
+        r"""
+        Stores results and meta results for `key` entry by entry and yields the entries.
+
+        `results` is a dict or an iterable of (key, result), e.g. yielded by
+        :func:`oemof_b3.tools.results_extraction.iter_results`. The entries are yielded while they
+        are stored, so that they can be consumed further (e.g. by a results writer) without
+        being collected at once. The cache entry is written when all results are consumed.
+        """
+        if isinstance(results, dict):
+            results = results.items()
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(meta_results, f, protocol=pickle.HIGHEST_PROTOCOL)
+                for result_key, result in results:
+                    pickle.dump(
+                        (tuple(map(_label, result_key)), result),
+                        f,
+                        protocol=pickle.HIGHEST_PROTOCOL,
+                    )
+                    yield result_key, result
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        # atomic, as scenarios may be optimized in parallel
+        os.replace(tmp_path, self._path(key))
+
+        self.evict()
+
+    def entries(self):
+        r"""Returns (path, size, last use) of all entries, least recently used first."""
+        entries = []
+        for f_name in os.listdir(self.directory):
+            if not f_name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, f_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        r"""Removes the least recently used entries until the size limit is met."""
+        if self.max_size is None:
+            return
+
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+
+        for path, entry_size, _ in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            logger.info(f"Evicted '{path}' from solution cache.")
@@ -0,0 +1,295 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module parses the log of the CBC solver, which is written to
+``logs/{scenario}_solver_log.log`` by `optimize`, to structured solver telemetry:
+
+- presolve: rows, columns and elements of the presolved problem and the number removed
+- LP relaxation: objective and solution time
+- branch and bound: number of nodes and iterations
+- gap trajectory: best solution, best possible objective and relative gap over time
+- final status, objective, gap and time
+
+The telemetry of a scenario is saved as json. The telemetry of a group of scenarios can be
+aggregated to a table with one row per scenario and a table of the gap trajectories, e.g. to
+find the scenarios that reach the allowable gap slowly.
+
+Further, :func:`is_infeasible` checks the termination condition of the last solve of a model,
+e.g. to fall back to another way of solving it.
+"""
+import re
+
+import pandas as pd
+
+from oemof_b3.tools.data_processing import load_json, save_json
+
+INFEASIBLE = ["infeasible", "infeasibleOrUnbounded", "unbounded"]
+
+# CBC reports "best solution" as 1e+50 as long as no integer solution has been found
+NO_SOLUTION = 1e50
+
+FLOAT = r"([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+
+PATTERNS = {
+    "version": r"^Version: (\S+)",
+    "allowable_gap": rf"^ratioGap was changed from \S+ to {FLOAT}",
+    "presolve": (
+        r"^Presolve (\d+) \((-?\d+)\) rows, (\d+) \((-?\d+)\) columns "
+        r"and (\d+) \((-?\d+)\) elements"
+    ),
+    "continuous_objective": (
+        rf"^Continuous objective value is {FLOAT} - {FLOAT} seconds"
+    ),
+    "lp_optimal": rf"^Optimal objective {FLOAT} - (\d+) iterations time {FLOAT}",
+    "processed_model": (
+        r"^Cgl0004I processed model has (\d+) rows, (\d+) columns \((\d+) integer"
+    ),
+    "root_cuts": (
+        rf"^Cbc0013I At root node, \d+ cuts changed objective from {FLOAT} to {FLOAT}"
+    ),
+    "progress": (
+        rf"^Cbc0010I After (\d+) nodes, (\d+) on tree, {FLOAT} best solution, "
+        rf"best possible {FLOAT} \({FLOAT} seconds\)"
+    ),
+    "solution": (
+        rf"^Cbc00(?:04|12)I Integer solution of {FLOAT} found .*?"
+        rf"after (\d+) iterations and (\d+) nodes \({FLOAT} seconds\)"
+    ),
+    "search_completed": (
+        rf"^Cbc0001I Search completed - best objective {FLOAT}, "
+        rf"took (\d+) iterations and (\d+) nodes \({FLOAT} seconds\)"
+    ),
+    "status": r"^Result - (.*?)\s*$",
+    "objective": rf"^Objective value:\s+{FLOAT}",
+    "lower_bound": rf"^Lower bound:\s+{FLOAT}",
+    "gap": rf"^Gap:\s+{FLOAT}",
+    "nodes": r"^Enumerated nodes:\s+(\d+)",
+    "iterations": r"^Total iterations:\s+(\d+)",
+    "time_cpu": rf"^Time \(CPU seconds\):\s+{FLOAT}",
+    "time_wallclock": rf"^Time \(Wallclock seconds\):\s+{FLOAT}",
+}
+
+PATTERNS = {key: re.compile(pattern) for key, pattern in PATTERNS.items()}
+
+
+def is_infeasible(model):
+    r"""
+    Returns True if the termination condition of the solver results of `model` (set by
+    `oemof.solph.Model.solve`) is infeasible or unbounded. Returns False if the model has not
+    been solved.
+    """
+    solver_results = getattr(model, "solver_results", None)
+    if solver_results is None:
+        return False
+    return str(solver_results["Solver"][0]["Termination condition"]) in INFEASIBLE
+
+
+def relative_gap(best_solution, best_possible):
+    r"""Returns the relative gap between the best solution and the best possible objective."""
+    if best_solution is None or best_possible is None:
+        return None
+    if best_solution == 0:
+        return 0.0 if best_possible == 0 else None
+    return abs(best_solution - best_possible) / abs(best_solution)
+
+
+def _point(time, nodes, best_solution, best_possible):
+    if best_solution is not None and best_solution >= NO_SOLUTION:
+        best_solution = None
+
+    return {
+        "time": time,
+        "nodes": nodes,
+        "best_solution": best_solution,
+        "best_possible": best_possible,
+        "gap": relative_gap(best_solution, best_possible),
+    }
+
+
+def parse_cbc_log(text):
+    r"""
+    Parses the log of a CBC run.
+
+    Parameters
+    ----------
+    text : str
+        Content of the log
+
+    Returns
+    -------
+    telemetry : dict
+        Presolve reductions, LP relaxation, branch and bound statistics, gap trajectory and the
+        final status. Entries that are not found in the log are None.
+    """
+    telemetry = {
+        "solver": "cbc",
+        "version": None,
+        "status": None,
+        "allowable_gap": None,
+        "objective": None,
+        "lower_bound": None,
+        "gap": None,
+        "nodes": None,
+        "iterations": None,
+        "time_cpu": None,
+        "time_wallclock": None,
+        "presolve": None,
+        "lp_relaxation": None,
+        "n_integer": None,
+        "time_first_solution": None,
+        "n_solutions": 0,
+        "trajectory": [],
+    }
+
+    # best possible objective known so far, to complete the points of new solutions
+    best_possible = None
+    best_solution = None
+
+    for line in text.splitlines():
+        for key, pattern in PATTERNS.items():
+            match = pattern.match(line)
+            if match:
+                break
+        else:
+            continue
+
+        groups = match.groups()
+
+        if key == "presolve":
+            # the first presolve is the one of the original problem
+            if telemetry["presolve"] is None:
+                values = list(map(int, groups))
+                telemetry["presolve"] = {
+                    "rows": values[0],
+                    "rows_removed": -values[1],
+                    "columns": values[2],
+                    "columns_removed": -values[3],
+                    "elements": values[4],
+                    "elements_removed": -values[5],
+                }
+        elif key == "continuous_objective":
+            telemetry["lp_relaxation"] = {
+                "objective": float(groups[0]),
+                "time": float(groups[1]),
+            }
+            best_possible = float(groups[0])
+        elif key == "lp_optimal":
+            if telemetry["lp_relaxation"] is None:
+                telemetry["lp_relaxation"] = {
+                    "objective": float(groups[0]),
+                    "time": float(groups[2]),
+                }
+        elif key == "processed_model":
+            telemetry["n_integer"] = int(groups[2])
+        elif key == "root_cuts":
+            best_possible = float(groups[1])
+        elif key == "progress":
+            best_solution = float(groups[2])
+            best_possible = float(groups[3])
+            telemetry["trajectory"].append(
+                _point(float(groups[4]), int(groups[0]), best_solution, best_possible)
+            )
+        elif key == "solution":
+            best_solution = float(groups[0])
+            time = float(groups[3])
+            telemetry["n_solutions"] += 1
+            if telemetry["time_first_solution"] is None:
+                telemetry["time_first_solution"] = time
+            telemetry["trajectory"].append(
+                _point(time, int(groups[2]), best_solution, best_possible)
+            )
+        elif key == "search_completed":
+            telemetry["trajectory"].append(
+                _point(
+                    float(groups[3]), int(groups[2]), float(groups[0]), best_possible
+                )
+            )
+        elif key in ["version", "status"]:
+            telemetry[key] = groups[0]
+        elif key in ["nodes", "iterations"]:
+            telemetry[key] = int(groups[0])
+        else:
+            telemetry[key] = float(groups[0])
+
+    # the final lower bound closes the trajectory of a completed search
+    trajectory = telemetry["trajectory"]
+    if trajectory and telemetry["lower_bound"] is not None:
+        trajectory[-1] = _point(
+            trajectory[-1]["time"],
+            trajectory[-1]["nodes"],
+            trajectory[-1]["best_solution"],
+            telemetry["lower_bound"],
+        )
+
+    return telemetry
+
+
+def read_cbc_log(path):
+    r"""Parses the CBC log in `path`, see :func:`parse_cbc_log`."""
+    with open(path) as f:
+        return parse_cbc_log(f.read())
+
+
+def save_telemetry(telemetry, path):
+    r"""Saves the telemetry as json to `path`."""
+    save_json(telemetry, path)
+
+
+def load_telemetry(path):
+    r"""Loads telemetry saved with :func:`save_telemetry`."""
+    return load_json(path)
+
+
+def flatten_telemetry(telemetry):
+    r"""Returns the telemetry without the trajectory as flat dict, e.g. 'presolve_rows'."""
+    flat = {}
+    for key, value in telemetry.items():
+        if key == "trajectory":
+            continue
+        if isinstance(value, dict):
+            flat.update({f"{key}_{k}": v for k, v in value.items()})
+        elif key in ["presolve", "lp_relaxation"]:
+            continue
+        else:
+            flat[key] = value
+    return flat
+
+
+def aggregate_telemetry(telemetries):
+    r"""
+    Aggregates the telemetry of several scenarios.
+
+    Parameters
+    ----------
+    telemetries : dict
+        Telemetry per scenario
+
+    Returns
+    -------
+    summary : pd.DataFrame
+        One row per scenario with the flattened telemetry
+    trajectories : pd.DataFrame
+        Gap trajectories of all scenarios with a column 'scenario'
+    """
+    summary = pd.DataFrame.from_dict(
+        {
+            scenario: flatten_telemetry(telemetry)
+            for scenario, telemetry in telemetries.items()
+        },
+        orient="index",
+    )
+    summary.index.name = "scenario"
+
+    trajectories = [
+        pd.DataFrame(telemetry["trajectory"]).assign(scenario=scenario)
+        for scenario, telemetry in telemetries.items()
+        if telemetry["trajectory"]
+    ]
+    columns = ["scenario", "time", "nodes", "best_solution", "best_possible", "gap"]
+    if trajectories:
+        trajectories = pd.concat(trajectories, ignore_index=True)[columns]
+    else:
+        trajectories = pd.DataFrame(columns=columns)
+
+    return summary, trajectories
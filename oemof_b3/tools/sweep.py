@@ -0,0 +1,184 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module supports parameter sweeps over scenarios that share the same datapackage and differ
+only in the emission limit and the factors of the electricity/gas relations (e.g. scenario
+families with 80/95/100 % emission reduction). The model is built once with mutable parameters,
+which are updated for each scenario before re-solving.
+
+With persistent solvers (e.g. 'gurobi_persistent'), the model is passed to the solver once and
+only the constraints with changed parameters are updated. Other solvers are called with the
+updated model and warm-started with the solution of the previous scenario if the solver allows
+it (e.g. cbc).
+"""
+import logging
+
+from oemof.solph import constraints
+from pyomo import environ as po
+from pyomo.opt import SolverFactory
+
+from oemof_b3.tools.delta_datapackage import list_resources, read_resource
+from oemof_b3.tools.solver_log import is_infeasible
+
+logger = logging.getLogger(__name__)
+
+EMISSION_LIMIT_PARAM = "emission_limit_value"
+
+EMISSION_LIMIT_CONSTRAINT = "integral_limit_emission_factor_constraint"
+
+
+def datapackages_equal(path, other):
+    r"""
+    Returns True if the data (elements and sequences) of the datapackages in `path` and `other`
+    are equal. Datapackages stored as delta are compared with their materialized data.
+    """
+    resources = list_resources(path)
+
+    if resources != list_resources(other):
+        return False
+
+    return all(
+        read_resource(path, resource).equals(read_resource(other, resource))
+        for resource in resources
+    )
+
+
+def add_mutable_emission_limit(model, limit):
+    r"""
+    Adds the emission limit with a mutable right-hand side. The constraint is deactivated if
+    `limit` is None.
+    """
+    setattr(
+        model,
+        EMISSION_LIMIT_PARAM,
+        po.Param(mutable=True, initialize=0 if limit is None else limit),
+    )
+    constraints.emission_limit(model, limit=getattr(model, EMISSION_LIMIT_PARAM))
+
+    update_emission_limit(model, limit)
+
+    return model
+
+
+def update_emission_limit(model, limit):
+    r"""Updates the mutable emission limit. The constraint is deactivated if `limit` is None."""
+    constraint = getattr(model, EMISSION_LIMIT_CONSTRAINT)
+
+    if limit is None:
+        constraint.deactivate()
+    else:
+        getattr(model, EMISSION_LIMIT_PARAM).value = limit
+        constraint.activate()
+
+    return [constraint]
+
+
+def add_mutable_factor(model, name, factor):
+    r"""Adds a mutable parameter `<name>_factor` and returns it."""
+    setattr(model, name + "_factor", po.Param(mutable=True, initialize=factor))
+    return getattr(model, name + "_factor")
+
+
+def update_factors(model, factors):
+    r"""
+    Updates the mutable factors of the constraints given by name in `factors`. Names without
+    constraint in the model (relations without any flows, e.g. pruned) are skipped.
+
+    Returns
+    -------
+    changed : list
+        Constraints whose factor changed
+    """
+    changed = []
+    for name, factor in factors.items():
+        constraint = getattr(model, name, None)
+        if constraint is None:
+            continue
+        param = getattr(model, name + "_factor")
+        if param.value != factor:
+            param.value = factor
+            changed.append(constraint)
+    return changed
+
+
+class SweepSolver:
+    r"""
+    Solves a model repeatedly after its mutable parameters have been updated.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model
+        The model with mutable parameters
+    solver : str
+        Name of the solver. Persistent solvers end with '_persistent'.
+    solve_kwargs : dict
+        Keyword arguments of the solve method of the solver
+    cmdline_options : dict
+        Options of the solver
+    """
+
+    def __init__(self, model, solver, solve_kwargs=None, cmdline_options=None):
+        self.model = model
+        self.solver = solver
+        self.solve_kwargs = dict(solve_kwargs or {})
+        self.cmdline_options = dict(cmdline_options or {})
+        self.persistent = solver.endswith("_persistent")
+        self.n_solved = 0
+
+        self.opt = SolverFactory(solver)
+        for key, value in self.cmdline_options.items():
+            self.opt.options[key] = value
+
+        if self.persistent:
+            self.opt.set_instance(model)
+
+    def update(self, changed_constraints):
+        r"""Passes constraints with changed parameters to a persistent solver."""
+        if not self.persistent:
+            return
+
+        for constraint in changed_constraints:
+            for data in constraint.values():
+                if data in self.opt._pyomo_con_to_solver_con_map:
+                    self.opt.remove_constraint(data)
+                if data.active:
+                    self.opt.add_constraint(data)
+
+    def solve(self):
+        r"""
+        Solves the model, warm-started with the previous solution if possible. If the model is
+        infeasible or unbounded, a warning is logged and the values of the variables are those of
+        the previous solve.
+        """
+        solve_kwargs = dict(self.solve_kwargs)
+
+        if self.n_solved > 0 and self.opt.warm_start_capable():
+            solve_kwargs["warmstart"] = True
+
+        if self.persistent:
+            # the model has been passed to the solver already
+            solve_kwargs.pop("symbolic_solver_labels", None)
+
+        solver_results = self.opt.solve(self.model, **solve_kwargs)
+
+        termination_condition = solver_results["Solver"][0]["Termination condition"]
+        logger.info(
+            f"Solved model with solver '{self.solver}' "
+            f"(warmstart: {solve_kwargs.get('warmstart', False)}), "
+            f"termination condition: {termination_condition}."
+        )
+
+        # results are expected here by oemof.solph.processing.meta_results
+        self.model.es.results = solver_results
+        self.model.solver_results = solver_results
+
+        if is_infeasible(self.model):
+            logger.warning(
+                f"Model solved with solver '{self.solver}' is {termination_condition}, it has "
+                f"no solution."
+            )
+
+        self.n_solved += 1
+
+        return solver_results
@@ -0,0 +1,520 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module reduces the temporal resolution of the sequences of an EnergyDatapackage.
+
+Sequences can be resampled to a coarser frequency in an energy-conserving way. oemof.solph
+treats the values of a flow as power and multiplies them with the `timeincrement`, which it derives
+from the frequency. Therefore, all sequences (profiles as well as absolute values like demands in
+MW) are averaged over the resampled timestep, and power times timeincrement keeps the energy of the
+original timesteps. Only constraints that count timesteps, like the idle time of the methanation
+reactor, have to be rescaled with the resampling factor.
+
+Alternatively, sequences can be reduced to representative periods (e.g. days or
+weeks). All sequences of a scenario are clustered jointly, so that the representative periods are
+consistent across feed-in, load and efficiency profiles.
+
+The reduced sequences are accompanied by
+
+* weights: the number of original timesteps each reduced timestep stands for. They are passed to
+  oemof.solph as `timeincrement`, so that costs, emissions and storage balances are weighted.
+  The representative periods are optimized as one consecutive sequence: the storage content at
+  the end of a representative period is the content at the start of the next one, and each
+  timestep of a period with weight n acts like one timestep stretched n times (losses and flows
+  are scaled by n). Storage between periods that are far apart (e.g. seasonal storage) is thus
+  not represented, and balanced storages are balanced over the reduced sequence. Constraints
+  that count timesteps, like the idle time of the methanation reactor, have no meaning across
+  weighted timesteps and are not available in this mode (see `optimize`).
+* a mapping of the original timeindex to the reduced timeindex, to disaggregate the results back
+  to the original resolution in postprocessing.
+* the clustering error per profile.
+"""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+
+from oemof_b3.tools.data_processing import load_json
+from oemof_b3.tools.metadata_cache import METADATA_FILENAME
+
+TSA_DIR = "tsa"
+
+WEIGHTS_FILE = "weights.csv"
+
+MAPPING_FILE = "mapping.csv"
+
+ERROR_FILE = "clustering_error.csv"
+
+RESAMPLING_KEY = "resampling"
+
+METHODS = ["hierarchical", "k_medoids"]
+
+
+def get_period_length(timeindex, period):
+    r"""
+    Returns the number of timesteps of `timeindex` that make up one period.
+
+    Parameters
+    ----------
+    timeindex : pd.DatetimeIndex
+        Timeindex with a frequency
+    period : str
+        Length of a period as pandas offset alias, e.g. 'D', 'W' or '168H'
+
+    Returns
+    -------
+    period_length : int
+    """
+    freq = timeindex.freq or pd.tseries.frequencies.to_offset(pd.infer_freq(timeindex))
+
+    offset = pd.tseries.frequencies.to_offset(period)
+
+    # weeks are anchored offsets that cannot be converted to a Timedelta directly
+    if isinstance(offset, pd.offsets.Week):
+        offset = pd.tseries.frequencies.to_offset(f"{7 * offset.n}D")
+
+    period_length = pd.Timedelta(offset) / pd.Timedelta(freq)
+
+    if period_length % 1 != 0 or period_length < 1:
+        raise ValueError(
+            f"Period '{period}' is not a multiple of the frequency '{freq.freqstr}'."
+        )
+
+    return int(period_length)
+
+
+def resample_sequences(sequences, freq):
+    r"""
+    Resamples sequences to a coarser frequency by averaging them, as oemof.solph multiplies the
+    values of the flows (in units of power) with the `timeincrement` of the resampled timesteps.
+
+    Parameters
+    ----------
+    sequences : dict of pd.DataFrame
+        Sequences with a DatetimeIndex
+    freq : str
+        Target frequency as pandas offset alias, e.g. '3H'
+
+    Returns
+    -------
+    resampled : dict of pd.DataFrame
+        Resampled sequences
+    factor : int
+        Number of original timesteps per resampled timestep
+    """
+    resampled = {}
+    factors = set()
+
+    for name, data in sequences.items():
+        factor = get_period_length(data.index, freq)
+
+        factors.add(factor)
+
+        if factor == 1:
+            resampled[name] = data
+            continue
+
+        if len(data) % factor != 0:
+            raise ValueError(
+                f"The {len(data)} timesteps of sequence '{name}' cannot be resampled to "
+                f"frequency '{freq}' without an incomplete last timestep."
+            )
+
+        resampled[name] = data.resample(freq, origin="start").mean()
+
+    if len(factors) > 1:
+        raise ValueError(
+            f"Sequences have different frequencies, leading to resampling factors {factors}."
+        )
+
+    factor = factors.pop() if factors else 1
+
+    return resampled, factor
+
+
+def load_resampling_factor(path):
+    r"""
+    Returns the resampling factor recorded in the metadata of the datapackage in `path`. Returns 1
+    if the sequences have not been resampled.
+    """
+    metadata = load_json(os.path.join(path, METADATA_FILENAME))
+
+    return metadata.get(RESAMPLING_KEY, {}).get("factor", 1)
+
+
+def _get_value_range(values):
+    r"""Returns the range of each column of `values`, replacing zero ranges by one."""
+    value_range = values.max(axis=0) - values.min(axis=0)
+    value_range[value_range == 0] = 1
+
+    return value_range
+
+
+def _normalize(values):
+    r"""Scales each column of `values` to the range between 0 and 1."""
+    return (values - values.min(axis=0)) / _get_value_range(values)
+
+
+def _get_medoids(distances, labels, n_clusters):
+    r"""Returns the member of each cluster with the smallest sum of distances to the others."""
+    medoids = np.empty(n_clusters, dtype=int)
+
+    for cluster in range(n_clusters):
+        members = np.where(labels == cluster)[0]
+        medoids[cluster] = members[
+            np.argmin(distances[np.ix_(members, members)].sum(axis=1))
+        ]
+
+    return medoids
+
+
+def _k_medoids(distances, n_clusters, max_iter=100):
+    r"""
+    Clusters with k-medoids given a matrix of pairwise distances. The initial medoids are chosen
+    greedily, each one reducing the total distance the most.
+    """
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+
+    while len(medoids) < n_clusters:
+        current = distances[:, medoids].min(axis=1)
+        gains = np.maximum(current[:, None] - distances, 0).sum(axis=0)
+        gains[medoids] = -1
+        medoids.append(int(np.argmax(gains)))
+
+    medoids = np.array(medoids)
+
+    for _ in range(max_iter):
+        labels = np.argmin(distances[:, medoids], axis=1)
+        new_medoids = _get_medoids(distances, labels, n_clusters)
+
+        if set(new_medoids) == set(medoids):
+            break
+
+        medoids = new_medoids
+
+    labels = np.argmin(distances[:, medoids], axis=1)
+
+    return labels
+
+
+def _hierarchical(features, n_clusters):
+    r"""Clusters with agglomerative clustering using Ward's method."""
+    tree = linkage(features, method="ward")
+
+    labels = fcluster(tree, n_clusters, criterion="maxclust") - 1
+
+    return labels
+
+
+def cluster_periods(features, n_clusters, method="hierarchical"):
+    r"""
+    Clusters the rows of `features` and returns the cluster of each row and the medoid of each
+    cluster.
+
+    Parameters
+    ----------
+    features : np.array
+        One row per period
+    n_clusters : int
+        Number of clusters
+    method : str
+        'hierarchical' or 'k_medoids'
+
+    Returns
+    -------
+    labels : np.array
+        Cluster of each period
+    medoids : np.array
+        Index of the representative period of each cluster
+    """
+    if method not in METHODS:
+        raise ValueError(f"Method '{method}' is not one of {METHODS}.")
+
+    if not 0 < n_clusters <= len(features):
+        raise ValueError(
+            f"Number of representative periods has to be between 1 and the number of periods "
+            f"{len(features)}, but is {n_clusters}."
+        )
+
+    squared_norms = (features**2).sum(axis=1)
+    squared_distances = (
+        squared_norms[:, None] + squared_norms[None, :] - 2 * features @ features.T
+    )
+    distances = np.sqrt(np.maximum(squared_distances, 0))
+
+    if method == "hierarchical":
+        labels = _hierarchical(features, n_clusters)
+    else:
+        labels = _k_medoids(distances, n_clusters)
+
+    # drop empty clusters and number clusters consecutively
+    _, labels = np.unique(labels, return_inverse=True)
+
+    medoids = _get_medoids(distances, labels, labels.max() + 1)
+
+    return labels, medoids
+
+
+def rescale(values, weights, target, upper, max_iterations=50, rtol=1e-9):
+    r"""
+    Rescales each column of `values` so that its sum weighted by `weights` matches `target`
+    without exceeding `upper`. Values that reach `upper` are clipped, the rest is scaled up
+    iteratively to make up for the clipped energy. If the target cannot be reached within the
+    upper bound, a deviation remains.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values with one column per profile
+    weights : np.ndarray
+        Weight of each row
+    target : np.ndarray
+        Weighted sum per column
+    upper : np.ndarray
+        Upper bound per column
+    max_iterations : int
+        Maximum number of iterations
+    rtol : float
+        Relative tolerance of the weighted sum
+
+    Returns
+    -------
+    rescaled : np.ndarray
+    """
+    rescaled = values.copy()
+    for _ in range(max_iterations):
+        weighted_sum = (rescaled * weights[:, None]).sum(axis=0)
+        if np.allclose(weighted_sum, target, rtol=rtol, atol=0):
+            break
+
+        scaling = np.divide(
+            target,
+            weighted_sum,
+            out=np.ones_like(target),
+            where=weighted_sum != 0,
+        )
+        rescaled = np.minimum(rescaled * scaling, upper)
+
+    return rescaled
+
+
+def aggregate_sequences(sequences, n_periods, period="D", method="hierarchical"):
+    r"""
+    Reduces sequences to `n_periods` representative periods. All sequences are clustered
+    jointly. The representative periods are the medoids of the clusters, ordered
+    chronologically and rescaled so that the weighted sum of each profile matches the original
+    one as far as the maximum of the original profile allows (see :func:`rescale`). The
+    remaining deviation is reported as 'energy_deviation'. A trailing incomplete period is kept
+    as it is.
+
+    Parameters
+    ----------
+    sequences : dict of pd.DataFrame
+        Sequences with the same DatetimeIndex
+    n_periods : int
+        Number of representative periods
+    period : str
+        Length of a period as pandas offset alias, e.g. 'D' or 'W'
+    method : str
+        'hierarchical' or 'k_medoids'
+
+    Returns
+    -------
+    reduced : dict of pd.DataFrame
+        Reduced sequences
+    weights : pd.Series
+        Number of original timesteps each reduced timestep represents
+    mapping : pd.Series
+        Reduced timeindex for each original timestep
+    error : pd.DataFrame
+        Clustering error per profile. 'rmse' is the root mean squared error of the normalized
+        profile, 'energy_deviation' the relative deviation of the weighted sum.
+    """
+    joined = pd.concat(sequences, axis=1)
+
+    timeindex = joined.index
+
+    period_length = get_period_length(timeindex, period)
+
+    n_full_periods = len(joined) // period_length
+
+    n_full_steps = n_full_periods * period_length
+
+    values = joined.values.astype(float)
+
+    normalized = _normalize(values)
+
+    features = normalized[:n_full_steps].reshape(n_full_periods, -1)
+
+    labels, medoids = cluster_periods(features, n_periods, method=method)
+
+    # order representative periods chronologically
+    order = np.argsort(medoids)
+    medoids = medoids[order]
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    labels = position[labels]
+
+    counts = np.bincount(labels, minlength=len(medoids))
+
+    # position of each original timestep in the reduced timeindex
+    steps_in_period = np.arange(n_full_steps) % period_length
+    reduced_position = labels.repeat(period_length) * period_length + steps_in_period
+
+    n_tail = len(joined) - n_full_steps
+    reduced_position = np.concatenate(
+        [reduced_position, len(medoids) * period_length + np.arange(n_tail)]
+    )
+
+    representative = np.concatenate(
+        [values[m * period_length : (m + 1) * period_length] for m in medoids]
+        + [values[n_full_steps:]]
+    )
+
+    weights = np.concatenate(
+        [counts.repeat(period_length).astype(float), np.ones(n_tail)]
+    )
+
+    # rescale to keep the weighted sum of each profile
+    original_sum = values.sum(axis=0)
+    representative = rescale(representative, weights, original_sum, values.max(axis=0))
+
+    reduced_index = pd.date_range(
+        start=timeindex[0],
+        periods=len(representative),
+        freq=timeindex.freq or pd.infer_freq(timeindex),
+        name=timeindex.name,
+    )
+
+    reduced_joined = pd.DataFrame(
+        representative, index=reduced_index, columns=joined.columns
+    )
+
+    reduced = {name: reduced_joined[name] for name in sequences}
+
+    weights = pd.Series(weights, index=reduced_index, name="weight")
+
+    mapping = pd.Series(
+        reduced_index[reduced_position], index=timeindex, name="timeindex_reduced"
+    )
+
+    # clustering error per profile
+    reconstructed = representative[reduced_position]
+
+    rmse = np.sqrt(
+        (((reconstructed - values) / _get_value_range(values)) ** 2).mean(axis=0)
+    )
+
+    energy_deviation = np.divide(
+        reconstructed.sum(axis=0) - original_sum,
+        original_sum,
+        out=np.zeros_like(original_sum),
+        where=original_sum != 0,
+    )
+
+    error = pd.DataFrame(
+        {"rmse": rmse, "energy_deviation": energy_deviation},
+        index=joined.columns.set_names(["resource", "profile"]),
+    )
+
+    return reduced, weights, mapping, error
+
+
+def disaggregate(df, mapping):
+    r"""
+    Maps data with a reduced timeindex back to the original timeindex.
+
+    Parameters
+    ----------
+    df : pd.DataFrame or pd.Series
+        Data with reduced timeindex
+    mapping : pd.Series
+        Reduced timeindex for each original timestep
+
+    Returns
+    -------
+    disaggregated : pd.DataFrame or pd.Series
+        Data with original timeindex
+    """
+    disaggregated = df.reindex(mapping.values)
+
+    disaggregated.index = mapping.index
+
+    return disaggregated
+
+
+def disaggregate_results(results, mapping):
+    r"""
+    Maps the sequences in oemof.solph results back to the original timeindex.
+
+    Parameters
+    ----------
+    results : dict
+        Results as returned by `oemof.solph.processing.results`
+    mapping : pd.Series
+        Reduced timeindex for each original timestep
+
+    Returns
+    -------
+    results : dict
+        Results with disaggregated sequences
+    """
+    for values in results.values():
+        sequences = values.get("sequences")
+        if sequences is not None and isinstance(sequences.index, pd.DatetimeIndex):
+            values["sequences"] = disaggregate(sequences, mapping)
+
+    return results
+
+
+def save_aggregation(path, weights, mapping, error):
+    r"""
+    Saves weights, mapping and clustering error to the subdirectory `TSA_DIR` of `path`.
+    """
+    tsa_dir = os.path.join(path, TSA_DIR)
+
+    if not os.path.exists(tsa_dir):
+        os.makedirs(tsa_dir)
+
+    weights.to_csv(os.path.join(tsa_dir, WEIGHTS_FILE))
+    mapping.to_csv(os.path.join(tsa_dir, MAPPING_FILE))
+    error.to_csv(os.path.join(tsa_dir, ERROR_FILE))
+
+
+def copy_aggregation(source, destination):
+    r"""
+    Copies the subdirectory `TSA_DIR` from `source` to `destination` if it exists.
+    """
+    tsa_dir = os.path.join(source, TSA_DIR)
+
+    if os.path.exists(tsa_dir):
+        shutil.copytree(tsa_dir, os.path.join(destination, TSA_DIR))
+
+
+def load_weights(path):
+    r"""
+    Returns the weights saved in `path` or None if the sequences in `path` are not aggregated.
+    """
+    filename = os.path.join(path, TSA_DIR, WEIGHTS_FILE)
+
+    if not os.path.exists(filename):
+        return None
+
+    return pd.read_csv(filename, index_col=0, parse_dates=True).loc[:, "weight"]
+
+
+def load_mapping(path):
+    r"""
+    Returns the mapping saved in `path` or None if the sequences in `path` are not aggregated.
+    """
+    filename = os.path.join(path, TSA_DIR, MAPPING_FILE)
+
+    if not os.path.exists(filename):
+        return None
+
+    mapping = pd.read_csv(filename, index_col=0, parse_dates=[0, 1])
+
+    return mapping.loc[:, "timeindex_reduced"]
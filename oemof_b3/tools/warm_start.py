@@ -0,0 +1,207 @@
+# coding: utf-8
+r"""
+Description
+-------------
+This module warm-starts the optimization of a scenario with the solution of a neighbouring
+scenario with a similar optimal dispatch (e.g. '2050-gas_moreCH4' and
+'2050-gas_moreCH4-methanation' or scenario families with 80/95/100 % emission reduction).
+
+The sequences of the reference (flows, statuses of nonconvex flows, storage contents and the
+number of units that are on of fleets) are read from its results store or `es_dump` and mapped
+onto the variables of the new model by the labels of the flow or node and the timestep. Flows and
+nodes that do not exist in the reference and timesteps that are missing keep no value. The values
+are clipped to the bounds of the variables, values of integer variables are rounded.
+
+The model is then solved with the values as initial MIP start, if the solver allows it (e.g.
+cbc). The time to the first integer solution is compared with the one of a previous optimization of
+the same scenario without warm start or, if that is not available, with the one of the reference
+scenario as proxy.
+"""
+import logging
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from oemof_b3.tools.results_store import ResultsStore, restore_energysystem
+
+logger = logging.getLogger(__name__)
+
+# sequence variables of the results and the block of the model they belong to
+VARIABLES = {
+    "flow": None,
+    "status": "NonConvexFlow",
+    "storage_content": "GenericStorageBlock",
+    "units_on": "MethanationReactorFleetBlock",
+}
+
+
+def _labels(column):
+    return tuple(label if isinstance(label, str) else None for label in column)
+
+
+def load_reference(path):
+    r"""
+    Loads the sequences of the reference in `path` (results store or `es_dump`).
+
+    Returns
+    -------
+    reference : dict
+        pd.DataFrame of the sequences per variable name with one column per key (labels)
+    """
+    if ResultsStore.exists(path):
+        store = ResultsStore(path)
+        return {
+            name: store.sequences(name) for name in VARIABLES if name in store.variables
+        }
+
+    es = restore_energysystem(path)
+
+    sequences = defaultdict(dict)
+    for key, result in es.results.items():
+        labels = tuple(getattr(node, "label", node) for node in key)
+        for name, values in result["sequences"].items():
+            if name in VARIABLES:
+                sequences[name][labels] = values
+
+    return {
+        name: pd.DataFrame(columns, index=es.timeindex)
+        for name, columns in sequences.items()
+    }
+
+
+def _model_variables(model):
+    r"""Yields variable name, key (labels), timestep and variable of the sequences of `model`."""
+    for name, block_name in VARIABLES.items():
+        block = model if block_name is None else getattr(model, block_name, None)
+        var = getattr(block, name, None)
+        if var is None:
+            continue
+
+        for index, data in var.items():
+            *nodes, t = index
+            labels = tuple(node.label for node in nodes)
+            yield name, labels + (None,) * (2 - len(labels)), t, data
+
+
+def set_warm_start(model, reference):
+    r"""
+    Sets the values of the variables of `model` to the values of the reference.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model
+        The model
+    reference : dict
+        Sequences per variable name, see :func:`load_reference`
+
+    Returns
+    -------
+    n_set : int
+        Number of variables whose value has been set
+    n_variables : int
+        Number of variables of the sequences in the model
+    """
+    timeindex = model.es.timeindex
+
+    # values by timestep of the model per variable name and key
+    values = {}
+    for name, df in reference.items():
+        df = df.reindex(pd.DatetimeIndex(timeindex))
+        for column in df.columns:
+            values[(name, _labels(column))] = df[column].to_numpy(dtype=float)
+
+    n_set = 0
+    n_variables = 0
+    for name, labels, t, var in _model_variables(model):
+        n_variables += 1
+        sequence = values.get((name, labels))
+        if var.fixed or sequence is None or np.isnan(sequence[t]):
+            continue
+
+        value = sequence[t]
+        if not var.is_continuous():
+            value = round(value)
+        if var.lb is not None:
+            value = max(value, var.lb)
+        if var.ub is not None:
+            value = min(value, var.ub)
+
+        var.value = value
+        n_set += 1
+
+    logger.info(
+        f"Set the values of {n_set} of {n_variables} variables from the reference."
+    )
+
+    return n_set, n_variables
+
+
+def compare_time_first_solution(
+    telemetry, cold_telemetry=None, reference_telemetry=None
+):
+    r"""
+    Compares the time to the first integer solution of the warm-started optimization with the
+    one of a cold start.
+
+    The baseline is a previous optimization of the same scenario without warm start
+    (`cold_telemetry`). If it is not available, the time of the reference scenario is used
+    instead. As the reference is a different model, this is only a proxy of the time of a cold
+    start, which is recorded as baseline 'reference_scenario'.
+
+    Parameters
+    ----------
+    telemetry : dict
+        Solver telemetry of the warm-started optimization
+    cold_telemetry : dict or None
+        Solver telemetry of an optimization of the same scenario without warm start
+    reference_telemetry : dict or None
+        Solver telemetry of the reference scenario
+
+    Returns
+    -------
+    comparison : dict
+        Time to the first solution with warm start and of the baseline, the kind of the
+        baseline ('cold' or 'reference_scenario') and the relative reduction. Entries that are
+        not available are None.
+    """
+    time = telemetry.get("time_first_solution")
+
+    baseline = None
+    baseline_time = None
+    for kind, baseline_telemetry in [
+        ("cold", cold_telemetry),
+        ("reference_scenario", reference_telemetry),
+    ]:
+        baseline_time = (baseline_telemetry or {}).get("time_first_solution")
+        if baseline_time is not None:
+            baseline = kind
+            break
+
+    reduction = None
+    if time is not None and baseline_time:
+        reduction = (baseline_time - time) / baseline_time
+
+    if reduction is None:
+        logger.info(
+            f"Found the first integer solution after {time} s with warm start. The time "
+            "without warm start is not available."
+        )
+    elif baseline == "cold":
+        logger.info(
+            f"Found the first integer solution after {time} s with warm start instead of "
+            f"{baseline_time} s without warm start, reduced by {reduction:.1%}."
+        )
+    else:
+        logger.info(
+            f"Found the first integer solution after {time} s with warm start instead of "
+            f"{baseline_time} s in the reference scenario, reduced by {reduction:.1%}. The "
+            "reference is a different model, so this is only a proxy of the reduction."
+        )
+
+    return {
+        "time_first_solution": time,
+        "baseline": baseline,
+        "baseline_time_first_solution": baseline_time,
+        "reduction": reduction,
+    }
@@ -19,7 +19,39 @@ Description
 -------------
 The script creates an empty EnergyDatapackage from the specifications given in the scenario_specs,
 fills it with scalar and timeseries data, infers the metadata and saves it to the given destination.
-Further, additional parameters like emission limit are saved in a separate file.
+Further, additional parameters like emission limit are saved in a separate file. They are
+additionally saved in a typed structure (``build_datapackage.typed_additional_scalars_file``) that
+is read in `optimize` (see :mod:`oemof_b3.tools.additional_scalars`).
+
+As the metadata only depends on the model structure, it is inferred once per model structure and
+cached in ``build_datapackage.metadata_cache_dir`` if ``build_datapackage.metadata_cache`` is set in
+the settings. Scenarios with the same model structure reuse the cached metadata, which is validated
+against the data of the scenario.
+
+If the frequency in ``datetimeindex`` of the scenario specs is coarser than the frequency of the
+timeseries, the sequences are resampled by averaging, as oemof.solph multiplies flow values (power)
+with the length of the timesteps. ``datetimeindex.periods`` counts the timesteps of the resampled
+sequences (e.g. 2920 for a year with freq 3H) and is validated against them. The resampling factor
+is recorded in the metadata and used in `optimize` to rescale the idle time of the methanation
+reactor.
+
+If the scenario specs contain the optional entry ``timeseries_aggregation``, all sequences are
+jointly reduced to representative periods:
+
+.. code-block:: yaml
+
+    timeseries_aggregation:
+      n_periods: 12  # number of representative periods
+      period: D  # length of a period, e.g. D (days) or W (weeks)
+      method: hierarchical  # hierarchical or k_medoids
+
+The weights of the reduced timesteps, the mapping to the original timeindex and the clustering error
+per profile are saved to ``results/{scenario}/preprocessed/tsa``.
+
+If the scenario specs contain the optional entry ``base_scenario``, the datapackage is stored as
+delta relative to the datapackage of the base scenario in ``results/{base_scenario}/preprocessed``.
+Only elements that are changed or added and sequences that differ are kept. The complete
+datapackage is materialized when it is loaded in `optimize`.
 """
 import logging
 import sys
@@ -48,6 +80,15 @@ from oemof_b3.tools.data_processing import (
     expand_regions,
     save_df,
 )
+from oemof_b3.tools.additional_scalars import (
+    calculate_additional_scalars,
+    filter_additional_scalars,
+    save_additional_scalars as save_typed_additional_scalars,
+    to_b3_scalars,
+)
+from oemof_b3.tools.metadata_cache import infer_metadata_cached, update_metadata
+from oemof_b3.tools import timeseries_aggregation as tsa
+from oemof_b3.tools.delta_datapackage import write_delta
 
 logger = logging.getLogger()
 
@@ -163,75 +204,145 @@ def parametrize_sequences(edp, ts, filters):
     return edp
 
 
-def load_additional_scalars(scalars, filters):
-    """Loads additional scalars like the emission limit and filters by 'scenario_key'"""
-    # get electricity/gas relations and parameters for the calculation of emission_limit
-    el_gas_rel = scalars.loc[
-        scalars.var_name == config.settings.build_datapackage.el_gas_relation
-    ]
-    emissions = scalars.loc[
-        scalars.carrier == config.settings.build_datapackage.emission
-    ]
+def resample_sequences(edp, datetimeindex):
+    r"""
+    Resamples all sequences of an oemoflex.EnergyDataPackage to the frequency of
+    `datetimeindex` and checks that the resampled sequences match `datetimeindex`.
+
+    Parameters
+    ----------
+    edp : oemoflex.EnergyDatapackage
+        EnergyDatapackage with sequences
+    datetimeindex : pd.DatetimeIndex
+        Timeindex of the scenario
+
+    Returns
+    -------
+    edp : oemoflex.EnergyDatapackage
+        EnergyDatapackage with resampled sequences
+    factor : int
+        Number of original timesteps per resampled timestep
+    """
+    sequences = {
+        name: data
+        for name, data in edp.data.items()
+        if isinstance(data.index, pd.DatetimeIndex)
+    }
+
+    freq = datetimeindex.freqstr
 
-    # get `output_parameters` of backpressure components as they are not taken into
-    # consideration in oemof.tabular so far. They are added to the components' output flow towards
-    # the heat bus in script `optimize.py`.
-    bpchp_out = scalars.loc[
-        (scalars.tech == "bpchp") & (scalars.var_name == "output_parameters")
-    ]
+    resampled, factor = tsa.resample_sequences(sequences, freq=freq)
 
-    # concatenate data for filtering
-    df = pd.concat([el_gas_rel, emissions, bpchp_out])
+    # the datetimeindex is set up from the specs, the resampled sequences have to match it
+    for name, data in resampled.items():
+        if factor != 1 and not data.index.equals(datetimeindex):
+            raise ValueError(
+                f"The {len(data)} timesteps of sequence '{name}' starting at "
+                f"{data.index[0]} with frequency '{freq}' do not match the datetimeindex of the "
+                f"scenario ({len(datetimeindex)} periods starting at {datetimeindex[0]}). "
+                f"Note that 'periods' counts the timesteps at frequency '{freq}'."
+            )
 
-    # subsequently apply filters
-    filtered_df = update_filtered_df(df, filters)
+    edp.data.update(resampled)
 
-    # calculate emission limit and prepare data frame in case all necessary data is available
-    _filtered_df = filtered_df.copy().set_index("var_name")
-    try:
-        emission_limit = calculate_emission_limit(
-            _filtered_df.at["emissions_1990", "var_value"],
-            _filtered_df.at["emissions_not_modeled", "var_value"],
-            _filtered_df.at["emission_reduction_factor", "var_value"],
-        )
-    except KeyError:
-        emission_limit = None
-
-    emission_limit_df = pd.DataFrame(
-        {
-            "var_name": "emission_limit",
-            "var_value": emission_limit,
-            "carrier": "emission",
-            "var_unit": "kg_CO2_eq",
-            "scenario_key": "ALL",
-        },
-        index=[0],
+    if factor != 1:
+        logger.info(f"Resampled sequences to frequency '{freq}' (factor {factor}).")
+
+    return edp, factor
+
+
+def reduce_to_representative_periods(edp, n_periods, period="D", method="hierarchical"):
+    r"""
+    Reduces all sequences of an oemoflex.EnergyDataPackage jointly to representative periods.
+
+    Parameters
+    ----------
+    edp : oemoflex.EnergyDatapackage
+        EnergyDatapackage with sequences
+    n_periods : int
+        Number of representative periods
+    period : str
+        Length of a period as pandas offset alias, e.g. 'D' or 'W'
+    method : str
+        Clustering method, 'hierarchical' or 'k_medoids'
+
+    Returns
+    -------
+    edp : oemoflex.EnergyDatapackage
+        EnergyDatapackage with reduced sequences
+    weights : pd.Series
+        Number of original timesteps each reduced timestep represents
+    mapping : pd.Series
+        Reduced timeindex for each original timestep
+    error : pd.DataFrame
+        Clustering error per profile
+    """
+    sequences = {
+        name: data
+        for name, data in edp.data.items()
+        if isinstance(data.index, pd.DatetimeIndex)
+    }
+
+    reduced, weights, mapping, error = tsa.aggregate_sequences(
+        sequences, n_periods=n_periods, period=period, method=method
     )
 
-    # add emission limit to filtered additional scalars and adapt format of data frame
-    add_scalars = pd.concat([filtered_df, emission_limit_df], sort=False)
-    add_scalars.reset_index(inplace=True, drop=True)
-    add_scalars.index.name = "id_scal"
+    edp.data.update(reduced)
 
-    return add_scalars
+    logger.info(
+        f"Reduced {len(mapping)} timesteps to {len(weights)} timesteps of {n_periods} "
+        f"representative periods of length '{period}' using '{method}' clustering."
+    )
+    logger.info(f"Clustering error per profile:\n{error}")
+
+    return edp, weights, mapping, error
+
+
+def get_base_scenario_path(destination, base_scenario):
+    r"""
+    Returns the path of the preprocessed datapackage of `base_scenario`, given the `destination`
+    ``results/{scenario}/preprocessed`` of the scenario.
+    """
+    results_dir = os.path.dirname(os.path.dirname(os.path.normpath(destination)))
+
+    return os.path.join(results_dir, base_scenario, "preprocessed")
 
 
-def save_additional_scalars(additional_scalars, destination):
-    """Saves `additional_scalars` to additional_scalar_file in `destination`"""
+def load_additional_scalars(scalars, filters, scenario):
+    """Loads additional scalars like the emission limit and filters by 'scenario_key'
+
+    Returns the filtered additional scalars in oemof-b3 format and the typed additional scalars
+    that are read in `optimize`."""
+    filtered = filter_additional_scalars(
+        scalars,
+        {scenario: filters},
+        el_gas_relation=config.settings.build_datapackage.el_gas_relation,
+        emission=config.settings.build_datapackage.emission,
+    )
+
+    typed_scalars = calculate_additional_scalars(
+        filtered,
+        el_gas_relation=config.settings.build_datapackage.el_gas_relation,
+        emission=config.settings.build_datapackage.emission,
+    )[scenario]
+
+    return to_b3_scalars(filtered, typed_scalars), typed_scalars
+
+
+def save_additional_scalars(additional_scalars, typed_scalars, destination):
+    """Saves `additional_scalars` to additional_scalar_file and `typed_scalars` to
+    typed_additional_scalars_file in `destination`"""
     filename = os.path.join(
         destination, config.settings.build_datapackage.additional_scalars_file
     )
     save_df(additional_scalars, filename)
 
-
-def calculate_emission_limit(
-    emissions_1990, emissions_not_modeled, emission_reduction_factor
-):
-    """Calculates the emission limit.
-    Emission limit is calculated by
-    emissions_1990 * (1 - emission_reduction_factor) - emissions_not_modeled"""
-
-    return emissions_1990 * (1 - emission_reduction_factor) - emissions_not_modeled
+    save_typed_additional_scalars(
+        typed_scalars,
+        os.path.join(
+            destination, config.settings.build_datapackage.typed_additional_scalars_file
+        ),
+    )
 
 
 if __name__ == "__main__":
@@ -279,7 +390,9 @@ if __name__ == "__main__":
     filters = OrderedDict(sorted(scenario_specs["filter_scalars"].items()))
 
     # load additional scalars like "emission_limit" and filter by `filters` in 'scenario_key'
-    additional_scalars = load_additional_scalars(scalars=scalars, filters=filters)
+    additional_scalars, typed_scalars = load_additional_scalars(
+        scalars=scalars, filters=filters, scenario=scenario_specs["name"]
+    )
 
     # Drop those scalars that do not belong to a specific component
     scalars = scalars.loc[~scalars["name"].isna()]
@@ -296,13 +409,60 @@ if __name__ == "__main__":
 
     edp = parametrize_sequences(edp, ts, filters)
 
+    # resample sequences to the frequency of the scenario
+    edp, resampling_factor = resample_sequences(edp, datetimeindex)
+
+    # reduce sequences to representative periods
+    tsa_specs = scenario_specs.get("timeseries_aggregation")
+    if tsa_specs:
+        edp, weights, mapping, error = reduce_to_representative_periods(
+            edp, **tsa_specs
+        )
+
     # save to csv
     edp.to_csv_dir(destination)
+    if tsa_specs:
+        tsa.save_aggregation(destination, weights, mapping, error)
     save_additional_scalars(
-        additional_scalars=additional_scalars, destination=destination
+        additional_scalars=additional_scalars,
+        typed_scalars=typed_scalars,
+        destination=destination,
     )
 
     # add metadata
-    edp.infer_metadata(
-        foreign_keys_update=foreign_keys_update,
-    )
+    if config.settings.build_datapackage.metadata_cache:
+        infer_metadata_cached(
+            edp,
+            basepath=destination,
+            name=scenario_specs["name"],
+            model_structure=model_structure,
+            foreign_keys_update=foreign_keys_update,
+            cache_dir=config.settings.build_datapackage.metadata_cache_dir,
+        )
+    else:
+        edp.infer_metadata(
+            foreign_keys_update=foreign_keys_update,
+        )
+
+    # record resampling factor in metadata
+    if resampling_factor != 1:
+        update_metadata(
+            destination,
+            {
+                tsa.RESAMPLING_KEY: {
+                    "freq": datetimeindex.freqstr,
+                    "factor": resampling_factor,
+                }
+            },
+        )
+
+    # store as delta relative to the base scenario
+    base_scenario = scenario_specs.get("base_scenario")
+    if base_scenario:
+        base_path = get_base_scenario_path(destination, base_scenario)
+        delta = write_delta(destination, base_path)
+        logger.info(
+            f"Stored datapackage as delta relative to '{base_path}'. "
+            f"Kept {len([k for k in delta['resources'].values() if k != 'base'])} "
+            f"of {len(delta['resources'])} resources."
+        )
@@ -0,0 +1,73 @@
+# coding: utf-8
+r"""
+Inputs
+-------
+scenarios : list[str]
+    A list of paths ``results/{scenario}/optimized`` of the scenarios of a group.
+destination : path
+    ``results/joined_scenarios/{scenario_group}/solver_telemetry/``: Target path to store the
+    joined solver telemetry.
+
+Outputs
+---------
+summary.csv
+    Solver telemetry (status, objective, gap, nodes, times, presolve reductions and LP
+    relaxation) with one row per scenario.
+gap_trajectories.csv
+    Best solution, best possible objective and relative gap over time of all scenarios.
+
+Description
+-------------
+This script joins the solver telemetry of a group of scenarios. The telemetry is read from
+``logs/{scenario}_solver_telemetry.json`` saved by `optimize`. If it is missing, the cbc log
+``logs/{scenario}_solver_log.log`` is parsed.
+"""
+import logging
+import os
+import sys
+
+from oemof_b3.tools.solver_log import aggregate_telemetry, load_telemetry, read_cbc_log
+
+logger = logging.getLogger()
+
+LOGS = "logs"
+
+
+def get_scenario_name(optimized):
+    r"""Returns the name of the scenario from its path ``results/{scenario}/optimized``."""
+    return os.path.basename(os.path.dirname(os.path.normpath(optimized)))
+
+
+def load_scenario_telemetry(scenario, logs=LOGS):
+    r"""Returns the solver telemetry of `scenario` or None if there is no solver log."""
+    path = os.path.join(logs, f"{scenario}_solver_telemetry.json")
+    if os.path.exists(path):
+        return load_telemetry(path)
+
+    path = os.path.join(logs, f"{scenario}_solver_log.log")
+    if os.path.exists(path):
+        return read_cbc_log(path)
+
+    logger.warning(f"No solver telemetry or log found for scenario '{scenario}'.")
+    return None
+
+
+if __name__ == "__main__":
+    paths_scenarios = sys.argv[1:-1]
+
+    destination = sys.argv[-1]
+
+    telemetries = {}
+    for path in paths_scenarios:
+        scenario = get_scenario_name(path)
+        telemetry = load_scenario_telemetry(scenario)
+        if telemetry is not None:
+            telemetries[scenario] = telemetry
+
+    summary, trajectories = aggregate_telemetry(telemetries)
+
+    if not os.path.exists(destination):
+        os.makedirs(destination)
+
+    summary.to_csv(os.path.join(destination, "summary.csv"))
+    trajectories.to_csv(os.path.join(destination, "gap_trajectories.csv"), index=False)
@@ -10,11 +10,15 @@ optimized : str
     with optimization results and parameters.
 logfile : str
     ``logs/{scenario}.log``: path to logfile
+sweep : str
+    Optional pairs of ``results/{scenario}/preprocessed`` ``results/{scenario}/optimized/`` of
+    further scenarios that are optimized in a sweep together with the first scenario.
 
 Outputs
 ---------
-es.dump
-    oemof.solph.EnergySystem with results, meta-results and parameters
+results store
+    Results and meta-results in compressed columnar arrays and json together with the
+    oemof.solph.EnergySystem and its parameters (see :mod:`oemof_b3.tools.results_store`)
 
 Description
 -------------
@@ -27,13 +31,101 @@ The following constraints are added:
     To use this constraint you need to copy
     [`equate_flows.py`](https://github.com/oemof/oemof-solph/blob/features/equate-flows/src/oemof/solph/constraints/equate_variables.py)
     of oemof.solph into `/tools` directory of `oemof-B3`.
-The EnergySystem with results, meta-results and parameters is saved.
+The additional scalars (emission limit, electricity-gas relations and output parameters of
+backpressure CHPs) are read from the typed structure saved in `build_datapackage`.
+The results and meta-results are saved in a results store together with the EnergySystem and its
+parameters.
+
+If the datapackage is stored as delta relative to the datapackage of a base scenario, it is
+materialized in a temporary directory before it is loaded.
+
+If ``optimize.profile`` is set in the settings, wall time and memory of the phases (loading the
+datapackage, building the model, adding constraints, solving, extracting results, releasing the
+model, deriving parameters, dumping) as well as the number of constraints and variables per block
+of the model are saved to ``logs/{scenario}_profile.json`` next to the solver log.
+
+If the sequences of the datapackage have been reduced to representative periods in
+`build_datapackage`, the weights of the timesteps are passed to oemof.solph as `timeincrement`.
+The representative periods are then optimized as one consecutive sequence, storages are coupled
+between consecutive representative periods only (see :mod:`oemof_b3.tools.timeseries_aggregation`).
+The idle time counts timesteps and is not available with representative periods.
+If the sequences have been resampled, the idle time is rescaled to the number of resampled
+timesteps.
+
+If ``optimize.rolling_horizon.horizon`` is set in the settings, the EnergySystem is optimized
+window by window with a rolling horizon (see :mod:`oemof_b3.tools.rolling_horizon`). Storage levels,
+the status of the methanation reactor for the idle time and the remaining emission budget are
+handed over between the windows. The results are assembled to the same shape as the results of a
+monolithic optimization. If the results of a reference optimization are available in
+``optimize.rolling_horizon.reference``, the deviation of the objective is logged.
+
+If ``optimize.decomposition.period`` is set (e.g. 'W' or 'M'), the EnergySystem is optimized by
+temporal decomposition (see :mod:`oemof_b3.tools.decomposition`). The blocks are solved in
+``optimize.decomposition.processes`` parallel processes, the storage hand-over between them is
+relaxed with Lagrange multipliers, which are updated until the gap between the lower and the upper
+bound is within ``optimize.decomposition.tolerance``. Bounds and wall time are saved in the meta
+results and compared with the objective and the wall time of the monolithic optimization in
+``optimize.decomposition.reference``, if available.
+
+If further scenarios are passed (sweep mode, see :mod:`oemof_b3.tools.sweep`), their datapackages
+have to equal the datapackage of the first scenario. They may only differ in the emission limit
+and the factors of the electricity/gas relations. The model is built once with these values as
+mutable parameters and re-solved for each scenario, warm-started with the previous solution if
+the solver allows it. The results of each scenario are saved to its own target path.
+
+If ``optimize.backend`` is set to 'matrix', the constraint matrix is assembled directly as sparse
+arrays instead of pyomo expressions, written as MPS and solved with cbc (see
+:mod:`oemof_b3.tools.matrix_model`). The idle time is set with the linear formulation then.
+
+If ``optimize.solution_cache.directory`` is set (disabled by default), a canonical hash of the
+model and the solver options is computed before solving (see
+:mod:`oemof_b3.tools.solution_cache`). If results for this hash are cached, they are restored
+instead of solving the model. Otherwise the results are added to the cache while they are
+collected, whose least recently used entries are evicted beyond
+``optimize.solution_cache.max_size_mb``.
+
+If cbc is used, its log is parsed to solver telemetry (presolve reductions, LP relaxation time,
+branch-and-bound nodes, gap trajectory and status), which is saved to
+``logs/{scenario}_solver_telemetry.json`` (see :mod:`oemof_b3.tools.solver_log`).
+
+If ``optimize.prune`` is set, inert components (e.g. with zero capacity and without
+investment) are removed and fixed flows of sources and sinks are merged per bus before the model
+is built (see :mod:`oemof_b3.tools.pruning`). The pruned components are restored with zero or
+fixed results before the EnergySystem is saved.
+
+If ``optimize.relax_and_repair.enabled`` is set, models with nonconvex flows (e.g. the
+methanation reactor) are solved heuristically (see :mod:`oemof_b3.tools.relax_and_repair`): the
+LP relaxation is solved, the statuses of the nonconvex flows are rounded at
+``optimize.relax_and_repair.threshold`` and repaired to satisfy the minimum up- and downtimes and
+the idle time, and the LP is solved again with the statuses fixed. The objective of the LP
+relaxation is reported as lower bound in the meta results. If the repaired statuses are infeasible,
+the MILP is solved instead.
+
+If the scenario has a reference scenario in ``optimize.warm_start.references`` (e.g.
+'2050-gas_moreCH4' for '2050-gas_moreCH4-methanation'), whose results are available in
+``optimize.warm_start.path`` (results store or `es_dump`), the values of its flows, statuses and
+storage contents are mapped onto the model by label and timestep and passed to the solver as
+initial MIP start (see :mod:`oemof_b3.tools.warm_start`). The telemetry of each optimization without
+warm start is kept in ``logs/{scenario}_solver_telemetry_cold.json``. The time to the first integer
+solution is compared with the one of this cold start of the same scenario or, if it has not been
+optimized without warm start yet, with the one of the reference scenario as proxy, and saved in the
+meta results.
+
+The results are extracted from the solved model with
+:func:`oemof_b3.tools.results_extraction.iter_results`, which reads the values of each variable at
+once instead of iterating over single variables like `oemof.solph.processing.results`. They are
+collected per flow or node as arrays in a :class:`oemof_b3.tools.results_store.ResultsWriter`,
+so that the DataFrames of all results are never held at once. The model is released before the
+parameters are derived and the results store is written, which lowers the peak memory.
 
 """
+import functools
+import gc
 import logging
+import math
 import os
 import sys
-import numpy as np
+from collections import defaultdict
 
 from oemof.solph import EnergySystem, Model, constraints
 from oemof.solph import processing
@@ -43,76 +135,53 @@ from oemof.solph import processing
 from oemof.tabular import datapackage  # noqa
 from oemof_b3.facades import TYPEMAP
 
-from oemof_b3.tools import data_processing as dp
-from oemof_b3.tools.equate_flows import equate_flows_by_keyword
+from oemof_b3.tools import results_extraction
+from oemof_b3.tools import timeseries_aggregation as tsa
+from oemof_b3.tools.additional_scalars import (
+    BPCHP_OUTPUT_PARAMETERS,
+    EL_GAS_RELATIONS,
+    EMISSION_LIMIT,
+    load_additional_scalars,
+)
+from oemof_b3.tools.decomposition import log_bounds, optimize_decomposition
+from oemof_b3.tools.delta_datapackage import materialized
+from oemof_b3.tools.equate_flows import (
+    build_flow_keyword_index,
+    equate_flows_by_keyword,
+)
+from oemof_b3.tools.matrix_model import MatrixModel
+from oemof_b3.tools.profiling import Profiler
+from oemof_b3.tools.pruning import prune
+from oemof_b3.tools.relax_and_repair import solve_relax_and_repair
+from oemof_b3.tools.results_store import ResultsStore, ResultsWriter
+from oemof_b3.tools.rolling_horizon import log_objective_gap, optimize_rolling_horizon
 from oemof_b3.tools.set_idle_time import set_idle_time
+from oemof_b3.tools.solution_cache import SolutionCache, hash_model
+from oemof_b3.tools.solver_log import (
+    is_infeasible,
+    load_telemetry,
+    read_cbc_log,
+    save_telemetry,
+)
+from oemof_b3.tools.sweep import (
+    SweepSolver,
+    add_mutable_emission_limit,
+    add_mutable_factor,
+    datapackages_equal,
+    update_emission_limit,
+    update_factors,
+)
+from oemof_b3.tools.warm_start import (
+    compare_time_first_solution,
+    load_reference,
+    set_warm_start,
+)
 from oemof_b3.config import config
 
 
 logger = logging.getLogger()
 
-
-def drop_values_by_keyword(df, keyword="None"):
-    """drops row if `var_value` is None"""
-    drop_indices = df.loc[df.var_value == keyword].index
-    df = df.drop(drop_indices)
-    return df
-
-
-def get_emission_limit(scalars):
-    """Gets emission limit from scalars and returns None if it is missing or None."""
-    emission_df_raw = scalars.loc[scalars["carrier"] == "emission"].set_index(
-        "var_name"
-    )
-    emission_df = drop_values_by_keyword(emission_df_raw)
-
-    # return None if no emission limit is given ('None' or entry missing)
-    if emission_df.empty or emission_df.at["emission_limit", "var_value"] is np.nan:
-        print("No emission limit will be set.")
-        return None
-    else:
-        limit = emission_df.at["emission_limit", "var_value"]
-        print(f"Emission limit will be set to {limit}.")
-        return limit
-
-
-def get_electricity_gas_relations(scalars):
-    r"""
-    Gets electricity/gas relations from scalars. Returns None if no relations are given.
-
-    Returns
-    -------
-    pd.DataFrame
-        Contains rows of scalars with 'var_name' `EL_GAS_RELATION`
-    If no relation is given returns None.
-    """
-    relations_raw = scalars.loc[
-        scalars.var_name == config.settings.optimize.el_gas_relation
-    ]
-    # drop relations that are None
-    relations = drop_values_by_keyword(relations_raw)
-    if relations.empty:
-        print("No gas electricity relation will be set.")
-        return None
-    else:
-        busses = relations.carrier.drop_duplicates().values
-        print(f"Gas electricity relations will be set for busses: {busses}")
-        return relations
-
-
-def get_bpchp_output_parameters(scalars):
-    r"""Gets 'output_parameters' of backpressure CHPs from scalars and
-    returns None if it is missing or None."""
-    bpchp_outs_raw = scalars.loc[
-        (scalars.tech == "bpchp") & (scalars.var_name == "output_parameters")
-    ]
-
-    # drop rows that have empty dict as var_value
-    bpchp_outs = drop_values_by_keyword(bpchp_outs_raw, "{}")
-    if bpchp_outs.empty:
-        return None
-    else:
-        return bpchp_outs
+profiler = Profiler()
 
 
 def add_output_parameters_to_bpchp(parameters, energysystem):
@@ -120,40 +189,55 @@ def add_output_parameters_to_bpchp(parameters, energysystem):
     Adds keywords for electricity-gas relation constraint to backpressure CHPs.
 
     This is necessary as oemof.tabular does not support `output_parameters` of these components,
-    yet. The keywords are set as attributes of the output flow towards `heat_bus`.
+    yet. The keywords are set as attributes of the output flow towards `heat_bus`. The
+    components are looked up by label in `energysystem.groups`, the keywords of each flow are
+    set at once.
 
     Parameters
     ----------
-    parameters : pd.DataFrame
-        Contains output_parameters of backpressure CHP scalars.
+    parameters : dict
+        Keywords and their values (output_parameters) per backpressure CHP label, e.g.
+        {"B-ch4-bpchp": {"gas-heat_central-B": True}}
     energysystem : oemof.solph.network.EnergySystem
         The energy system
+
+    Returns
+    -------
+    index : dict
+        Output flows (i, o) of the backpressure CHPs per keyword, which can be passed to
+        `build_flow_keyword_index`
     """
-    # rename column 'name' as is collides with iterrows()
-    parameters.rename(columns={"name": "name_"}, inplace=True)
-    for i, element in parameters.iterrows():
-        if element.name_ in energysystem.groups:
-            # get heat bus the component is connected to
-            bus = energysystem.groups[element.name_].heat_bus
-
-            # get keyword and boolean value
-            split_str = element.var_value.split('"')
-            keyword = split_str[1]
-            value = bool(split_str[2].split("}")[0].split()[1])
-
-            # set keyword as attribute with value
-            setattr(
-                energysystem.groups[element.name_].outputs.data[bus], keyword, value
-            )
-        else:
-            logging.warning(
-                f"No element '{element.name_}' in EnergySystem. Cannot add output_parameters."
-            )
+    missing = {name for name in parameters if name not in energysystem.groups}
+    if missing:
+        logging.warning(
+            f"No elements {sorted(missing)} in EnergySystem. Cannot add output_parameters."
+        )
+
+    index = defaultdict(list)
+    for name, output_parameters in parameters.items():
+        if name in missing:
+            continue
 
-    return energysystem
+        # output flow towards the heat bus the component is connected to
+        node = energysystem.groups[name]
+        flow = (node, node.heat_bus)
 
+        # set keywords as attributes with value
+        vars(node.outputs.data[node.heat_bus]).update(output_parameters)
+        for keyword in output_parameters:
+            index[keyword].append(flow)
 
-def add_electricity_gas_relation_constraints(model, relations):
+    return dict(index)
+
+
+def get_relation_name(relation):
+    r"""Returns the name of the constraint of an electricity/gas relation."""
+    return f"equate_flows_{relation['carrier']}-{relation['region']}"
+
+
+def add_electricity_gas_relation_constraints(
+    model, relations, mutable=False, keyword_index=None
+):
     r"""
     Adds constraint `equate_flows_by_keyword` to `model`.
 
@@ -168,31 +252,564 @@ def add_electricity_gas_relation_constraints(model, relations):
     ----------
     model : oemof.solph.Model
         optmization model
-    relations : pd.DataFrame
-        Contains electricity/gas relations in column 'var_value'. Further contains at least columns
-        'carrier' and 'region'.
+    relations : list of dict
+        Electricity/gas relations with keys 'carrier', 'region' and 'factor'.
+    mutable : bool
+        If True, the factors are added as mutable parameters `<name>_factor` that can be updated
+        before re-solving the model.
+    keyword_index : dict
+        Flows per keyword that are already known, e.g. returned by
+        `add_output_parameters_to_bpchp`
     """
-    for index, row in relations.iterrows():
+    # index flows by keywords once for all relations
+    index = build_flow_keyword_index(model, keyword_index)
+
+    for relation in relations:
         # Formulate suffix for keywords <carrier>-<region>
-        suffix = f"{row.carrier}-{row.region}"
+        suffix = f"{relation['carrier']}-{relation['region']}"
+        name = get_relation_name(relation)
+
+        if isinstance(model, MatrixModel):
+            model.equate_flows(
+                index.get(f"{config.settings.optimize.gas_key}-{suffix}", []),
+                index.get(f"{config.settings.optimize.el_key}-{suffix}", []),
+                factor1=relation["factor"],
+                name=name,
+            )
+            continue
+
+        factor = relation["factor"]
+        if mutable:
+            factor = add_mutable_factor(model, name, factor)
+
         equate_flows_by_keyword(
             model=model,
             keyword1=f"{config.settings.optimize.gas_key}-{suffix}",
             keyword2=f"{config.settings.optimize.el_key}-{suffix}",
-            factor1=row.var_value,
-            name=f"equate_flows_{suffix}",
+            factor1=factor,
+            name=name,
+            index=index,
+            matrix=config.settings.optimize.el_gas_relation_matrix and not mutable,
         )
 
 
-def get_additional_scalars():
-    """Returns additional scalars as pd.DataFrame or None if file does not exist"""
-    filename_add_scalars = os.path.join(preprocessed, "additional_scalars.csv")
-    if os.path.exists(filename_add_scalars):
-        scalars = dp.load_b3_scalars(filename_add_scalars)
-        return scalars
-    else:
+def get_additional_scalars(preprocessed):
+    r"""
+    Returns typed additional scalars. Datapackages built before the typed structure was
+    introduced are read from the csv file. Datapackages without additional scalars (e.g. the
+    examples) get empty defaults.
+    """
+    try:
+        return load_additional_scalars(
+            os.path.join(
+                preprocessed,
+                config.settings.build_datapackage.typed_additional_scalars_file,
+            ),
+            legacy_path=os.path.join(
+                preprocessed, config.settings.build_datapackage.additional_scalars_file
+            ),
+            el_gas_relation=config.settings.optimize.el_gas_relation,
+        )
+    except FileNotFoundError:
+        logger.warning(
+            f"No additional scalars in '{preprocessed}'. No emission limit, electricity-gas "
+            "relations or output parameters of backpressure CHPs will be set."
+        )
+        return {
+            EMISSION_LIMIT: None,
+            EL_GAS_RELATIONS: [],
+            BPCHP_OUTPUT_PARAMETERS: {},
+        }
+
+
+def get_idle_time_flows(flows):
+    r"""
+    Returns the flows between which the idle time is set: the input flow of the educts storage
+    and the output flow of the products storage of the methanation reactor. Returns None if the
+    methanation reactor is not part of the model.
+    """
+    a = [f for f in flows if f[0].label == "B-h2-methanation-combine-educts"]
+    b = [
+        f
+        for f in flows
+        if (f[0].label == "B-h2-methanation-storage_products" and f[1].label == "B-ch4")
+    ]
+    if a and b:
+        assert len(a) == len(b) == 1
+        return a[0], b[0]
+    return None
+
+
+def create_model(
+    es,
+    emission_limit,
+    initial_status=None,
+    el_gas_relations=None,
+    idle_time=None,
+    mutable=False,
+    keyword_index=None,
+):
+    r"""
+    Creates an oemof.solph.Model from `es` and adds the constraints.
+
+    Parameters
+    ----------
+    es : oemof.solph.EnergySystem
+        The energy system
+    emission_limit : float or None
+        Emission limit, not set if None
+    initial_status : dict
+        Status of the timesteps before the first timestep per flow (labels), used for the idle
+        time in rolling horizon optimization
+    el_gas_relations : list of dict
+        Electricity/gas relations
+    idle_time : int or None
+        Idle time of the methanation reactor in timesteps, not set if None
+    mutable : bool
+        If True, the emission limit and the factors of the electricity/gas relations are added
+        as mutable parameters (sweep mode)
+    keyword_index : dict
+        Flows per keyword that are already known, see `add_output_parameters_to_bpchp`
+
+    Returns
+    -------
+    m : oemof.solph.Model or oemof_b3.tools.matrix_model.MatrixModel
+    """
+    matrix = config.settings.optimize.backend == "matrix"
+
+    # create model from energy system (this is just oemof.solph)
+    with profiler.phase("model"):
+        m = MatrixModel(es) if matrix else Model(es)
+
+    # add constraints
+    with profiler.phase("constraints"):
+        if matrix:
+            if emission_limit is not None:
+                m.emission_limit(emission_limit)
+        elif mutable:
+            add_mutable_emission_limit(m, emission_limit)
+        elif emission_limit is not None:
+            constraints.emission_limit(m, limit=emission_limit)
+        if el_gas_relations:
+            add_electricity_gas_relation_constraints(
+                model=m,
+                relations=el_gas_relations,
+                mutable=mutable,
+                keyword_index=keyword_index,
+            )
+
+        # set idle time between storage input and output
+        idle_time_flows = get_idle_time_flows(m.flows)
+        if idle_time is not None and idle_time_flows is not None:
+            f1, f2 = idle_time_flows
+            initial_status_f1 = (initial_status or {}).get((f1[0].label, f1[1].label))
+            if matrix:
+                m.set_idle_time(f1, f2, idle_time, initial_status=initial_status_f1)
+            else:
+                set_idle_time(
+                    m,
+                    f1,
+                    f2,
+                    idle_time,
+                    formulation=config.settings.optimize.idle_time_formulation,
+                    initial_status=initial_status_f1,
+                )
+                # kept for the repair of the statuses (relax and repair)
+                m.idle_time = (f1, f2, idle_time, initial_status_f1)
+
+    if matrix:
+        return m
+
+    # tell the model to get the dual variables when solving
+    if config.settings.optimize.receive_duals:
+        m.receive_duals()
+
+    profiler.count(m)
+
+    return m
+
+
+def get_solver_logfile(logfile):
+    r"""Returns the path of the solver log next to `logfile`."""
+    return logfile.split(".")[0] + "_solver_log.log"
+
+
+def get_telemetry_file(logfile):
+    r"""Returns the path of the solver telemetry next to `logfile`."""
+    return logfile.split(".")[0] + "_solver_telemetry.json"
+
+
+def get_cold_telemetry_file(logfile):
+    r"""Returns the path of the solver telemetry of the last optimization without warm start."""
+    return logfile.split(".")[0] + "_solver_telemetry_cold.json"
+
+
+def save_solver_telemetry(solver_logfile, warmstart=False):
+    r"""
+    Parses the log of cbc in `solver_logfile` and saves the telemetry next to it as
+    ``{scenario}_solver_telemetry.json``. The telemetry of an optimization without warm start is
+    additionally saved as ``{scenario}_solver_telemetry_cold.json``, the baseline of later
+    warm-started optimizations of the scenario.
+    """
+    if config.settings.optimize.solver != "cbc" or not os.path.exists(solver_logfile):
+        return
+
+    telemetry = read_cbc_log(solver_logfile)
+    save_telemetry(
+        telemetry, solver_logfile.replace("_solver_log.log", "_solver_telemetry.json")
+    )
+    if not warmstart:
+        save_telemetry(
+            telemetry,
+            solver_logfile.replace("_solver_log.log", "_solver_telemetry_cold.json"),
+        )
+
+    logger.info(
+        f"Solver status: '{telemetry['status']}', gap: {telemetry['gap']}, "
+        f"nodes: {telemetry['nodes']}, wallclock time: {telemetry['time_wallclock']} s."
+    )
+
+
+def solve_model(m, logfile, warmstart=False):
+    r"""
+    Solves `m` with the solver settings and saves the solver log next to `logfile`. If
+    `warmstart` is True, the values of the variables are passed to the solver as initial
+    solution.
+
+    If ``optimize.relax_and_repair.enabled`` is set, the model is solved by LP relaxation and
+    repair of the statuses of the nonconvex flows and the information on the heuristic (e.g. the
+    lower bound and the gap) is returned. Returns None otherwise.
+    """
+    # save solver log to scenario specific location
+    solve_kwargs = dict(config.settings.optimize.solve_kwargs)
+    solve_kwargs["logfile"] = get_solver_logfile(logfile)
+    if warmstart:
+        solve_kwargs["warmstart"] = True
+
+    logger.info(
+        f"Solving with solver '{config.settings.optimize.solver}' "
+        f"using solve_kwargs '{solve_kwargs}' "
+        f"and cmdline_options '{config.settings.optimize.cmdline_options}'."
+    )
+
+    info = None
+    with profiler.phase("solve"):
+        if isinstance(m, MatrixModel):
+            m.solve(
+                solver=config.settings.optimize.solver,
+                cmdline_options=config.settings.optimize.cmdline_options,
+                logfile=solve_kwargs["logfile"],
+                keepfiles=solve_kwargs.get("keepfiles", False),
+            )
+        else:
+            solve = functools.partial(
+                Model.solve,
+                solver=config.settings.optimize.solver,
+                solve_kwargs=solve_kwargs,
+                cmdline_options=config.settings.optimize.cmdline_options,
+            )
+
+            relax_and_repair = config.settings.optimize.relax_and_repair
+            if relax_and_repair.enabled:
+                info = solve_relax_and_repair(
+                    m,
+                    solve,
+                    threshold=relax_and_repair.threshold,
+                    idle_time=getattr(m, "idle_time", None),
+                )
+            else:
+                info = None
+                solve(m)
+
+    save_solver_telemetry(solve_kwargs["logfile"], warmstart=warmstart)
+
+    return info
+
+
+def get_solution_cache():
+    r"""Returns the solution cache given in the settings or None if it is disabled."""
+    settings = config.settings.optimize.solution_cache
+    if not settings.directory:
         return None
 
+    max_size = None
+    if settings.max_size_mb is not None:
+        max_size = int(settings.max_size_mb * 1e6)
+
+    return SolutionCache(settings.directory, max_size=max_size)
+
+
+def get_model_hash(m):
+    r"""Returns the canonical hash of `m` and the solver options."""
+    cmdline_options = dict(config.settings.optimize.cmdline_options)
+
+    # solutions of the heuristic differ from those of the MILP
+    relax_and_repair = config.settings.optimize.relax_and_repair
+    if relax_and_repair.enabled and not isinstance(m, MatrixModel):
+        cmdline_options["relax_and_repair_threshold"] = relax_and_repair.threshold
+
+    with profiler.phase("hash"):
+        return hash_model(
+            m,
+            config.settings.optimize.solver,
+            solve_kwargs=config.settings.optimize.solve_kwargs,
+            cmdline_options=cmdline_options,
+            receive_duals=config.settings.optimize.receive_duals,
+        )
+
+
+def save_profile(logfile):
+    r"""Saves the measurements of the profiler next to the solver log."""
+    if config.settings.optimize.profile:
+        path = logfile.split(".")[0] + "_profile.json"
+        profiler.save(path)
+        logger.info(f"Saved profile of the optimization to '{path}'.")
+
+
+def get_scenario_name(optimized):
+    r"""Returns the name of the scenario from its path ``results/{scenario}/optimized``."""
+    return os.path.basename(os.path.dirname(os.path.normpath(optimized)))
+
+
+def get_sweep(preprocessed, additional_scalars, paths):
+    r"""
+    Returns the scenarios of a sweep as list of (preprocessed, optimized, additional scalars).
+
+    Raises a ValueError if the datapackage, the output parameters of backpressure CHPs or the
+    electricity/gas relations (apart from their factors) of a scenario differ from those of the
+    first scenario, as they cannot be changed in the model.
+    """
+    relations = sorted(map(get_relation_name, additional_scalars[EL_GAS_RELATIONS]))
+
+    sweep = []
+    for other_preprocessed, other_optimized in paths:
+        other_scalars = get_additional_scalars(other_preprocessed)
+
+        if not datapackages_equal(preprocessed, other_preprocessed):
+            raise ValueError(
+                f"Datapackage '{other_preprocessed}' differs from '{preprocessed}'. "
+                "Only scenarios with equal datapackages can be optimized in a sweep."
+            )
+
+        if (
+            other_scalars[BPCHP_OUTPUT_PARAMETERS]
+            != additional_scalars[BPCHP_OUTPUT_PARAMETERS]
+            or sorted(map(get_relation_name, other_scalars[EL_GAS_RELATIONS]))
+            != relations
+        ):
+            raise ValueError(
+                f"Additional scalars of '{other_preprocessed}' differ from those of "
+                f"'{preprocessed}' in more than the emission limit and the factors of "
+                "the electricity/gas relations."
+            )
+
+        sweep.append((other_preprocessed, other_optimized, other_scalars))
+
+    return sweep
+
+
+def optimize_sweep(m, sweep, logfile, pruning=None):
+    r"""
+    Re-solves the model `m` with mutable parameters for each scenario in `sweep` and saves the
+    results of each scenario.
+
+    Parameters
+    ----------
+    m : oemof.solph.Model
+        Model created with `mutable` True
+    sweep : list of tuple
+        (preprocessed, optimized, additional scalars) of each scenario
+    logfile : str
+        Path of the logfile, the solver logs are saved next to it per scenario
+    pruning : oemof_b3.tools.pruning.Pruning
+        Pruning of the EnergySystem of `m` to restore the results
+    """
+    solve_kwargs = dict(config.settings.optimize.solve_kwargs)
+
+    sweep_solver = SweepSolver(
+        m,
+        config.settings.optimize.solver,
+        solve_kwargs=solve_kwargs,
+        cmdline_options=config.settings.optimize.cmdline_options,
+    )
+
+    for n, (scenario_preprocessed, scenario_optimized, scalars) in enumerate(sweep):
+        scenario = get_scenario_name(scenario_optimized)
+
+        changed = update_emission_limit(m, scalars[EMISSION_LIMIT])
+        changed += update_factors(
+            m,
+            {
+                get_relation_name(relation): relation["factor"]
+                for relation in scalars[EL_GAS_RELATIONS]
+            },
+        )
+        sweep_solver.update(changed)
+
+        logger.info(
+            f"Solving scenario '{scenario}' ({n + 1}/{len(sweep)}) of sweep with "
+            f"emission limit {scalars[EMISSION_LIMIT]}."
+        )
+
+        sweep_solver.solve_kwargs["logfile"] = get_solver_logfile(
+            os.path.join(os.path.dirname(logfile), scenario + ".log")
+        )
+        with profiler.phase("solve"):
+            sweep_solver.solve()
+
+        save_solver_telemetry(sweep_solver.solve_kwargs["logfile"])
+
+        if is_infeasible(m):
+            # the values of the variables are stale
+            logger.warning(f"No results of scenario '{scenario}' are saved.")
+            continue
+
+        m.es.meta_results = processing.meta_results(m)
+        writer = collect_results(
+            results_extraction.iter_results(m), m.es.timeindex, pruning
+        )
+
+        save_results(m.es, writer, scenario_preprocessed, scenario_optimized, pruning)
+
+
+def collect_results(results, timeindex, pruning=None):
+    r"""
+    Collects `results` in a ResultsWriter. If the EnergySystem has been pruned, the results of
+    the pruned components are restored.
+
+    Parameters
+    ----------
+    results : dict or iterable
+        Results or (key, result) yielded per flow or node by
+        :func:`oemof_b3.tools.results_extraction.iter_results`, which are extracted while they
+        are collected
+    timeindex : pd.DatetimeIndex
+        Timeindex of the EnergySystem
+    pruning : oemof_b3.tools.pruning.Pruning
+        Pruning of the EnergySystem to restore the results
+
+    Returns
+    -------
+    writer : oemof_b3.tools.results_store.ResultsWriter
+    """
+    if isinstance(results, dict):
+        results = results.items()
+
+    if pruning is not None:
+        results = pruning.restore_items(results)
+
+    writer = ResultsWriter(timeindex)
+    with profiler.phase("results"):
+        writer.update(results)
+
+    return writer
+
+
+def save_results(es, writer, preprocessed, optimized, pruning=None):
+    r"""
+    Writes the results collected in `writer` with the meta results and parameters of `es` to a
+    results store in `optimized`. If `es` has been pruned, the original EnergySystem is saved.
+    """
+    if not os.path.exists(optimized):
+        os.mkdir(optimized)
+
+    if pruning is not None:
+        pruning.es.meta_results = es.meta_results
+        es = pruning.es
+
+    with profiler.phase("parameters"):
+        es.params = processing.parameter_as_dict(es)
+
+    # write results to the results store
+    with profiler.phase("dump"):
+        writer.write(es, optimized)
+
+    # keep mapping of representative periods for postprocessing
+    tsa.copy_aggregation(preprocessed, optimized)
+
+
+def get_reference_meta_results(reference, optimized):
+    r"""
+    Returns the meta results of the reference optimization in `reference` (path of an optimized
+    EnergySystem, '{scenario}' is replaced by the name of the scenario). Returns None if no
+    reference is available.
+    """
+    if not reference:
+        return None
+
+    reference = reference.format(scenario=get_scenario_name(optimized))
+
+    if ResultsStore.exists(reference):
+        return ResultsStore(reference).meta_results
+
+    if not os.path.exists(os.path.join(reference, "es_dump.oemof")):
+        logger.info(f"No reference available in '{reference}'.")
+        return None
+
+    reference_es = EnergySystem()
+    reference_es.restore(reference)
+
+    return reference_es.meta_results
+
+
+def get_reference_objective(reference, optimized):
+    r"""Returns the objective of the reference optimization, see
+    :func:`get_reference_meta_results`."""
+    meta_results = get_reference_meta_results(reference, optimized)
+    return None if meta_results is None else meta_results["objective"]
+
+
+def log_warm_start(warm_start, logfile):
+    r"""
+    Adds the time to the first integer solution of the warm-started optimization and of a cold
+    start to `warm_start` and logs it. The cold start is the last optimization of the same
+    scenario without warm start or, if there is none, the reference scenario.
+    """
+    telemetry_file = get_telemetry_file(logfile)
+    if not os.path.exists(telemetry_file):
+        return
+
+    def _load(path):
+        return load_telemetry(path) if os.path.exists(path) else None
+
+    reference_logfile = os.path.join(
+        os.path.dirname(logfile), f"{warm_start['reference']}.log"
+    )
+
+    warm_start.update(
+        compare_time_first_solution(
+            load_telemetry(telemetry_file),
+            cold_telemetry=_load(get_cold_telemetry_file(logfile)),
+            reference_telemetry=_load(get_telemetry_file(reference_logfile)),
+        )
+    )
+
+
+def get_warm_start_reference(optimized):
+    r"""
+    Returns the name of the scenario whose results the optimization of the scenario in
+    `optimized` is warm-started with and the path of its results. Returns None if no reference
+    is given or available.
+    """
+    settings = config.settings.optimize.warm_start
+    scenario = (settings.references or {}).get(get_scenario_name(optimized))
+    if scenario is None:
+        return None
+
+    path = settings.path.format(scenario=scenario)
+    if not ResultsStore.exists(path) and not os.path.exists(
+        os.path.join(path, "es_dump.oemof")
+    ):
+        logger.info(f"No results of '{scenario}' to warm-start with in '{path}'.")
+        return None
+
+    return scenario, path
+
+
+def solve_block(model, name, logfile):
+    r"""Solves the model of block `name` of a decomposition with a solver log per block."""
+    solve_model(model, f"{logfile.split('.')[0]}_{name}.log")
+
 
 if __name__ == "__main__":
     preprocessed = sys.argv[1]
@@ -202,95 +819,275 @@ if __name__ == "__main__":
     logfile = sys.argv[3]
     logger = config.add_snake_logger(logfile, "optimize")
 
-    # get additional scalars, set to None at first
-    emission_limit = None
-    el_gas_relations = None
-    bpchp_out = None
-    additional_scalars = get_additional_scalars()
-    if additional_scalars is not None:
-        emission_limit = get_emission_limit(additional_scalars)
-        el_gas_relations = get_electricity_gas_relations(additional_scalars)
-        bpchp_out = get_bpchp_output_parameters(additional_scalars)
+    # further scenarios optimized in a sweep
+    sweep_paths = list(zip(sys.argv[4::2], sys.argv[5::2]))
+
+    # get additional scalars
+    additional_scalars = get_additional_scalars(preprocessed)
+    emission_limit = additional_scalars[EMISSION_LIMIT]
+    el_gas_relations = additional_scalars[EL_GAS_RELATIONS]
+    bpchp_out = additional_scalars[BPCHP_OUTPUT_PARAMETERS]
+
+    if emission_limit is None:
+        logger.info("No emission limit will be set.")
+    else:
+        logger.info(f"Emission limit will be set to {emission_limit}.")
+
+    if el_gas_relations:
+        busses = sorted({relation["carrier"] for relation in el_gas_relations})
+        logger.info(f"Gas electricity relations will be set for busses: {busses}")
+    else:
+        logger.info("No gas electricity relation will be set.")
 
     if not os.path.exists(optimized):
         os.mkdir(optimized)
 
+    solution_cache = get_solution_cache()
+    model_hash = None
+    cached = None
+    relax_and_repair = None
+    warm_start = None
+
     try:
-        es = EnergySystem.from_datapackage(
-            os.path.join(preprocessed, config.settings.optimize.filename_metadata),
-            attributemap={},
-            typemap=TYPEMAP,
-        )
+        sweep = []
+        if sweep_paths:
+            sweep = [(preprocessed, optimized, additional_scalars)] + get_sweep(
+                preprocessed, additional_scalars, sweep_paths
+            )
+
+            logger.info(
+                f"Optimizing a sweep of {len(sweep)} scenarios: "
+                f"{[get_scenario_name(path) for _, path, _ in sweep]}."
+            )
+
+        # materialize datapackages stored as delta relative to a base scenario
+        with profiler.phase("from_datapackage"), materialized(
+            preprocessed
+        ) as datapackage_path:
+            es = EnergySystem.from_datapackage(
+                os.path.join(
+                    datapackage_path, config.settings.optimize.filename_metadata
+                ),
+                attributemap={},
+                typemap=TYPEMAP,
+            )
+
+        # weight timesteps if sequences are reduced to representative periods
+        weights = tsa.load_weights(preprocessed)
+        if weights is not None:
+            es.timeincrement = weights.values
+
+            logger.info(
+                f"Timesteps of representative periods are weighted with weights between "
+                f"{weights.min()} and {weights.max()}."
+            )
 
         # Reduce number of timestep for debugging
         if config.settings.optimize.debug:
             es.timeindex = es.timeindex[:3]
+            if es.timeincrement is not None:
+                es.timeincrement = es.timeincrement[:3]
 
             logger.info(
                 "Optimizing in DEBUG mode: Run model with first 3 timesteps only."
             )
 
-        # add output_parameters of bpchp
-        if bpchp_out is not None:
-            es = add_output_parameters_to_bpchp(parameters=bpchp_out, energysystem=es)
-
-        # create model from energy system (this is just oemof.solph)
-        m = Model(es)
-
-        # add constraints
-        if emission_limit is not None:
-            constraints.emission_limit(m, limit=emission_limit)
-        if el_gas_relations is not None:
-            add_electricity_gas_relation_constraints(
-                model=m, relations=el_gas_relations
+        # add output_parameters of bpchp, their flows are passed on to the keyword index of the
+        # gas electricity relations
+        keyword_index = None
+        if bpchp_out:
+            keyword_index = add_output_parameters_to_bpchp(
+                parameters=bpchp_out, energysystem=es
             )
 
-        # set idle time between storage input and output
+        # idle time is given in original timesteps
+        idle_time = None
         if config.settings.optimize.set_idle_time:
-            a = [f for f in m.flows if f[0].label == "B-h2-methanation-combine-educts"]
-            b = [
-                f
-                for f in m.flows
-                if (
-                    f[0].label == "B-h2-methanation-storage_products"
-                    and f[1].label == "B-ch4"
+            if weights is not None and get_idle_time_flows(es.flows()) is not None:
+                raise NotImplementedError(
+                    "The idle time cannot be set for sequences reduced to representative "
+                    "periods, as it counts timesteps of different weights. Set "
+                    "'optimize.set_idle_time' to false."
                 )
-            ]
-            if a and b:
-                assert len(a) == len(b) == 1
-                set_idle_time(m, a[0], b[0], config.settings.optimize.idle_time)
+            idle_time = math.ceil(
+                config.settings.optimize.idle_time
+                / tsa.load_resampling_factor(preprocessed)
+            )
 
-        # tell the model to get the dual variables when solving
-        if config.settings.optimize.receive_duals:
-            m.receive_duals()
+        # remove inert components and merge fixed flows
+        pruning = None
+        if config.settings.optimize.prune:
+            with profiler.phase("prune"):
+                es, pruning = prune(es)
 
-        # save solver log to scenario specific location
-        solve_kwargs = config.settings.optimize.solve_kwargs
-        solve_kwargs["logfile"] = logfile.split(".")[0] + "_solver_log.log"
+        rolling_horizon = config.settings.optimize.rolling_horizon
+        decomposition = config.settings.optimize.decomposition
+        if rolling_horizon.horizon and sweep:
+            raise NotImplementedError(
+                "Sweeps cannot be optimized with a rolling horizon."
+            )
+        if decomposition.period and (rolling_horizon.horizon or sweep):
+            raise NotImplementedError(
+                "Rolling horizon and sweeps cannot be optimized by decomposition."
+            )
+        warm_start_reference = get_warm_start_reference(optimized)
+        if warm_start_reference is not None and (
+            rolling_horizon.horizon
+            or decomposition.period
+            or sweep
+            or config.settings.optimize.backend == "matrix"
+        ):
+            raise NotImplementedError(
+                "Warm starts are only available for the optimization of all timesteps at "
+                "once with the pyomo backend."
+            )
+        if config.settings.optimize.backend == "matrix" and (
+            rolling_horizon.horizon or sweep or decomposition.period
+        ):
+            raise NotImplementedError(
+                "Rolling horizon, decomposition and sweeps are not available with the "
+                "matrix backend."
+            )
 
-        logger.info(
-            f"Solving with solver '{config.settings.optimize.solver}' "
-            f"using solve_kwargs '{config.settings.optimize.solve_kwargs}' "
-            f"and cmdline_options '{config.settings.optimize.cmdline_options}'."
-        )
+        if rolling_horizon.horizon:
+            # read reference before its results may be overwritten
+            reference_objective = get_reference_objective(
+                rolling_horizon.reference, optimized
+            )
 
-        m.solve(
-            solver=config.settings.optimize.solver,
-            solve_kwargs=config.settings.optimize.solve_kwargs,
-            cmdline_options=config.settings.optimize.cmdline_options,
-        )
+            idle_time_flows = get_idle_time_flows(es.flows())
+            status_flows = []
+            if idle_time is not None and idle_time_flows is not None:
+                f1 = idle_time_flows[0]
+                status_flows.append((f1[0].label, f1[1].label))
+
+            results, meta_results = optimize_rolling_horizon(
+                es,
+                create_model=functools.partial(
+                    create_model,
+                    el_gas_relations=el_gas_relations,
+                    idle_time=idle_time,
+                    keyword_index=keyword_index,
+                ),
+                solve=functools.partial(solve_model, logfile=logfile),
+                horizon=rolling_horizon.horizon,
+                overlap=rolling_horizon.overlap,
+                emission_limit=emission_limit,
+                status_flows=status_flows,
+            )
+        elif decomposition.period:
+            # read reference before its results may be overwritten
+            reference_meta_results = get_reference_meta_results(
+                decomposition.reference, optimized
+            )
+
+            results, meta_results = optimize_decomposition(
+                es,
+                create_model=functools.partial(
+                    create_model,
+                    el_gas_relations=el_gas_relations,
+                    idle_time=idle_time,
+                    keyword_index=keyword_index,
+                ),
+                solve=functools.partial(solve_block, logfile=logfile),
+                period=decomposition.period,
+                processes=decomposition.processes,
+                max_iterations=decomposition.max_iterations,
+                tolerance=decomposition.tolerance,
+                emission_limit=emission_limit,
+            )
+        elif sweep:
+            m = create_model(
+                es,
+                emission_limit,
+                el_gas_relations=el_gas_relations,
+                idle_time=idle_time,
+                keyword_index=keyword_index,
+                mutable=True,
+            )
+
+            optimize_sweep(m, sweep, logfile, pruning)
+        else:
+            m = create_model(
+                es,
+                emission_limit,
+                el_gas_relations=el_gas_relations,
+                idle_time=idle_time,
+                keyword_index=keyword_index,
+            )
+
+            if solution_cache is not None:
+                model_hash = get_model_hash(m)
+                cached = solution_cache.get(model_hash, es)
+
+            if cached is None and warm_start_reference is not None:
+                scenario, path = warm_start_reference
+                with profiler.phase("warm_start"):
+                    n_set, n_variables = set_warm_start(m, load_reference(path))
+                warm_start = {
+                    "reference": scenario,
+                    "variables_set": n_set,
+                    "variables": n_variables,
+                }
+
+            if cached is None:
+                relax_and_repair = solve_model(
+                    m, logfile, warmstart=warm_start is not None
+                )
+            else:
+                logger.info(
+                    f"Restored results of model with hash '{model_hash}' from solution "
+                    f"cache '{solution_cache.directory}' instead of solving."
+                )
 
     except:  # noqa: E722
         logger.exception(
             f"Could not optimize energysystem for datapackage from '{preprocessed}'."
         )
+        save_profile(logfile)
         raise
 
     else:
         # get results from the solved model(still oemof.solph)
-        es.meta_results = processing.meta_results(m)
-        es.results = processing.results(m)
-        es.params = processing.parameter_as_dict(es)
+        if rolling_horizon.horizon:
+            es.meta_results = meta_results
+
+            if reference_objective is not None:
+                log_objective_gap(meta_results["objective"], reference_objective)
+        elif decomposition.period:
+            es.meta_results = meta_results
+
+            if reference_meta_results is not None:
+                log_bounds(meta_results, reference_meta_results)
+        elif cached is not None:
+            results, es.meta_results = cached
+        elif isinstance(m, MatrixModel):
+            with profiler.phase("results"):
+                es.meta_results = m.meta_results()
+                results = m.results(duals=config.settings.optimize.receive_duals)
+        elif not sweep:
+            es.meta_results = processing.meta_results(m)
+            if relax_and_repair is not None:
+                es.meta_results["relax_and_repair"] = relax_and_repair
+            if warm_start is not None:
+                es.meta_results["warm_start"] = warm_start
+                log_warm_start(warm_start, logfile)
+            # results are extracted per flow or node while they are collected
+            results = results_extraction.iter_results(m)
+
+        if model_hash is not None and cached is None:
+            # results are stored in the cache while they are collected
+            results = solution_cache.stream(model_hash, results, es.meta_results)
+
+        # results of sweeps are saved per scenario
+        if not sweep:
+            writer = collect_results(results, es.timeindex, pruning)
+
+            # release the model and the results before the parameters are derived
+            with profiler.phase("release"):
+                m = results = cached = None
+                gc.collect()
+
+            save_results(es, writer, preprocessed, optimized, pruning)
 
-        # dump the EnergySystem
-        es.dump(optimized)
+        save_profile(logfile)
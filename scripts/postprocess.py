@@ -3,8 +3,8 @@ r"""
 Inputs
 -------
 optimized : str
-    ``results/{scenario}/optimized``: Directory containing dump of oemof.solph.Energysystem
-    with optimization results and parameters.
+    ``results/{scenario}/optimized``: Directory containing the results store (or dump) of the
+    oemof.solph.Energysystem with optimization results and parameters.
 scenario_name : str
     ``{scenario}``: Name of the scenario.
 destination : str
@@ -20,15 +20,19 @@ oemoflex.ResultsDatapackage
 Description
 -------------
 The script performs the postprocessing of optimization results.
+
+If the optimization has been run on representative periods, the result sequences are
+disaggregated to the original timeindex beforehand.
 """
 import os
 import sys
 import pandas as pd
 
-from oemof.solph import EnergySystem
 from oemoflex.model.datapackage import ResultsDataPackage
 
 from oemof_b3.config import config
+from oemof_b3.tools import timeseries_aggregation as tsa
+from oemof_b3.tools.results_store import restore_energysystem
 
 if __name__ == "__main__":
 
@@ -42,9 +46,13 @@ if __name__ == "__main__":
     logger = config.add_snake_logger(logfile, "postprocess")
 
     try:
-        es = EnergySystem()
+        es = restore_energysystem(optimized)
 
-        es.restore(optimized)
+        # map results of representative periods back to the original timeindex
+        mapping = tsa.load_mapping(optimized)
+        if mapping is not None:
+            es.results = tsa.disaggregate_results(es.results, mapping)
+            es.timeindex = mapping.index
 
         rdp = ResultsDataPackage.from_energysytem(es)
 
@@ -0,0 +1,100 @@
+# coding: utf-8
+r"""
+Inputs
+-------
+scenarios : list[str]
+    A list of paths ``results/{scenario}/preprocessed`` of the scenarios of a group.
+destination : path
+    ``results/joined_scenarios/{scenario_group}/optimize_schedule.csv``: Target path to store the
+    schedule.
+
+Outputs
+---------
+optimize_schedule.csv
+    Scenario, model size, threads, memory budget and peak, wall time, returncode and start time
+    with one row per scenario.
+results/{scenario}/optimized
+    Optimized results of each scenario, see ``scripts/optimize.py``
+
+Description
+-------------
+This script optimizes the scenarios of a group concurrently with ``scripts/optimize.py``, sharing
+the solver threads and memory given in ``optimize.schedule`` of the settings between the solves
+(see :mod:`oemof_b3.tools.scheduler`). The logs are written to ``logs/{scenario}.log``.
+The schedule is appended to the history of optimizations, which is used to estimate memory and
+wall time in later schedules.
+"""
+import functools
+import logging
+import os
+import sys
+
+import pandas as pd
+
+from oemof_b3.config import config
+from oemof_b3.tools.scheduler import (
+    HISTORY_COLUMNS,
+    estimate_jobs,
+    load_history,
+    run_optimize,
+    save_history,
+    schedule,
+)
+
+logger = logging.getLogger()
+
+LOGS = "logs"
+
+
+def get_scenario_name(preprocessed):
+    r"""Returns the name of the scenario from its path ``results/{scenario}/preprocessed``."""
+    return os.path.basename(os.path.dirname(os.path.normpath(preprocessed)))
+
+
+def get_job(preprocessed, logs=LOGS):
+    r"""Returns the job optimizing the scenario of `preprocessed`."""
+    scenario = get_scenario_name(preprocessed)
+    return {
+        "scenario": scenario,
+        "preprocessed": preprocessed,
+        "optimized": os.path.join(
+            os.path.dirname(os.path.normpath(preprocessed)), "optimized"
+        ),
+        "logfile": os.path.join(logs, f"{scenario}.log"),
+        "profile": os.path.join(logs, f"{scenario}_profile.json"),
+    }
+
+
+if __name__ == "__main__":
+    paths_scenarios = sys.argv[1:-1]
+
+    destination = sys.argv[-1]
+
+    settings = config.settings.optimize.schedule
+
+    threads = settings.threads or os.cpu_count()
+
+    history = load_history(settings.history)
+
+    jobs = estimate_jobs([get_job(path) for path in paths_scenarios], history)
+
+    records = schedule(
+        jobs,
+        functools.partial(run_optimize, solver=config.settings.optimize.solver),
+        threads=threads,
+        memory_mb=settings.memory_mb,
+        max_threads=settings.max_threads,
+    )
+
+    save_history(records, settings.history)
+
+    directory = os.path.dirname(destination)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    pd.DataFrame(records, columns=HISTORY_COLUMNS).to_csv(destination, index=False)
+
+    failed = [record["scenario"] for record in records if record["returncode"] != 0]
+    if failed:
+        logger.error(f"Optimization failed for scenarios: {failed}")
+        sys.exit(1)
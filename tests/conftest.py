@@ -0,0 +1,243 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pyomo.core import Constraint, Var, value
+from pyomo.repn import generate_standard_repn
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+import oemof.solph as solph
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        default=False,
+        help="Run the benchmarks (tests marked with 'benchmark'), which are skipped otherwise.",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: benchmark that only runs with --run-benchmarks"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+
+    skip = pytest.mark.skip(reason="Benchmark, run with --run-benchmarks.")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def _create_heat_model(n_timesteps=3):
+    timeindex = pd.date_range("1/1/2012", periods=n_timesteps, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="heat")
+    es.add(bus)
+
+    es.add(
+        solph.Source(
+            label="gas-boiler",
+            outputs={
+                bus: solph.Flow(
+                    variable_costs=1, emission_factor=0.2, **{"gas-heat-B": True}
+                )
+            },
+        ),
+        solph.Source(
+            label="gas-bpchp",
+            outputs={bus: solph.Flow(variable_costs=1, **{"gas-heat-B": True})},
+        ),
+        solph.Source(
+            label="heat-pump",
+            outputs={bus: solph.Flow(variable_costs=2, **{"electricity-heat-B": True})},
+        ),
+        solph.Sink(
+            label="heat-demand",
+            inputs={bus: solph.Flow(nominal_value=1, fix=[1] * n_timesteps)},
+        ),
+    )
+
+    return solph.Model(es)
+
+
+@pytest.fixture
+def create_heat_model():
+    r"""
+    Returns a function creating a model of a heat bus supplied by flows with the keywords of
+    the gas electricity relations 'gas-heat-B' and 'electricity-heat-B'.
+    """
+    return _create_heat_model
+
+
+def _create_results_model(n_timesteps=5, n_sources=3):
+    timeindex = pd.date_range("1/1/2012", periods=n_timesteps, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="electricity")
+    es.add(bus)
+
+    for n in range(n_sources):
+        es.add(
+            solph.Source(
+                label=f"pp-{n}",
+                outputs={
+                    bus: solph.Flow(
+                        nominal_value=10, max=[1] * n_timesteps, variable_costs=n
+                    )
+                },
+            )
+        )
+
+    es.add(
+        solph.Source(
+            label="pp-nonconvex",
+            outputs={
+                bus: solph.Flow(nominal_value=10, min=0.2, nonconvex=solph.NonConvex())
+            },
+        ),
+        solph.Source(
+            label="pv",
+            outputs={
+                bus: solph.Flow(
+                    investment=solph.Investment(ep_costs=10),
+                    max=[0.5] * n_timesteps,
+                )
+            },
+        ),
+        solph.GenericStorage(
+            label="battery",
+            inputs={bus: solph.Flow()},
+            outputs={bus: solph.Flow()},
+            nominal_storage_capacity=10,
+        ),
+        solph.Sink(
+            label="demand",
+            inputs={bus: solph.Flow(nominal_value=5, fix=[1] * n_timesteps)},
+        ),
+    )
+
+    model = solph.Model(es)
+    model.receive_duals()
+
+    # no solver needed: set the solution of the variables
+    rng = np.random.default_rng(1)
+    for var in model.component_data_objects(Var):
+        if not var.fixed:
+            var.value = rng.random()
+
+    for constraint in model.Bus.balance.values():
+        model.dual[constraint] = rng.random()
+
+    return model
+
+
+@pytest.fixture
+def create_results_model():
+    r"""
+    Returns a function creating a model of an electricity bus with flows, a nonconvex flow, an
+    investment and a storage, whose variables and duals are set to random values instead of
+    being solved.
+    """
+    return _create_results_model
+
+
+def _create_storage_energysystem(n_timesteps=10, startup_costs=None):
+    timeindex = pd.date_range("1/1/2012", periods=n_timesteps, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="bus")
+    es.add(bus)
+
+    es.add(
+        solph.Source(
+            label="source",
+            outputs={
+                bus: solph.Flow(
+                    nominal_value=10,
+                    variable_costs=list(np.arange(n_timesteps, dtype=float)),
+                    nonconvex=solph.NonConvex(startup_costs=startup_costs),
+                )
+            },
+        ),
+        solph.Sink(
+            label="demand",
+            inputs={
+                bus: solph.Flow(
+                    nominal_value=1,
+                    fix=pd.Series(np.ones(n_timesteps), index=timeindex),
+                )
+            },
+        ),
+        solph.components.GenericStorage(
+            label="storage",
+            inputs={bus: solph.Flow()},
+            outputs={bus: solph.Flow()},
+            nominal_storage_capacity=100,
+            inflow_conversion_factor=list(np.full(n_timesteps, 0.9)),
+        ),
+    )
+
+    return es
+
+
+@pytest.fixture
+def create_storage_energysystem():
+    r"""
+    Returns a function creating an EnergySystem of a bus with a nonconvex source, whose
+    variable costs rise with each timestep, a storage and a constant demand.
+    """
+    return _create_storage_energysystem
+
+
+def _solve_milp(model):
+    r"""Solves the (small) model with the MILP solver HiGHS of scipy and sets the values."""
+    # fixed variables are constants of the expressions
+    variables = [var for var in model.component_data_objects(Var) if not var.fixed]
+    index = {id(var): n for n, var in enumerate(variables)}
+
+    def _coefficients(expr):
+        repn = generate_standard_repn(expr, compute_values=True)
+        coefficients = np.zeros(len(variables))
+        for var, coefficient in zip(repn.linear_vars, repn.linear_coefs):
+            coefficients[index[id(var)]] += coefficient
+        return coefficients, repn.constant
+
+    cost, constant = _coefficients(model.objective.expr)
+
+    rows, lower, upper = [], [], []
+    for data in model.component_data_objects(Constraint, active=True):
+        row, offset = _coefficients(data.body)
+        rows.append(row)
+        lower.append(-np.inf if data.lower is None else value(data.lower) - offset)
+        upper.append(np.inf if data.upper is None else value(data.upper) - offset)
+
+    result = milp(
+        cost,
+        constraints=LinearConstraint(np.array(rows), lower, upper),
+        bounds=Bounds(
+            [-np.inf if var.lb is None else var.lb for var in variables],
+            [np.inf if var.ub is None else var.ub for var in variables],
+        ),
+        integrality=[0 if var.is_continuous() else 1 for var in variables],
+    )
+    assert result.success, result.message
+
+    for var, x in zip(variables, result.x):
+        var.value = x
+
+    return result.fun + constant
+
+
+@pytest.fixture
+def solve_milp():
+    r"""
+    Returns a function solving a (small) model with the MILP solver HiGHS of scipy, which
+    sets the values of the variables and returns the objective.
+    """
+    return _solve_milp
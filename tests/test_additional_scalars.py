@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from oemof_b3.tools.additional_scalars import (
+    calculate_additional_scalars,
+    calculate_emission_limit,
+    filter_additional_scalars,
+    load_additional_scalars,
+    save_additional_scalars,
+    to_b3_scalars,
+)
+from oemof_b3.tools.data_processing import save_df
+
+scalars = pd.DataFrame(
+    {
+        "scenario_key": ["ALL", "ALL", "red_80", "red_95", "ALL", "ALL", "ALL", "ALL"],
+        "name": [None, None, None, None, None, None, "B-ch4-bpchp", "BB-ch4-bpchp"],
+        "var_name": [
+            "emissions_1990",
+            "emissions_not_modeled",
+            "emission_reduction_factor",
+            "emission_reduction_factor",
+            "electricity_gas_relation",
+            "electricity_gas_relation",
+            "output_parameters",
+            "output_parameters",
+        ],
+        "carrier": [
+            "emission",
+            "emission",
+            "emission",
+            "emission",
+            "heat_central",
+            "heat_decentral",
+            "ch4",
+            "ch4",
+        ],
+        "region": ["ALL", "ALL", "ALL", "ALL", "B", "B", "B", "BB"],
+        "tech": [None, None, None, None, None, None, "bpchp", "bpchp"],
+        "type": [None] * 8,
+        "var_value": [
+            100.0,
+            10.0,
+            0.8,
+            0.95,
+            1.5,
+            "None",
+            '{"gas-heat_central-B": True}',
+            "{}",
+        ],
+        "var_unit": [None] * 8,
+        "source": [None] * 8,
+        "comment": [None] * 8,
+    }
+)
+scalars.index.name = "id_scal"
+
+scenario_filters = {
+    "80": {1: {"scenario_key": ["ALL", "red_80"]}},
+    "95": {1: {"scenario_key": ["ALL", "red_95"]}},
+    "no_limit": {1: {"scenario_key": ["ALL"]}},
+}
+
+
+def test_calculate_emission_limit():
+    np.testing.assert_allclose(calculate_emission_limit(100, 10, 0.8), 10)
+
+    limits = calculate_emission_limit(
+        pd.Series([100, 100]), pd.Series([10, 10]), pd.Series([0.8, np.nan])
+    )
+    np.testing.assert_allclose(limits.iloc[0], 10)
+    assert np.isnan(limits.iloc[1])
+
+
+def test_calculate_additional_scalars():
+    filtered = filter_additional_scalars(scalars, scenario_filters)
+
+    additional_scalars = calculate_additional_scalars(filtered)
+
+    assert list(additional_scalars) == ["80", "95", "no_limit"]
+
+    np.testing.assert_allclose(additional_scalars["80"]["emission_limit"], 10)
+    np.testing.assert_allclose(additional_scalars["95"]["emission_limit"], -5)
+    assert additional_scalars["no_limit"]["emission_limit"] is None
+
+    for scenario in additional_scalars.values():
+        assert scenario["el_gas_relations"] == [
+            {"carrier": "heat_central", "region": "B", "factor": 1.5}
+        ]
+        assert scenario["bpchp_output_parameters"] == {
+            "B-ch4-bpchp": {"gas-heat_central-B": True}
+        }
+
+
+def test_to_b3_scalars():
+    filtered = filter_additional_scalars(scalars, {"80": scenario_filters["80"]})
+
+    additional_scalars = calculate_additional_scalars(filtered)["80"]
+
+    add_scalars = to_b3_scalars(filtered, additional_scalars)
+
+    assert "scenario" not in add_scalars.columns
+    assert add_scalars.index.name == "id_scal"
+    limit = add_scalars.loc[add_scalars.var_name == "emission_limit", "var_value"]
+    np.testing.assert_allclose(limit.astype(float).values, [10])
+
+
+def test_save_and_load_additional_scalars(tmpdir):
+    path = os.path.join(tmpdir, "additional_scalars.json")
+
+    with pytest.raises(FileNotFoundError):
+        load_additional_scalars(path)
+
+    filtered = filter_additional_scalars(scalars, scenario_filters)
+    additional_scalars = calculate_additional_scalars(filtered)["80"]
+
+    save_additional_scalars(additional_scalars, path)
+
+    assert load_additional_scalars(path) == additional_scalars
+
+
+def test_load_legacy_additional_scalars(tmpdir):
+    path = os.path.join(tmpdir, "additional_scalars.json")
+    legacy_path = os.path.join(tmpdir, "additional_scalars.csv")
+
+    filtered = filter_additional_scalars(scalars, scenario_filters)
+    additional_scalars = calculate_additional_scalars(filtered)["80"]
+
+    # datapackage built before the typed structure was introduced
+    add_scalars = to_b3_scalars(
+        filtered.loc[filtered.scenario == "80"], additional_scalars
+    )
+    save_df(add_scalars, legacy_path)
+
+    assert load_additional_scalars(path, legacy_path=legacy_path) == additional_scalars
@@ -0,0 +1,180 @@
+import pandas as pd
+import pytest
+from pyomo import environ as po
+
+import oemof.solph as solph
+
+from oemof_b3.tools import decomposition
+from oemof_b3.tools.decomposition import get_blocks, optimize_decomposition
+
+N_TIMESTEPS = 10
+
+
+def create_model(es, emission_limit):
+    return solph.Model(es)
+
+
+def solve(model, name):
+    # set a solution instead of solving: storage is empty at the start of each block and
+    # charged by 1 per timestep
+    for var in model.component_data_objects(po.Var):
+        if not var.fixed:
+            var.value = 1
+    storage = model.GenericStorageBlock
+    for n in storage.STORAGES:
+        if not storage.init_content[n].fixed:
+            storage.init_content[n].value = 0
+    for (n, t), var in storage.storage_content.items():
+        if not var.fixed:
+            var.value = t + 1
+
+
+@pytest.fixture
+def meta_results(monkeypatch):
+    def _meta_results(model):
+        # solved with a gap
+        objective = po.value(model.objective)
+        return {"objective": objective, "problem": {"Lower bound": objective - 1}}
+
+    monkeypatch.setattr(decomposition.processing, "meta_results", _meta_results)
+
+
+def test_get_blocks():
+    assert get_blocks(pd.date_range("1/1/2012", periods=10, freq="H"), 4) == [
+        (0, 4),
+        (4, 8),
+        (8, 10),
+    ]
+
+    timeindex = pd.date_range("1/1/2012", periods=24 * 60, freq="H")
+    blocks = get_blocks(timeindex, "M")
+    assert blocks == [(0, 24 * 31), (24 * 31, 24 * 60)]
+
+    blocks = get_blocks(timeindex, "W")
+    assert all(timeindex[start].dayofweek == 0 for start, _ in blocks[1:])
+
+    with pytest.raises(ValueError):
+        get_blocks(timeindex, 0)
+
+
+def test_optimize_decomposition(meta_results, create_storage_energysystem):
+    es = create_storage_energysystem()
+    storage = es.groups["storage"]
+
+    prices = []
+
+    def _solve(model, name):
+        prices.append(po.value(model.boundary_price_end[storage]))
+        solve(model, name)
+
+    results, meta_results = optimize_decomposition(
+        es, create_model, _solve, period=4, max_iterations=2
+    )
+
+    info = meta_results["decomposition"]
+    assert info["blocks"] == 3
+    assert len(info["iterations"]) == 2
+    assert meta_results["objective"] == info["upper_bound"]
+
+    # the storage ends each block at a higher level than the next block starts, its
+    # hand-over is priced after the first iteration
+    assert info["iterations"][0]["max_mismatch"] == 4
+    assert not any(prices[:6])
+    assert any(prices[6:])
+
+    # results have the shape of a monolithic optimization
+    for key, result in results.items():
+        assert (result["sequences"].index == es.timeindex).all()
+
+    # boundary levels are fixed to the mean of both sides in the upper bound, the storage
+    # is balanced over the end of the last and the start of the first block
+    content = results[(storage, None)]["sequences"]["storage_content"]
+    assert list(content) == [1, 2, 3, 2, 1, 2, 3, 2, 1, 1]
+
+    # attributes are restored
+    assert storage.initial_storage_level is None
+    assert storage.balanced is True
+    assert len(es.timeindex) == N_TIMESTEPS
+
+
+def test_optimize_decomposition_processes(meta_results, create_storage_energysystem):
+    results = {}
+    for processes in [1, 2]:
+        es = create_storage_energysystem()
+        results[processes], meta_results = optimize_decomposition(
+            es, create_model, solve, period=4, processes=processes, max_iterations=2
+        )
+        assert meta_results["decomposition"]["processes"] == processes
+
+    content = [
+        {
+            key[0].label: result["sequences"]
+            for key, result in results[processes].items()
+            if key[1] is None
+        }["storage"]
+        for processes in [1, 2]
+    ]
+    pd.testing.assert_frame_equal(content[0], content[1])
+
+
+def test_optimize_decomposition_bounds(
+    monkeypatch, create_storage_energysystem, solve_milp
+):
+    def _meta_results(model):
+        return {"objective": po.value(model.objective)}
+
+    monkeypatch.setattr(decomposition.processing, "meta_results", _meta_results)
+
+    def create_energysystem():
+        es = create_storage_energysystem(startup_costs=1)
+        # the source runs in all timesteps at constant costs and starts up once
+        es.groups["source"].outputs[es.groups["bus"]].variable_costs = solph.sequence(1)
+        return es
+
+    objective = solve_milp(solph.Model(create_energysystem()))
+
+    results, meta_results = optimize_decomposition(
+        create_energysystem(),
+        create_model,
+        lambda model, name: solve_milp(model),
+        period=5,
+        max_iterations=5,
+    )
+
+    # the status is free at the start of the relaxed blocks and handed over in the upper
+    # bound, startups at the boundary are only charged if the source was off before
+    info = meta_results["decomposition"]
+    assert info["lower_bound"] <= objective + 1e-9
+    assert info["upper_bound"] == pytest.approx(objective)
+
+
+def test_optimize_decomposition_idle_time(meta_results, create_storage_energysystem):
+    def _create_model(es, emission_limit):
+        model = solph.Model(es)
+        flow = (es.groups["source"], es.groups["bus"])
+        # idle time as set by create_model of scripts/optimize.py
+        model.idle_time = (flow, flow, 2, None)
+        return model
+
+    fixed = []
+
+    def _solve(model, name):
+        fixed.append([var.fixed for var in model.NonConvexFlow.status.values()])
+        solve(model, name)
+
+    optimize_decomposition(
+        create_storage_energysystem(), _create_model, _solve, period=4, max_iterations=1
+    )
+
+    # the output within the idle time is only blocked in the upper bound of blocks n > 0
+    assert not any(fixed[0] + fixed[1] + fixed[2] + fixed[3])
+    assert fixed[4] == [True, True, False, False]
+    assert fixed[5] == [True, True]
+
+
+def test_optimize_decomposition_unsupported(create_storage_energysystem):
+    es = create_storage_energysystem()
+    es.groups["source"].outputs[es.groups["bus"]].nonconvex.minimum_uptime = 2
+
+    with pytest.raises(NotImplementedError):
+        optimize_decomposition(es, create_model, solve, period=4)
@@ -0,0 +1,112 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from oemof_b3.tools.delta_datapackage import (
+    is_delta,
+    materialized,
+    read_resource,
+    write_delta,
+)
+
+this_path = os.path.realpath(__file__)
+
+path_examples = os.path.join(
+    os.path.abspath(os.path.join(this_path, os.pardir, os.pardir)), "examples"
+)
+
+
+def read_sorted(path):
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if "name" in df.columns:
+        df = df.set_index("name").sort_index()
+    return df
+
+
+@pytest.fixture
+def datapackages(tmpdir):
+    base = os.path.join(tmpdir, "example_base", "preprocessed")
+    scenario = os.path.join(tmpdir, "example_more_re", "preprocessed")
+    complete = os.path.join(tmpdir, "complete")
+
+    shutil.copytree(os.path.join(path_examples, "example_base", "preprocessed"), base)
+    shutil.copytree(
+        os.path.join(path_examples, "example_more_re", "preprocessed"), scenario
+    )
+    shutil.copytree(scenario, complete)
+
+    # remove a component and add another one
+    path = os.path.join(scenario, "data", "elements", "ch4-gt.csv")
+    elements = pd.read_csv(path)
+    elements.iloc[[0]].to_csv(path, index=False)
+    elements.iloc[[0]].to_csv(
+        os.path.join(complete, "data", "elements", "ch4-gt.csv"), index=False
+    )
+    for path in [scenario, complete]:
+        elements.to_csv(
+            os.path.join(path, "data", "elements", "h2-gt.csv"), index=False
+        )
+
+    return base, scenario, complete
+
+
+def test_write_delta(datapackages):
+    base, scenario, complete = datapackages
+
+    delta = write_delta(scenario, base)
+
+    assert is_delta(scenario)
+    assert not is_delta(base)
+
+    resources = delta["resources"]
+    assert resources["data/sequences/solar-pv_profile.csv"] == "base"
+    assert resources["data/elements/solar-pv.csv"] == "rows"
+    assert resources["data/elements/h2-gt.csv"] == "full"
+    assert delta["removed_rows"]["data/elements/ch4-gt.csv"] == ["BB-ch4-gt"]
+
+    assert not os.path.exists(
+        os.path.join(scenario, "data", "sequences", "solar-pv_profile.csv")
+    )
+
+
+def test_read_resource(datapackages):
+    base, scenario, complete = datapackages
+
+    write_delta(scenario, base)
+
+    for resource in [
+        "data/elements/ch4-gt.csv",
+        "data/elements/solar-pv.csv",
+        "data/sequences/wind-onshore_profile.csv",
+    ]:
+        data = read_resource(scenario, resource)
+        if "name" in data.columns:
+            data = data.set_index("name").sort_index()
+
+        pd.testing.assert_frame_equal(
+            data, read_sorted(os.path.join(complete, resource))
+        )
+
+
+def test_materialized(datapackages):
+    base, scenario, complete = datapackages
+
+    write_delta(scenario, base)
+
+    with materialized(scenario) as path:
+        assert os.path.exists(os.path.join(path, "datapackage.json"))
+        assert not is_delta(path)
+
+        for directory in ["elements", "sequences"]:
+            for f_name in os.listdir(os.path.join(complete, "data", directory)):
+                pd.testing.assert_frame_equal(
+                    read_sorted(os.path.join(path, "data", directory, f_name)),
+                    read_sorted(os.path.join(complete, "data", directory, f_name)),
+                )
+
+    assert not os.path.exists(path)
+
+    with materialized(base) as path:
+        assert path == base
@@ -0,0 +1,136 @@
+import logging
+import os
+import re
+import time
+
+import pytest
+from pyomo import environ as po
+
+import oemof.solph as solph
+
+from oemof_b3.tools.equate_flows import (
+    build_flow_keyword_index,
+    equate_flows,
+    equate_flows_by_keyword,
+)
+
+
+def test_build_flow_keyword_index(create_heat_model):
+    model = create_heat_model()
+
+    index = build_flow_keyword_index(model)
+
+    assert sorted(i.label for i, o in index["gas-heat-B"]) == [
+        "gas-boiler",
+        "gas-bpchp",
+    ]
+    assert [i.label for i, o in index["electricity-heat-B"]] == ["heat-pump"]
+    assert "electricity-heat-BB" not in index
+
+
+def test_build_flow_keyword_index_known_flows(create_heat_model):
+    model = create_heat_model()
+    nodes = model.es.groups
+    bus = nodes["heat"]
+
+    # keywords of the bpchp are known, the flow of a pruned node is dropped
+    pruned = solph.Source(label="pruned-bpchp", outputs={bus: solph.Flow()})
+    index = build_flow_keyword_index(
+        model,
+        {"gas-heat-BB": [(nodes["gas-bpchp"], bus), (pruned, bus)]},
+    )
+
+    assert [i.label for i, o in index["gas-heat-BB"]] == ["gas-bpchp"]
+
+    # further keywords of the known flow are found as well, known flows are not duplicated
+    assert sorted(i.label for i, o in index["gas-heat-B"]) == [
+        "gas-boiler",
+        "gas-bpchp",
+    ]
+    assert [i.label for i, o in index["electricity-heat-B"]] == ["heat-pump"]
+
+    index = build_flow_keyword_index(model, {"gas-heat-B": [(nodes["gas-bpchp"], bus)]})
+    assert sorted(i.label for i, o in index["gas-heat-B"]) == [
+        "gas-boiler",
+        "gas-bpchp",
+    ]
+
+
+def test_equate_flows_by_keyword(create_heat_model):
+    model = create_heat_model()
+    index = build_flow_keyword_index(model)
+
+    for name, idx in [("with_index", index), ("without_index", None)]:
+        equate_flows_by_keyword(
+            model, "gas-heat-B", "electricity-heat-B", 2, name=name, index=idx
+        )
+
+    # constraints are built right away as the model is constructed already
+    assert len(model.with_index) == len(model.without_index) == 3
+    for ts in model.TIMESTEPS:
+        assert str(model.with_index[ts].body) == str(model.without_index[ts].body)
+
+
+def equate_flows_reference(model, flows1, flows2, factor1=1, name="equate_flows"):
+    r"""Former rule of equate_flows summing up expressions for every timestep."""
+
+    def _equate_flow_groups_rule(m):
+        for ts in m.TIMESTEPS:
+            sum1_t = sum(m.flow[fi, fo, ts] for fi, fo in flows1)
+            sum2_t = sum(m.flow[fi, fo, ts] for fi, fo in flows2)
+            expr = sum1_t * factor1 == sum2_t
+            if expr is not True:
+                getattr(m, name).add(ts, expr)
+
+    setattr(model, name, po.Constraint(model.TIMESTEPS, noruleinit=True))
+    setattr(model, name + "_build", po.BuildAction(rule=_equate_flow_groups_rule))
+
+
+def get_flows(model):
+    index = build_flow_keyword_index(model)
+    return index["gas-heat-B"], index["electricity-heat-B"]
+
+
+def read_constraints(model, tmpdir):
+    path = os.path.join(tmpdir, "model.lp")
+    model.write(path, io_options={"symbolic_solver_labels": True})
+
+    with open(path) as f:
+        lp = f.read()
+
+    return re.search(r"s\.t\.(.*)bounds", lp, re.DOTALL).group(1)
+
+
+@pytest.mark.parametrize("matrix", [False, True])
+def test_equate_flows_equals_reference(matrix, tmpdir, create_heat_model):
+    reference = create_heat_model()
+    equate_flows_reference(reference, *get_flows(reference), factor1=2)
+
+    model = create_heat_model()
+    equate_flows(model, *get_flows(model), factor1=2, matrix=matrix)
+
+    assert read_constraints(model, tmpdir) == read_constraints(reference, tmpdir)
+
+
+@pytest.mark.benchmark
+def test_benchmark_equate_flows(create_heat_model):
+    n_timesteps = 2000
+
+    build_times = {}
+    for method in ["reference", "expression", "matrix"]:
+        model = create_heat_model(n_timesteps)
+        flows1, flows2 = get_flows(model)
+
+        start = time.perf_counter()
+        if method == "reference":
+            equate_flows_reference(model, flows1, flows2, factor1=2)
+        else:
+            equate_flows(model, flows1, flows2, factor1=2, matrix=method == "matrix")
+        build_times[method] = time.perf_counter() - start
+
+        assert len(model.equate_flows) == n_timesteps
+
+    logging.info(
+        f"Build time of equate_flows with {n_timesteps} timesteps: "
+        + ", ".join(f"{method}: {t:.3f} s" for method, t in build_times.items())
+    )
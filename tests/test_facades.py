@@ -1,15 +1,20 @@
 import logging
 import os
 import re
+import time
 from difflib import unified_diff
 
+import numpy as np
 import pandas as pd
+import pytest
+from pyomo.core import Var
 
 from oemof.network.network import Node
-from oemof.solph import helpers
+from oemof.solph import NonConvex, helpers
 import oemof.solph as solph
 
-from oemof_b3.facades import MethanationReactor
+from oemof_b3.facades import MethanationReactor, MethanationReactorFleet
+from oemof_b3.tools.set_idle_time import set_idle_time
 
 
 def chop_trailing_whitespace(lines):
@@ -163,3 +168,320 @@ class TestConstraints:
         )
 
         self.compare_to_reference_lp("methanation_reactor_nonconvex.lp")
+
+    def test_methanation_reactor_idle_time_linear(self):
+
+        h2_bus = solph.Bus(label="h2")
+
+        co2_bus = solph.Bus(label="co2", balanced=False)
+
+        ch4_bus = solph.Bus(label="ch4")
+
+        MethanationReactor(
+            label="m_reactor",
+            carrier="h2_co2",
+            tech="methanation_reactor",
+            h2_bus=h2_bus,
+            co2_bus=co2_bus,
+            ch4_bus=ch4_bus,
+            capacity_charge=50,
+            capacity_discharge=50,
+            storage_capacity_educts=100,
+            storage_capacity_products=1000,
+            efficiency_charge=1,
+            efficiency_discharge=1,
+            methanation_rate=5,
+            efficiency_methanation=0.93,
+            methanation_option="variable_rate",
+            nonconvex=True,
+        )
+
+        om = self.get_om()
+
+        f1 = [f for f in om.flows if f[0].label == "m_reactor-combine-educts"][0]
+        f2 = [f for f in om.flows if f[0].label == "m_reactor-storage_products"][0]
+
+        set_idle_time(om, f1, f2, n=1, formulation="linear")
+
+        self.compare_to_reference_lp("methanation_reactor_idle_time_linear.lp", om)
+
+    def test_methanation_reactor_fleet_idle_time_linear(self):
+
+        h2_bus = solph.Bus(label="h2")
+
+        co2_bus = solph.Bus(label="co2", balanced=False)
+
+        ch4_bus = solph.Bus(label="ch4")
+
+        MethanationReactorFleet(
+            label="m_reactor",
+            carrier="h2_co2",
+            tech="methanation_reactor",
+            h2_bus=h2_bus,
+            co2_bus=co2_bus,
+            ch4_bus=ch4_bus,
+            units=3,
+            capacity_charge=50,
+            capacity_discharge=50,
+            storage_capacity_educts=100,
+            storage_capacity_products=1000,
+            efficiency_charge=1,
+            efficiency_discharge=1,
+            methanation_rate=5,
+            efficiency_methanation=0.93,
+            methanation_option="variable_rate",
+            nonconvex=True,
+        )
+
+        om = self.get_om()
+
+        f1 = [f for f in om.flows if f[0].label == "m_reactor-combine-educts"][0]
+        f2 = [f for f in om.flows if f[0].label == "m_reactor-storage_products"][0]
+
+        set_idle_time(om, f1, f2, n=1, formulation="linear")
+
+        self.compare_to_reference_lp(
+            "methanation_reactor_fleet_idle_time_linear.lp", om
+        )
+
+
+def create_methanation_reactors(facade, n_timesteps=3, **kwargs):
+    kwargs = {
+        "methanation_option": "variable_rate_with_min",
+        "nonconvex": True,
+        **kwargs,
+    }
+
+    timeindex = pd.date_range("1/1/2012", periods=n_timesteps, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    h2_bus = solph.Bus(label="h2", balanced=False)
+    co2_bus = solph.Bus(label="co2", balanced=False)
+    ch4_bus = solph.Bus(label="ch4", balanced=False)
+    es.add(h2_bus, co2_bus, ch4_bus)
+
+    for n, label in enumerate(kwargs.pop("labels", ["m_reactor"])):
+        reactor = facade(
+            label=label,
+            carrier="h2_co2",
+            tech="methanation_reactor",
+            h2_bus=h2_bus,
+            co2_bus=co2_bus,
+            ch4_bus=ch4_bus,
+            capacity_charge=50,
+            capacity_discharge=50,
+            storage_capacity_educts=100,
+            storage_capacity_products=1000,
+            methanation_rate=5,
+            efficiency_methanation=0.93,
+            **kwargs,
+        )
+        es.add(reactor, *reactor.subnodes)
+
+    return solph.Model(es)
+
+
+def count_integer_variables(model):
+    return sum(
+        1 for var in model.component_data_objects(Var) if not var.is_continuous()
+    )
+
+
+def is_feasible(data):
+    value = data.body()
+    if data.lower is not None and value < data.lower - 1e-9:
+        return False
+    if data.upper is not None and value > data.upper + 1e-9:
+        return False
+    return True
+
+
+def test_methanation_reactor_fleet_integer_variables():
+    units = create_methanation_reactors(MethanationReactor, labels=["a", "b", "c"])
+    fleet = create_methanation_reactors(MethanationReactorFleet, units=3)
+
+    # one status per nonconvex flow (3 per reactor) and timestep
+    assert count_integer_variables(units) == 3 * 3 * 3
+    assert count_integer_variables(fleet) == 3 * 3
+
+    # the number of integer variables does not grow with the number of units
+    assert count_integer_variables(
+        create_methanation_reactors(MethanationReactorFleet, units=30)
+    ) == count_integer_variables(fleet)
+
+
+def test_methanation_reactor_fleet_aggregates_units():
+    model = create_methanation_reactors(MethanationReactorFleet, units=3)
+    block = model.MethanationReactorFleetBlock
+    (fleet,) = [node for node in model.es.nodes if node.label == "m_reactor"]
+
+    assert fleet.capacity_charge == 150
+    assert len(block.UNIT_FLOWS) == 3
+
+    # the flow of the fleet is feasible if each unit that is on is operated between its
+    # minimum and maximum load
+    for i, o, minimum, _ in fleet.unit_flows:
+        capacity = model.flows[i, o].nominal_value / 3
+        for units_on in range(1, 4):
+            for load, feasible in [
+                (minimum[0] - 0.05, False),
+                (minimum[0], True),
+                (1, True),
+                (1.05, False),
+            ]:
+                block.units_on[i, o, 0].value = units_on
+                model.flow[i, o, 0].value = units_on * capacity * load
+                assert (
+                    is_feasible(block.min[i, o, 0]) and is_feasible(block.max[i, o, 0])
+                ) == feasible
+
+
+# relative tolerance of the objectives and flows of a fleet and its individual units and
+# absolute tolerance of flows close to zero
+FLEET_RTOL = 1e-6
+
+FLEET_ATOL = 1e-9
+
+
+def create_methanation_dispatch(facade, labels, **kwargs):
+    demand = [12, 25, 4, 18]
+
+    timeindex = pd.date_range("1/1/2012", periods=len(demand), freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    h2_bus = solph.Bus(label="h2")
+    co2_bus = solph.Bus(label="co2", balanced=False)
+    ch4_bus = solph.Bus(label="ch4")
+    es.add(h2_bus, co2_bus, ch4_bus)
+
+    es.add(
+        solph.Source(
+            label="h2-import",
+            outputs={h2_bus: solph.Flow(variable_costs=[1, 3, 2, 4])},
+        ),
+        solph.Sink(
+            label="ch4-demand",
+            inputs={ch4_bus: solph.Flow(fix=demand, nominal_value=1)},
+        ),
+    )
+
+    for label in labels:
+        reactor = facade(
+            label=label,
+            carrier="h2_co2",
+            tech="methanation_reactor",
+            h2_bus=h2_bus,
+            co2_bus=co2_bus,
+            ch4_bus=ch4_bus,
+            capacity_charge=10,
+            capacity_discharge=10,
+            storage_capacity_educts=5,
+            storage_capacity_products=5,
+            methanation_rate=10,
+            efficiency_methanation=1,
+            methanation_option="variable_rate",
+            input_parameters={
+                "min": 0.2,
+                "nonconvex": NonConvex(startup_costs=5, activity_costs=0.5),
+            },
+            **kwargs,
+        )
+        es.add(reactor, *reactor.subnodes)
+
+    return solph.Model(es)
+
+
+def test_methanation_reactor_fleet_equals_units(solve_milp):
+    units = create_methanation_dispatch(MethanationReactor, labels=["a", "b", "c"])
+    fleet = create_methanation_dispatch(
+        MethanationReactorFleet, labels=["fleet"], units=3
+    )
+
+    # startup and activity costs of the units are part of the objective of the fleet
+    assert solve_milp(fleet) == pytest.approx(solve_milp(units), rel=FLEET_RTOL)
+
+    def _h2_flow(model):
+        return [
+            sum(model.flow[i, o, t].value for i, o in model.flows if i.label == "h2")
+            for t in model.TIMESTEPS
+        ]
+
+    np.testing.assert_allclose(
+        _h2_flow(fleet), _h2_flow(units), rtol=FLEET_RTOL, atol=FLEET_ATOL
+    )
+
+
+def test_methanation_reactor_fleet_unsupported_nonconvex():
+    with pytest.raises(NotImplementedError, match="minimum_uptime"):
+        create_methanation_reactors(
+            MethanationReactorFleet,
+            units=3,
+            nonconvex=False,
+            input_parameters={"min": 0.2, "nonconvex": NonConvex(minimum_uptime=2)},
+        )
+
+
+def test_methanation_reactor_options():
+    for option in MethanationReactor.METHANATION_OPTIONS:
+        model = create_methanation_reactors(
+            MethanationReactor, methanation_option=option
+        )
+        (reactor,) = [node for node in model.es.nodes if node.label == "m_reactor"]
+        (flow,) = reactor.outputs.values()
+
+        assert flow.nominal_value == (None if option == "no_constraints" else 5)
+        assert (flow.nonconvex is not None) == (option == "variable_rate_with_min")
+
+    with pytest.raises(ValueError, match="not valid"):
+        create_methanation_reactors(MethanationReactor, methanation_option="unknown")
+
+
+@pytest.mark.benchmark
+def test_benchmark_methanation_reactor_build(monkeypatch):
+    # nodes are not added to an EnergySystem
+    monkeypatch.setattr(Node, "_registry", None)
+
+    n_reactors = 2000
+    h2_bus = solph.Bus(label="h2")
+    co2_bus = solph.Bus(label="co2")
+    ch4_bus = solph.Bus(label="ch4")
+
+    start = time.perf_counter()
+    reactors = [
+        MethanationReactor(
+            label=f"m_reactor_{n}",
+            carrier="h2_co2",
+            tech="methanation_reactor",
+            h2_bus=h2_bus,
+            co2_bus=co2_bus,
+            ch4_bus=ch4_bus,
+            capacity_charge=50,
+            capacity_discharge=50,
+            storage_capacity_educts=100,
+            storage_capacity_products=1000,
+            methanation_rate=5,
+            efficiency_methanation=0.93,
+            methanation_option="variable_rate",
+            nonconvex=True,
+        )
+        for n in range(n_reactors)
+    ]
+    build_time = time.perf_counter() - start
+
+    assert all(len(reactor.subnodes) == 3 for reactor in reactors)
+
+    # flows of all methanation options per reactor, as built before the options were built
+    # lazily
+    start = time.perf_counter()
+    for reactor in reactors:
+        for option in MethanationReactor.METHANATION_OPTIONS:
+            reactor.methanation_option = option
+            reactor.build_methanation_flow()
+    options_time = time.perf_counter() - start
+
+    logging.info(
+        f"Built {n_reactors} methanation reactors with their subnodes in {build_time:.3f} s "
+        f"({build_time / n_reactors * 1e6:.0f} us per reactor). Building the flows of all "
+        f"{len(MethanationReactor.METHANATION_OPTIONS)} methanation options would add "
+        f"{options_time:.3f} s."
+    )
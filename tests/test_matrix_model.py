@@ -0,0 +1,436 @@
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+from pyomo import environ as po
+from pyomo.repn import generate_standard_repn
+
+import oemof.solph as solph
+from oemof.network.network import Node
+from oemof.solph import processing
+
+from oemof_b3.facades import MethanationReactor
+from oemof_b3.tools.equate_flows import build_flow_keyword_index, equate_flows
+from oemof_b3.tools.matrix_model import MatrixModel
+from oemof_b3.tools.set_idle_time import set_idle_time
+
+N_TIMESTEPS = 5
+
+IDLE_TIME = 2
+
+
+def create_energysystem():
+    timeindex = pd.date_range("1/1/2012", periods=N_TIMESTEPS, freq="H")
+    es = solph.EnergySystem(groupings=solph.GROUPINGS, timeindex=timeindex)
+    es.timeincrement = [1, 2, 1, 1, 3]
+
+    Node.registry = es
+    try:
+        el = solph.Bus(label="electricity")
+        heat = solph.Bus(label="heat")
+        gas = solph.Bus(label="ch4")
+        h2 = solph.Bus(label="h2")
+        co2 = solph.Bus(label="co2", balanced=False)
+        el_2 = solph.Bus(label="electricity_2")
+
+        solph.Source(
+            label="gas-import",
+            outputs={
+                gas: solph.Flow(
+                    variable_costs=[30, 31, 32, 33, 34],
+                    emission_factor=0.2,
+                    summed_max=1000,
+                    nominal_value=100,
+                )
+            },
+        )
+        solph.Source(
+            label="wind",
+            outputs={el: solph.Flow(nominal_value=40, fix=[0.1, 0.5, 0.9, 0.2, 0.0])},
+        )
+        solph.Sink(
+            label="electricity-demand",
+            inputs={el: solph.Flow(nominal_value=10, fix=[1, 2, 3, 2, 1])},
+        )
+        solph.Sink(
+            label="heat-demand",
+            inputs={heat: solph.Flow(nominal_value=5, fix=[1, 1, 2, 2, 1])},
+        )
+        solph.Sink(label="electricity-excess", inputs={el: solph.Flow()})
+        solph.Source(
+            label="electricity-shortage",
+            outputs={el: solph.Flow(variable_costs=1000)},
+        )
+        solph.Transformer(
+            label="ch4-gt",
+            inputs={gas: solph.Flow()},
+            outputs={
+                el: solph.Flow(
+                    nominal_value=30,
+                    min=0.2,
+                    nonconvex=solph.NonConvex(activity_costs=5),
+                    positive_gradient={"ub": 0.5},
+                )
+            },
+            conversion_factors={el: 0.4},
+        )
+        solph.Transformer(
+            label="ch4-boiler",
+            inputs={gas: solph.Flow()},
+            outputs={heat: solph.Flow(**{"gas-heat-B": True})},
+            conversion_factors={heat: 0.9},
+        )
+        solph.Transformer(
+            label="electricity-heatpump",
+            inputs={el: solph.Flow()},
+            outputs={heat: solph.Flow(**{"electricity-heat-B": True})},
+            conversion_factors={heat: [3, 3.2, 3.4, 3.2, 3]},
+        )
+        solph.components.ExtractionTurbineCHP(
+            label="ch4-extchp",
+            inputs={gas: solph.Flow()},
+            outputs={
+                el: solph.Flow(nominal_value=20),
+                heat: solph.Flow(**{"gas-heat-B": True}),
+            },
+            conversion_factors={el: 0.3, heat: 0.5},
+            conversion_factor_full_condensation={el: 0.5},
+        )
+        solph.custom.Link(
+            label="electricity-transmission",
+            inputs={el: solph.Flow(), el_2: solph.Flow()},
+            outputs={
+                el_2: solph.Flow(nominal_value=10),
+                el: solph.Flow(nominal_value=10),
+            },
+            conversion_factors={(el, el_2): 0.95, (el_2, el): 0.9},
+        )
+        solph.Sink(
+            label="electricity_2-demand",
+            inputs={el_2: solph.Flow(nominal_value=1, fix=[1, 2, 1, 2, 1])},
+        )
+        solph.components.GenericStorage(
+            label="electricity-battery",
+            inputs={el: solph.Flow(nominal_value=10)},
+            outputs={el: solph.Flow(nominal_value=10, variable_costs=1)},
+            nominal_storage_capacity=50,
+            initial_storage_level=0.5,
+            loss_rate=0.01,
+            fixed_losses_absolute=0.1,
+            inflow_conversion_factor=0.9,
+            outflow_conversion_factor=0.95,
+        )
+        solph.Transformer(
+            label="electrolyser",
+            inputs={el: solph.Flow()},
+            outputs={h2: solph.Flow()},
+            conversion_factors={h2: 0.7},
+        )
+        solph.Source(label="co2-import", outputs={co2: solph.Flow()})
+        MethanationReactor(
+            label="B-h2-methanation",
+            carrier="h2_co2",
+            tech="methanation_reactor",
+            h2_bus=h2,
+            co2_bus=co2,
+            ch4_bus=gas,
+            capacity_charge=50,
+            capacity_discharge=50,
+            storage_capacity_educts=100,
+            storage_capacity_products=1000,
+            efficiency_charge=1,
+            efficiency_discharge=1,
+            methanation_rate=5,
+            efficiency_methanation=0.93,
+            methanation_option="variable_rate_with_ramping",
+            nonconvex=True,
+        )
+    finally:
+        Node.registry = None
+
+    return es
+
+
+def get_idle_time_flows(flows):
+    f1 = [f for f in flows if f[0].label == "B-h2-methanation-combine-educts"][0]
+    f2 = [
+        f
+        for f in flows
+        if f[0].label == "B-h2-methanation-storage_products" and f[1].label == "ch4"
+    ][0]
+    return f1, f2
+
+
+def get_pyomo_variables(model, mm):
+    r"""Returns the pyomo variable of every column of the matrix model."""
+    blocks = {
+        "flow": lambda key, t: model.flow[key[0], key[1], t],
+        "Flow.positive_gradient": lambda key, t: model.Flow.positive_gradient[
+            key[0], key[1], t
+        ],
+        "Flow.negative_gradient": lambda key, t: model.Flow.negative_gradient[
+            key[0], key[1], t
+        ],
+        "NonConvexFlow.status": lambda key, t: model.NonConvexFlow.status[
+            key[0], key[1], t
+        ],
+        "GenericStorageBlock.storage_content": lambda key, t: (
+            model.GenericStorageBlock.storage_content[key, t]
+        ),
+        "GenericStorageBlock.init_content": lambda key, t: (
+            model.GenericStorageBlock.init_content[key]
+        ),
+        "constraint_idle_time_counter": lambda key, t: (
+            model.constraint_idle_time_counter[t]
+        ),
+    }
+
+    variables = np.empty(mm.n_columns, dtype=object)
+    for name, group in mm.variables.items():
+        for key, columns in zip(group.keys, group.columns):
+            if group.timeindexed:
+                for t, column in enumerate(columns):
+                    variables[column] = blocks[name](key, t)
+            else:
+                variables[columns] = blocks[name](key, None)
+
+    return variables
+
+
+def add_constraints(model, relation):
+    index = build_flow_keyword_index(model)
+    flows = index["gas-heat-B"], index["electricity-heat-B"]
+    f1, f2 = get_idle_time_flows(model.flows)
+
+    if isinstance(model, MatrixModel):
+        model.emission_limit(1000)
+        model.equate_flows(*flows, factor1=relation)
+        model.set_idle_time(f1, f2, IDLE_TIME, initial_status=[1, 0])
+    else:
+        solph.constraints.emission_limit(model, limit=1000)
+        equate_flows(model, *flows, factor1=relation)
+        set_idle_time(
+            model, f1, f2, IDLE_TIME, formulation="linear", initial_status=[1, 0]
+        )
+
+
+@pytest.fixture
+def models():
+    es = create_energysystem()
+
+    mm = MatrixModel(es)
+    add_constraints(mm, 2)
+
+    model = solph.Model(es)
+    add_constraints(model, 2)
+
+    return es, mm, model
+
+
+def normalize(terms, lower, upper):
+    r"""Scales a row to a first coefficient of 1 and rounds it."""
+    terms = sorted((name, coef) for name, coef in terms if coef != 0)
+    scale = terms[0][1]
+    lower, upper = lower / scale, upper / scale
+    if scale < 0:
+        lower, upper = upper, lower
+    return (
+        tuple((name, round(coef / scale, 8)) for name, coef in terms),
+        round(lower, 8),
+        round(upper, 8),
+    )
+
+
+def get_matrix_rows(mm, variables):
+    A, lower, upper = mm.matrix
+    fixed = np.array([var.fixed for var in variables])
+    values = np.array([var.value if var.fixed else 0 for var in variables])
+
+    # fixed variables are constants in pyomo
+    constant = A @ values
+    A = A[:, ~fixed].tocsr()
+    names = np.array([var.name for var in variables])[~fixed]
+
+    rows = []
+    for k in range(A.shape[0]):
+        start, stop = A.indptr[k], A.indptr[k + 1]
+        if start == stop:
+            continue
+        rows.append(
+            normalize(
+                zip(names[A.indices[start:stop]], A.data[start:stop]),
+                lower[k] - constant[k],
+                upper[k] - constant[k],
+            )
+        )
+    return Counter(rows)
+
+
+def get_pyomo_rows(model):
+    rows = []
+    for constraint in model.component_data_objects(po.Constraint, active=True):
+        repn = generate_standard_repn(constraint.body, compute_values=True)
+        if not repn.linear_vars:
+            continue
+        lower = -np.inf if constraint.lower is None else po.value(constraint.lower)
+        upper = np.inf if constraint.upper is None else po.value(constraint.upper)
+        rows.append(
+            normalize(
+                zip(
+                    [var.name for var in repn.linear_vars],
+                    repn.linear_coefs,
+                ),
+                lower - repn.constant,
+                upper - repn.constant,
+            )
+        )
+    return Counter(rows)
+
+
+def test_matrix_model_equals_pyomo_model(models):
+    es, mm, model = models
+    variables = get_pyomo_variables(model, mm)
+
+    # every variable of the pyomo model is a column
+    assert set(var.name for var in variables) == set(
+        var.name for var in model.component_data_objects(po.Var)
+    )
+
+    # bounds
+    lb, ub = mm.bounds
+    for var, lower, upper, integer in zip(variables, lb, ub, mm.integer):
+        if var.fixed:
+            assert lower == upper == pytest.approx(var.value)
+            continue
+        assert lower == pytest.approx(-np.inf if var.lb is None else var.lb)
+        assert upper == pytest.approx(np.inf if var.ub is None else var.ub)
+        assert integer == var.is_binary()
+
+    # constraints
+    assert get_matrix_rows(mm, variables) == get_pyomo_rows(model)
+
+    # objective
+    repn = generate_standard_repn(model.objective.expr, compute_values=True)
+    pyomo_cost = dict(zip([var.name for var in repn.linear_vars], repn.linear_coefs))
+    for var, cost in zip(variables, mm.cost):
+        if not var.fixed:
+            assert cost == pytest.approx(pyomo_cost.get(var.name, 0))
+
+
+def test_matrix_model_results(models):
+    es, mm, model = models
+    variables = get_pyomo_variables(model, mm)
+
+    lb, ub = mm.bounds
+    mm.solution = np.random.default_rng(1).random(mm.n_columns)
+    mm.solution[lb == ub] = lb[lb == ub]
+    for var, value in zip(variables, mm.solution):
+        if not var.fixed:
+            var.value = value
+
+    results = mm.results()
+    expected = processing.results(model)
+
+    assert set(results) == set(expected)
+    for key, result in expected.items():
+        pd.testing.assert_frame_equal(
+            results[key]["sequences"], result["sequences"], check_freq=False
+        )
+        pd.testing.assert_series_equal(
+            results[key]["scalars"], result["scalars"], check_names=False
+        )
+
+    assert mm.objective() == pytest.approx(po.value(model.objective))
+
+
+def read_mps(path):
+    r"""Reads the sections of a free MPS file written by MatrixModel."""
+    sections = {}
+    with open(path) as f:
+        for line in f:
+            if not line.startswith(" "):
+                section = line.split()[0]
+                sections[section] = []
+            elif "MARKER" not in line:
+                sections[section].append(line.split())
+    return sections
+
+
+def test_write_mps(models, tmpdir):
+    es, mm, model = models
+    path = os.path.join(tmpdir, "model.mps")
+    mm.write_mps(path)
+
+    sections = read_mps(path)
+    A, lower, upper = mm.matrix
+    lb, ub = mm.bounds
+
+    assert len(sections["ROWS"]) == mm.n_rows + 1
+
+    entries = [line for line in sections["COLUMNS"] if line[1] != "obj"]
+    assert len(entries) == A.nnz
+    for column, row, value in entries[:50]:
+        assert A[int(row[1:]), int(column[1:])] == pytest.approx(float(value))
+
+    objective = {
+        int(column[1:]): float(value)
+        for column, row, value in sections["COLUMNS"]
+        if row == "obj"
+    }
+    empty = np.diff(A.tocsc().indptr) == 0
+    assert objective == pytest.approx(
+        {k: c for k, c in enumerate(mm.cost) if c != 0 or empty[k]}
+    )
+
+    # each column is declared in the COLUMNS section
+    declared = {int(line[0][1:]) for line in sections["COLUMNS"]}
+    assert declared == set(range(mm.n_columns))
+
+    fixed = {int(line[2][1:]) for line in sections["BOUNDS"] if line[0] == "FX"}
+    assert fixed == set(np.flatnonzero(lb == ub))
+
+    # integer columns are given explicit bounds
+    with open(path) as f:
+        mps = f.read()
+    assert mps.count("'INTORG'") == 1
+
+
+def test_read_solution(models, tmpdir):
+    es, mm, model = models
+    path = os.path.join(tmpdir, "model.sol")
+
+    with open(path, "w") as f:
+        f.write("Optimal - objective value 12.5\n")
+        for k in range(mm.n_rows):
+            f.write(f"{k:>7} c{k} {k * 0.5} {k * 0.1}\n")
+        for k in range(mm.n_columns):
+            prefix = "**" if k == 3 else ""
+            f.write(f"{prefix}{k:>7} x{k} {k} 0\n")
+
+    status = mm.read_solution(path)
+
+    assert status.startswith("Optimal")
+    np.testing.assert_allclose(mm.solution, np.arange(mm.n_columns))
+    np.testing.assert_allclose(mm.duals, np.arange(mm.n_rows) * 0.1)
+
+    results = mm.results(duals=True)
+    bus = [n for n in es.nodes if n.label == "electricity"][0]
+    assert len(results[(bus, None)]["sequences"]["duals"]) == N_TIMESTEPS
+
+
+def test_matrix_model_investment_raises():
+    es = create_energysystem()
+    Node.registry = es
+    try:
+        bus = solph.Bus(label="bus")
+        solph.Source(
+            label="source",
+            outputs={bus: solph.Flow(investment=solph.Investment(ep_costs=1))},
+        )
+    finally:
+        Node.registry = None
+
+    with pytest.raises(NotImplementedError):
+        MatrixModel(es)
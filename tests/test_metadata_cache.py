@@ -0,0 +1,94 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from oemof_b3.model import model_structures, foreign_keys_update
+from oemof_b3.tools.metadata_cache import (
+    hash_model_structure,
+    load_json,
+    patch_and_validate_descriptor,
+)
+
+this_path = os.path.realpath(__file__)
+
+path_example_datapackage = os.path.join(
+    os.path.abspath(os.path.join(this_path, os.pardir, os.pardir)),
+    "examples",
+    "example_base",
+    "preprocessed",
+)
+
+
+@pytest.fixture
+def datapackage(tmpdir):
+    path = os.path.join(tmpdir, "preprocessed")
+    shutil.copytree(path_example_datapackage, path)
+    return path
+
+
+def test_hash_model_structure():
+    hashes = {
+        name: hash_model_structure(structure, foreign_keys_update)
+        for name, structure in model_structures.items()
+    }
+
+    assert len(set(hashes.values())) == len(model_structures)
+
+    structure = model_structures["model_structure_full"]
+    assert hashes["model_structure_full"] == hash_model_structure(
+        structure, foreign_keys_update
+    )
+
+
+def test_patch_and_validate_descriptor(datapackage):
+    descriptor = load_json(os.path.join(datapackage, "datapackage.json"))
+
+    patched = patch_and_validate_descriptor(descriptor, datapackage, "new_scenario")
+
+    assert patched["name"] == "new_scenario"
+    assert [r["path"] for r in patched["resources"]] == [
+        r["path"] for r in descriptor["resources"]
+    ]
+
+
+def test_patch_and_validate_descriptor_widens_integer(datapackage):
+    descriptor = load_json(os.path.join(datapackage, "datapackage.json"))
+
+    path = os.path.join(datapackage, "data", "elements", "ch4-gt.csv")
+    elements = pd.read_csv(path)
+    elements["capacity"] = elements["capacity"] + 0.5
+    elements.to_csv(path, index=False)
+
+    patched = patch_and_validate_descriptor(descriptor, datapackage, "new_scenario")
+
+    fields = {
+        f["name"]: f["type"]
+        for r in patched["resources"]
+        if r["name"] == "ch4-gt"
+        for f in r["schema"]["fields"]
+    }
+    assert fields["capacity"] == "number"
+
+
+def test_patch_and_validate_descriptor_diverging_columns(datapackage):
+    descriptor = load_json(os.path.join(datapackage, "datapackage.json"))
+
+    path = os.path.join(datapackage, "data", "elements", "ch4-gt.csv")
+    pd.read_csv(path).drop(columns="capacity_cost").to_csv(path, index=False)
+
+    with pytest.raises(ValueError, match="diverge"):
+        patch_and_validate_descriptor(descriptor, datapackage, "new_scenario")
+
+
+def test_patch_and_validate_descriptor_additional_resource(datapackage):
+    descriptor = load_json(os.path.join(datapackage, "datapackage.json"))
+
+    shutil.copy(
+        os.path.join(datapackage, "data", "elements", "ch4-gt.csv"),
+        os.path.join(datapackage, "data", "elements", "h2-gt.csv"),
+    )
+
+    with pytest.raises(ValueError, match="not in the cached metadata"):
+        patch_and_validate_descriptor(descriptor, datapackage, "new_scenario")
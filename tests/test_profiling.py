@@ -0,0 +1,72 @@
+import json
+import os
+
+import pandas as pd
+
+import oemof.solph as solph
+
+from oemof_b3.tools.equate_flows import equate_flows
+from oemof_b3.tools.profiling import Profiler, count_model_components
+from oemof_b3.tools.set_idle_time import set_idle_time
+
+
+def create_model(n_timesteps=5):
+    timeindex = pd.date_range("1/1/2012", periods=n_timesteps, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="bus", balanced=False)
+    es.add(bus)
+
+    es.add(
+        solph.Source(
+            label="charge",
+            outputs={bus: solph.Flow(nominal_value=1, nonconvex=solph.NonConvex())},
+        ),
+        solph.Source(
+            label="discharge",
+            outputs={bus: solph.Flow(nominal_value=1, nonconvex=solph.NonConvex())},
+        ),
+    )
+
+    model = solph.Model(es)
+
+    f1, f2 = sorted(model.flows, key=lambda f: f[0].label)
+
+    equate_flows(model, [f1], [f2], name="equate_flows_test")
+    set_idle_time(model, f1, f2, 2, formulation="linear")
+
+    return model
+
+
+def test_count_model_components():
+    counts = count_model_components(create_model())
+
+    assert counts["NonConvexFlow"]["variables"] == 2 * 5
+    assert counts["equate_flows_test"] == {"constraints": 5, "variables": 0}
+    assert counts["constraint_idle_time"] == {"constraints": 5, "variables": 0}
+    assert counts["constraint_idle_time_counter"] == {"constraints": 0, "variables": 5}
+    assert counts["flow"] == {"constraints": 0, "variables": 2 * 5}
+
+
+def test_profiler(tmpdir):
+    profiler = Profiler(interval=0.001)
+
+    for _ in range(2):
+        with profiler.phase("model"):
+            model = create_model()
+        profiler.count(model)
+
+    phase = profiler.phases["model"]
+    assert phase["calls"] == 2
+    assert phase["time"] > 0
+    if phase["rss_peak"] is not None:
+        assert phase["rss_peak"] >= phase["rss_start"]
+
+    assert profiler.blocks["equate_flows_test"]["constraints"] == 2 * 5
+    assert profiler.totals["constraints"] == 2 * model.nconstraints()
+
+    path = os.path.join(tmpdir, "profile.json")
+    profiler.save(path)
+
+    with open(path) as f:
+        assert set(json.load(f)) == {"phases", "blocks", "totals"}
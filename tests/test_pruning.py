@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from pyomo import environ as po
+from pyomo.core.base.var import Var
+
+import oemof.solph as solph
+
+from oemof_b3.tools.pruning import prune
+from oemof_b3.tools.results_extraction import results
+
+N_TIMESTEPS = 4
+
+
+def create_energysystem():
+    timeindex = pd.date_range("1/1/2012", periods=N_TIMESTEPS, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    el = solph.Bus(label="electricity")
+    gas = solph.Bus(label="gas")
+    hydrogen = solph.Bus(label="hydrogen")
+    es.add(el, gas, hydrogen)
+
+    es.add(
+        solph.Source(label="gas-import", outputs={gas: solph.Flow(variable_costs=3)}),
+        solph.Transformer(
+            label="gas-turbine",
+            inputs={gas: solph.Flow()},
+            outputs={el: solph.Flow(nominal_value=10)},
+            conversion_factors={el: 0.5},
+        ),
+        # inert: zero capacity, followed by an inert transformer and bus
+        solph.Transformer(
+            label="electrolyser",
+            inputs={el: solph.Flow()},
+            outputs={hydrogen: solph.Flow(nominal_value=0)},
+            conversion_factors={hydrogen: 0.7},
+        ),
+        solph.Sink(label="hydrogen-demand", inputs={hydrogen: solph.Flow()}),
+        solph.GenericStorage(
+            label="battery",
+            inputs={el: solph.Flow(nominal_value=0)},
+            outputs={el: solph.Flow(nominal_value=0)},
+            nominal_storage_capacity=0,
+        ),
+        # fixed flows merged per bus
+        solph.Source(
+            label="pv",
+            outputs={
+                el: solph.Flow(nominal_value=4, fix=[0, 0.5, 1, 0.5], variable_costs=1)
+            },
+        ),
+        solph.Source(
+            label="wind",
+            outputs={
+                el: solph.Flow(nominal_value=2, fix=[1, 0, 0.5, 1], variable_costs=2)
+            },
+        ),
+        # kept: used by constraints
+        solph.Source(
+            label="run-of-river",
+            outputs={
+                el: solph.Flow(
+                    nominal_value=1, fix=[1] * 4, **{"electricity-heat-B": True}
+                )
+            },
+        ),
+        solph.Sink(
+            label="demand",
+            inputs={el: solph.Flow(nominal_value=10, fix=[0.5, 0.6, 0.7, 0.8])},
+        ),
+        solph.Sink(label="curtailment", inputs={el: solph.Flow(variable_costs=1)}),
+    )
+
+    return es
+
+
+def get_labels(nodes):
+    return sorted(node.label for node in nodes)
+
+
+def test_prune():
+    es = create_energysystem()
+    n_flows = len(es.flows())
+
+    pruned, pruning = prune(es)
+
+    assert get_labels(pruning.nodes) == [
+        "battery",
+        "electrolyser",
+        "hydrogen-demand",
+        "pv",
+        "wind",
+    ]
+    assert get_labels(pruning.buses) == ["hydrogen"]
+    assert get_labels(pruned.nodes) == [
+        "curtailment",
+        "demand",
+        "electricity",
+        "electricity-fixed_supply",
+        "gas",
+        "gas-import",
+        "gas-turbine",
+        "run-of-river",
+    ]
+    assert pruning.counts == {
+        "nodes": 5,
+        "buses": 1,
+        "zero_flows": 5,
+        "fixed_flows": 2,
+        "aggregated_nodes": 1,
+    }
+
+    # the pruned flows are detached until the results are restored
+    assert len(pruned.flows()) == n_flows - 7 + 1
+    assert len(es.flows()) == n_flows - 7
+
+    supply = pruned.groups["electricity-fixed_supply"]
+    flow = supply.outputs[pruned.groups["electricity"]]
+    values = [flow.fix[t] * flow.nominal_value for t in range(N_TIMESTEPS)]
+    np.testing.assert_allclose(values, [2, 2, 5, 4])
+
+
+def test_pruned_results_restored():
+    es = create_energysystem()
+    full = solph.Model(es)
+
+    pruned, pruning = prune(es)
+    model = solph.Model(pruned)
+
+    # no solver needed: set the solution of the variables
+    rng = np.random.default_rng(1)
+    for var in model.component_data_objects(Var):
+        if not var.fixed:
+            var.value = rng.random()
+
+    restored = pruning.restore(results(model))
+
+    assert set(restored) == set(es.flows()) | {(es.groups["battery"], None)}
+
+    pv = restored[(es.groups["pv"], es.groups["electricity"])]["sequences"]
+    assert list(pv["flow"]) == [0, 2, 4, 2]
+
+    electrolyser = restored[(es.groups["electrolyser"], es.groups["hydrogen"])]
+    assert not electrolyser["sequences"]["flow"].any()
+
+    # the objective of the full model is the same with the restored results
+    for (i, o, t), var in full.flow.items():
+        var.value = restored[(i, o)]["sequences"]["flow"].iloc[t]
+
+    assert po.value(full.objective) == po.value(model.objective)
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+from pyomo import environ as po
+from pyomo.opt import SolverResults, TerminationCondition
+
+import oemof.solph as solph
+
+from oemof_b3.tools.relax_and_repair import (
+    repair_idle_time,
+    repair_up_down_time,
+    solve_relax_and_repair,
+)
+
+N_TIMESTEPS = 8
+
+# relaxed statuses of the LP relaxation
+RELAXED = {
+    "electrolyser": [0.9, 0.9, 0.6, 0, 0, 0, 0.7, 0],
+    "methanation": [0, 0, 0, 0.8, 0.9, 0.2, 0.4, 0],
+}
+
+
+def create_model():
+    timeindex = pd.date_range("1/1/2012", periods=N_TIMESTEPS, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    h2 = solph.Bus(label="h2")
+    ch4 = solph.Bus(label="ch4")
+    es.add(h2, ch4)
+
+    es.add(
+        solph.Source(
+            label="electrolyser",
+            outputs={
+                h2: solph.Flow(
+                    nominal_value=10,
+                    min=0.2,
+                    variable_costs=1,
+                    nonconvex=solph.NonConvex(minimum_uptime=2),
+                )
+            },
+        ),
+        solph.Transformer(
+            label="methanation",
+            inputs={h2: solph.Flow()},
+            outputs={
+                ch4: solph.Flow(nominal_value=10, min=0.2, nonconvex=solph.NonConvex())
+            },
+        ),
+        solph.Sink(label="excess", inputs={h2: solph.Flow(), ch4: solph.Flow()}),
+    )
+
+    model = solph.Model(es)
+
+    flows = {i.label: (i, o) for i, o in model.NonConvexFlow.NONCONVEX_FLOWS}
+    idle_time = (flows["electrolyser"], flows["methanation"], 1, None)
+
+    return model, idle_time
+
+
+def get_status(model, label):
+    return [
+        var.value
+        for (i, o, t), var in model.NonConvexFlow.status.items()
+        if i.label == label
+    ]
+
+
+def test_repair_up_down_time():
+    status = np.array([1, 0, 0, 1, 1, 0, 1, 0, 0, 0], dtype=float)
+
+    # single timesteps are extended
+    np.testing.assert_array_equal(
+        repair_up_down_time(status, minimum_uptime=2),
+        [1, 1, 0, 1, 1, 0, 1, 1, 0, 0],
+    )
+
+    # short gaps are closed
+    np.testing.assert_array_equal(
+        repair_up_down_time(status, minimum_downtime=2),
+        [1, 0, 0, 1, 1, 1, 1, 0, 0, 0],
+    )
+
+
+def test_repair_idle_time():
+    status_1 = np.array([1, 1, 0, 0, 0, 0], dtype=float)
+    status_2 = np.array([0, 0, 1, 1, 0, 0], dtype=float)
+
+    # flow 2 is switched off where it has the lower relaxed status
+    relaxed_1 = np.array([0.9, 0.9, 0, 0, 0, 0])
+    relaxed_2 = np.array([0, 0, 0.6, 0.6, 0, 0])
+    repaired_1, repaired_2 = repair_idle_time(
+        status_1, status_2, 1, relaxed_1, relaxed_2
+    )
+    np.testing.assert_array_equal(repaired_1, status_1)
+    np.testing.assert_array_equal(repaired_2, [0, 0, 0, 1, 0, 0])
+
+    # flow 1 is switched off where it has the lower relaxed status
+    relaxed_2 = np.array([0, 0, 1, 1, 0, 0])
+    repaired_1, repaired_2 = repair_idle_time(
+        status_1, status_2, 1, relaxed_1, relaxed_2
+    )
+    np.testing.assert_array_equal(repaired_1, [1, 0, 0, 0, 0, 0])
+    np.testing.assert_array_equal(repaired_2, status_2)
+
+    # the status before the first timestep cannot be changed
+    repaired_1, repaired_2 = repair_idle_time(
+        np.zeros(6), status_2, 3, relaxed_1, relaxed_2, initial_status=[0, 1]
+    )
+    np.testing.assert_array_equal(repaired_2, [0, 0, 0, 1, 0, 0])
+
+
+def test_solve_relax_and_repair():
+    model, idle_time = create_model()
+    statuses = model.NonConvexFlow.status
+
+    solved = []
+
+    def solve(model):
+        # set a solution instead of solving: relaxed statuses in the LP relaxation
+        relaxed = not any(var.fixed for var in statuses.values())
+        solved.append(relaxed)
+        if relaxed:
+            assert all(var.is_continuous() for var in statuses.values())
+        for (i, o, t), var in statuses.items():
+            if relaxed:
+                var.value = RELAXED[i.label][t]
+        for var in model.flow.values():
+            var.value = 1 if relaxed else 2
+
+    info = solve_relax_and_repair(model, solve, idle_time=idle_time)
+
+    assert solved == [True, False]
+
+    # the electrolyser runs for its minimum uptime, conflicts with the idle time are resolved
+    # in favour of the higher relaxed status
+    assert get_status(model, "electrolyser") == [1, 1, 0, 0, 0, 0, 1, 1]
+    assert get_status(model, "methanation") == [0, 0, 0, 1, 1, 0, 0, 0]
+    assert info["repaired_statuses"] == 2
+    assert info["nonconvex_flows"] == 2
+    assert info["lower_bound"] < info["objective"]
+    assert not info["milp"]
+
+    # the model is a MILP again
+    assert all(var.is_binary() and not var.fixed for var in statuses.values())
+
+
+def test_solve_relax_and_repair_keeps_fixed_variables():
+    model, idle_time = create_model()
+    statuses = model.NonConvexFlow.status
+
+    # a status fixed before, e.g. by the caller
+    (fixed,) = [
+        var
+        for (i, o, t), var in statuses.items()
+        if i.label == "methanation" and t == 0
+    ]
+    fixed.fix(0)
+
+    def solve(model):
+        relaxed = not any(var.fixed for var in statuses.values() if var is not fixed)
+        for (i, o, t), var in statuses.items():
+            if relaxed and not var.fixed:
+                var.value = RELAXED[i.label][t]
+        for var in model.flow.values():
+            var.value = 1
+
+    solve_relax_and_repair(model, solve, idle_time=idle_time)
+
+    # only the variables fixed by the heuristic are unfixed again
+    assert fixed.fixed and fixed.value == 0
+    assert not any(var.fixed for var in statuses.values() if var is not fixed)
+
+
+def test_solve_relax_and_repair_infeasible():
+    model, idle_time = create_model()
+
+    solved = []
+
+    def solve(model):
+        fixed = any(var.fixed for var in model.NonConvexFlow.status.values())
+        milp = all(var.is_binary() for var in model.NonConvexFlow.status.values())
+        solved.append("milp" if milp else "fixed" if fixed else "relaxed")
+
+        for var in model.component_data_objects(po.Var):
+            if not var.fixed:
+                var.value = 0.5 if not milp else 1
+
+        model.solver_results = SolverResults()
+        model.solver_results.solver.termination_condition = (
+            TerminationCondition.infeasible if fixed else TerminationCondition.optimal
+        )
+
+    info = solve_relax_and_repair(model, solve, idle_time=idle_time)
+
+    # the MILP is solved instead, the bound of the LP relaxation is reported
+    assert solved == ["relaxed", "fixed", "milp"]
+    assert info["milp"]
+    assert model.solver_results.problem.lower_bound == info["lower_bound"]
@@ -0,0 +1,56 @@
+import logging
+import time
+
+import pandas as pd
+import pytest
+
+from oemof.solph import processing
+
+from oemof_b3.tools.results_extraction import results
+
+
+def assert_results_equal(result, expected):
+    assert list(result) == list(expected)
+    for key, value in expected.items():
+        pd.testing.assert_frame_equal(result[key]["sequences"], value["sequences"])
+        pd.testing.assert_series_equal(result[key]["scalars"], value["scalars"])
+
+
+def test_results_equal_processing_results(create_results_model):
+    model = create_results_model()
+
+    result = results(model)
+    assert_results_equal(result, processing.results(model))
+
+    assert "duals" in result[(model.es.groups["electricity"], None)]["sequences"]
+
+
+def test_results_missing_values_equal_processing_results(create_results_model):
+    model = create_results_model()
+    battery = model.es.groups["battery"]
+
+    # missing values are dropped as in processing.results
+    model.GenericStorageBlock.init_content[battery].value = None
+    for var in model.NonConvexFlow.status.values():
+        var.value = None
+
+    assert_results_equal(results(model), processing.results(model))
+
+
+@pytest.mark.benchmark
+def test_benchmark_results(create_results_model):
+    model = create_results_model(n_timesteps=2000, n_sources=20)
+
+    times = {}
+    extracted = {}
+    for method, function in [("processing", processing.results), ("numpy", results)]:
+        start = time.perf_counter()
+        extracted[method] = function(model)
+        times[method] = time.perf_counter() - start
+
+    assert_results_equal(extracted["numpy"], extracted["processing"])
+
+    logging.info(
+        f"Results extraction of {len(model.flows)} flows with 2000 timesteps: "
+        + ", ".join(f"{method}: {t:.3f} s" for method, t in times.items())
+    )
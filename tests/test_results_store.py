@@ -0,0 +1,255 @@
+import gc
+import logging
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from pyomo.core.base.var import Var
+
+import oemof.solph as solph
+from oemof.solph import EnergySystem, processing
+
+from oemof_b3.tools.data_processing import load_json, save_json
+from oemof_b3.tools.profiling import Profiler
+from oemof_b3.tools.results_extraction import iter_results, results
+from oemof_b3.tools.results_store import (
+    ResultsStore,
+    ResultsWriter,
+    restore_energysystem,
+    write_results,
+)
+from oemof_b3.tools.set_idle_time import set_idle_time
+
+
+@pytest.fixture
+def create_energysystem(create_results_model):
+    def _create_energysystem(n_timesteps=5, n_sources=3):
+        model = create_results_model(n_timesteps, n_sources)
+        es = model.es
+
+        es.results = results(model)
+        es.meta_results = {"objective": 3.0, "solver": {"Status": "ok"}}
+        es.params = processing.parameter_as_dict(es)
+
+        return es
+
+    return _create_energysystem
+
+
+def test_results_store_roundtrip(tmpdir, create_energysystem):
+    es = create_energysystem()
+    write_results(es, tmpdir)
+
+    # attributes of the EnergySystem are kept
+    assert es.results is not None
+
+    restored = restore_energysystem(tmpdir)
+    assert restored.meta_results == es.meta_results
+
+    expected = {
+        tuple(None if n is None else n.label for n in key): value
+        for key, value in es.results.items()
+    }
+    assert len(restored.results) == len(expected)
+    for key, value in restored.results.items():
+        labels = tuple(None if n is None else n.label for n in key)
+        pd.testing.assert_frame_equal(
+            value["sequences"], expected[labels]["sequences"], check_names=False
+        )
+        pd.testing.assert_series_equal(
+            value["scalars"], expected[labels]["scalars"], check_names=False
+        )
+
+    # parameters are pickled with the graph
+    assert len(restored.params) == len(es.params)
+
+
+def test_results_store_partial_loading(tmpdir, create_energysystem):
+    es = create_energysystem()
+    write_results(es, tmpdir)
+
+    store = ResultsStore(tmpdir)
+    assert store.meta_results["objective"] == 3.0
+    assert sorted(store.variables) == ["duals", "flow", "status", "storage_content"]
+
+    flows = store.sequences("flow", keys=[("pp-0", "electricity")])
+    assert list(flows.columns) == [("pp-0", "electricity")]
+    np.testing.assert_array_equal(
+        flows[("pp-0", "electricity")].values,
+        es.results[(es.groups["pp-0"], es.groups["electricity"])]["sequences"][
+            "flow"
+        ].values,
+    )
+
+    partial = store.results(keys=[("battery", None)], variables=["storage_content"])
+    assert list(partial) == [("battery", None)]
+    assert list(partial[("battery", None)]["sequences"].columns) == ["storage_content"]
+
+
+def test_results_writer_per_component(tmpdir, create_results_model):
+    model = create_results_model()
+    es = model.es
+    es.meta_results = {"objective": 3.0}
+    es.params = processing.parameter_as_dict(es)
+
+    writer = ResultsWriter(es.timeindex)
+    writer.update(iter_results(model))
+    writer.write(es, tmpdir)
+
+    expected = results(model)
+    assert len(writer) == len(expected)
+
+    restored = ResultsStore(tmpdir).results(nodes=es.nodes)
+    assert set(restored) == set(expected)
+    for key, value in expected.items():
+        pd.testing.assert_frame_equal(
+            restored[key]["sequences"], value["sequences"], check_names=False
+        )
+
+
+def test_results_store_roundtrip_idle_time(tmpdir):
+    timeindex = pd.date_range("1/1/2012", periods=5, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="h2", balanced=False)
+    es.add(bus)
+    es.add(
+        *(
+            solph.Source(
+                label=label,
+                outputs={bus: solph.Flow(nominal_value=1, nonconvex=solph.NonConvex())},
+            )
+            for label in ["charge", "discharge"]
+        )
+    )
+
+    model = solph.Model(es)
+    f1, f2 = sorted(model.NonConvexFlow.NONCONVEX_FLOWS, key=lambda f: f[0].label)
+    set_idle_time(model, f1, f2, 2, formulation="linear")
+    for var in model.component_data_objects(Var):
+        var.value = 0
+
+    es.meta_results = {"objective": 0}
+    es.params = processing.parameter_as_dict(es)
+
+    writer = ResultsWriter(es.timeindex)
+    writer.update(iter_results(model))
+    writer.write(es, tmpdir)
+
+    # the counter of the idle time is a standalone variable, its key consists of strings
+    expected = results(model)
+    key = ("constraint_idle_time_counter", "constraint_idle_time_counter")
+    assert key in expected
+
+    restored = ResultsStore(tmpdir).results(nodes=es.nodes)
+    assert set(restored) == set(expected)
+    pd.testing.assert_frame_equal(
+        restored[key]["sequences"], expected[key]["sequences"], check_names=False
+    )
+
+
+def test_restore_energysystem_dump(tmpdir, create_energysystem):
+    es = create_energysystem()
+    es.dump(str(tmpdir))
+
+    restored = restore_energysystem(tmpdir)
+    assert len(restored.results) == len(es.results)
+
+
+@pytest.mark.benchmark
+def test_benchmark_results_store(tmpdir, create_energysystem):
+    es = create_energysystem(n_timesteps=2000, n_sources=20)
+
+    benchmark = {}
+    for method in ["pickle", "store"]:
+        path = os.path.join(tmpdir, method)
+        os.mkdir(path)
+
+        start = time.perf_counter()
+        if method == "pickle":
+            es.dump(path)
+        else:
+            write_results(es, path)
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if method == "pickle":
+            restored = EnergySystem()
+            restored.restore(path)
+            restored = restored.results
+        else:
+            restored = ResultsStore(path).results()
+        restore_time = time.perf_counter() - start
+
+        assert len(restored) == len(es.results)
+
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        benchmark[method] = (size / 1e6, write_time, restore_time)
+
+    logging.info(
+        "Results of 2000 timesteps (size, write and restore time): "
+        + ", ".join(
+            f"{method}: {size:.2f} MB, {write:.3f} s, {restore:.3f} s"
+            for method, (size, write, restore) in benchmark.items()
+        )
+    )
+
+
+def _save_peak_rss(create_results_model, path, release):
+    model = create_results_model(n_timesteps=8760, n_sources=10)
+    es = model.es
+    es.meta_results = {"objective": 0}
+
+    profiler = Profiler(interval=0.01)
+    if release:
+        with profiler.phase("extract"):
+            writer = ResultsWriter(es.timeindex)
+            writer.update(iter_results(model))
+        model = None
+        gc.collect()
+        with profiler.phase("serialize"):
+            es.params = processing.parameter_as_dict(es)
+            writer.write(es, path)
+    else:
+        with profiler.phase("extract"):
+            es.results = results(model)
+        with profiler.phase("serialize"):
+            es.params = processing.parameter_as_dict(es)
+            write_results(es, path)
+
+    save_json(
+        {name: phase["rss_peak"] for name, phase in profiler.phases.items()},
+        os.path.join(path, "peak_rss.json"),
+    )
+
+
+@pytest.mark.benchmark
+def test_benchmark_release_model_memory(tmpdir, create_results_model):
+    # each variant runs in a fresh process to measure its own peak
+    context = multiprocessing.get_context("spawn")
+
+    peak_rss = {}
+    for release in [False, True]:
+        path = os.path.join(tmpdir, str(release))
+        os.mkdir(path)
+
+        process = context.Process(
+            target=_save_peak_rss, args=(create_results_model, path, release)
+        )
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+
+        peak_rss[release] = load_json(os.path.join(path, "peak_rss.json"))
+
+    logging.info(
+        "Peak RSS of saving results of 8760 timesteps with the model kept / with results "
+        "collected per component and the model released: "
+        + ", ".join(
+            f"{phase} {peak_rss[False][phase]:.0f} / {peak_rss[True][phase]:.0f} MB"
+            for phase in ["extract", "serialize"]
+        )
+    )
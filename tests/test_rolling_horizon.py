@@ -0,0 +1,131 @@
+import pytest
+from pyomo import environ as po
+
+import oemof.solph as solph
+
+from oemof_b3.tools import rolling_horizon
+from oemof_b3.tools.rolling_horizon import (
+    calculate_objective,
+    get_windows,
+    optimize_rolling_horizon,
+    sliced,
+)
+
+N_TIMESTEPS = 10
+
+
+@pytest.fixture
+def meta_results(monkeypatch):
+    def _meta_results(model):
+        return {"objective": po.value(model.objective)}
+
+    monkeypatch.setattr(rolling_horizon.processing, "meta_results", _meta_results)
+
+
+def test_get_windows():
+    assert get_windows(10, 4) == [(0, 4, 4), (4, 8, 8), (8, 10, 10)]
+    assert get_windows(10, 4, 3) == [(0, 4, 7), (4, 8, 10), (8, 10, 10)]
+
+    with pytest.raises(ValueError):
+        get_windows(10, 0)
+
+
+def test_sliced(create_storage_energysystem):
+    es = create_storage_energysystem()
+
+    source = es.groups["source"]
+    storage = es.groups["storage"]
+    flow = list(source.outputs.values())[0]
+    variable_costs = flow.variable_costs
+
+    with sliced(es, 2, 5):
+        assert len(es.timeindex) == 3
+        assert list(flow.variable_costs) == [2, 3, 4]
+        assert len(storage.inflow_conversion_factor) == 3
+        assert len(solph.Model(es).TIMESTEPS) == 3
+
+    assert len(es.timeindex) == N_TIMESTEPS
+    assert flow.variable_costs is variable_costs
+    assert len(storage.inflow_conversion_factor) == N_TIMESTEPS
+
+
+def test_optimize_rolling_horizon(meta_results, create_storage_energysystem):
+    es = create_storage_energysystem()
+    storage = es.groups["storage"]
+
+    calls = []
+
+    def create_model(es, emission_limit, initial_status):
+        calls.append(
+            {
+                "n_timesteps": len(es.timeindex),
+                "initial_storage_level": storage.initial_storage_level,
+                "initial_status": initial_status[("source", "bus")],
+            }
+        )
+        return solph.Model(es)
+
+    def solve(model):
+        # set a solution instead of solving: storage is charged by 1 per timestep
+        for var in model.component_data_objects(po.Var):
+            var.value = 1
+        for (n, t), var in model.GenericStorageBlock.storage_content.items():
+            var.value = t + 1
+
+    results, meta_results = optimize_rolling_horizon(
+        es,
+        create_model,
+        solve,
+        horizon=4,
+        overlap=2,
+        status_flows=[("source", "bus")],
+    )
+
+    assert [call["n_timesteps"] for call in calls] == [6, 6, 2]
+
+    # storage level at the end of the kept timesteps is handed over
+    assert [call["initial_storage_level"] for call in calls] == [0, 0.04, 0.04]
+
+    # status of all previous kept timesteps is handed over
+    assert [len(call["initial_status"]) for call in calls] == [0, 4, 8]
+
+    # results have the shape of a monolithic optimization
+    for key, result in results.items():
+        assert (result["sequences"].index == es.timeindex).all()
+
+    content = results[(storage, None)]["sequences"]["storage_content"]
+    assert list(content) == [1, 2, 3, 4, 1, 2, 3, 4, 1, 2]
+
+    assert meta_results["rolling_horizon"]["windows"] == 3
+    assert meta_results["objective"] == calculate_objective(es, results)
+
+    # attributes are restored
+    assert storage.initial_storage_level is None
+    assert storage.balanced is True
+    assert es.groups["source"].outputs[es.groups["bus"]].nonconvex.initial_status == 0
+
+
+def test_optimize_rolling_horizon_startups(
+    meta_results, create_storage_energysystem, solve_milp
+):
+    def create_energysystem():
+        es = create_storage_energysystem(startup_costs=5)
+        # the source runs in all timesteps at constant costs and starts up once
+        es.groups["source"].outputs[es.groups["bus"]].variable_costs = solph.sequence(1)
+        return es
+
+    reference_objective = solve_milp(solph.Model(create_energysystem()))
+
+    es = create_energysystem()
+    results, meta_results = optimize_rolling_horizon(
+        es,
+        lambda es, emission_limit, initial_status: solph.Model(es),
+        solve_milp,
+        horizon=4,
+        overlap=2,
+    )
+
+    # the status at the end of a window is the initial status of the next window
+    sequences = results[(es.groups["source"], es.groups["bus"])]["sequences"]
+    assert sequences["startup"].sum() == pytest.approx(1)
+    assert meta_results["objective"] == pytest.approx(reference_objective)
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from oemof_b3.tools.scheduler import (
+    estimate_jobs,
+    estimate_model_size,
+    load_history,
+    save_history,
+    schedule,
+    share_threads,
+)
+
+here = os.path.dirname(__file__)
+
+EXAMPLE_BASE = os.path.join(here, "..", "examples", "example_base", "preprocessed")
+
+
+def get_job(scenario, size, memory, expected_time=None):
+    return {
+        "scenario": scenario,
+        "size": size,
+        "memory": memory,
+        "expected_time": size if expected_time is None else expected_time,
+    }
+
+
+def test_estimate_model_size():
+    n_components = sum(
+        len(pd.read_csv(os.path.join(EXAMPLE_BASE, "data", "elements", f_name)))
+        for f_name in os.listdir(os.path.join(EXAMPLE_BASE, "data", "elements"))
+    )
+    n_timesteps = len(
+        pd.read_csv(
+            os.path.join(
+                EXAMPLE_BASE, "data", "sequences", "electricity-demand_profile.csv"
+            )
+        )
+    )
+
+    assert estimate_model_size(EXAMPLE_BASE) == n_components * n_timesteps
+
+
+def test_estimate_jobs(tmpdir):
+    history_path = os.path.join(tmpdir, "history.csv")
+    save_history(
+        [
+            {
+                "scenario": "a",
+                "size": 100,
+                "threads": 4,
+                "memory_budget": 1000,
+                "memory_peak": 800,
+                "wall_time": 50,
+                "returncode": 0,
+            }
+        ],
+        history_path,
+    )
+    jobs = [
+        {"scenario": scenario, "preprocessed": EXAMPLE_BASE} for scenario in ["a", "b"]
+    ]
+    estimate_jobs(jobs, load_history(history_path))
+
+    size = estimate_model_size(EXAMPLE_BASE)
+
+    # recorded memory peak and wall time
+    assert jobs[0]["memory"] == 800
+    assert jobs[0]["expected_time"] == 50
+
+    # estimated from the size
+    assert jobs[1]["memory"] > 300
+    assert jobs[1]["expected_time"] == 0.5 * size
+
+
+def test_share_threads():
+    jobs = [get_job("a", 300, 0), get_job("b", 100, 0)]
+
+    assert share_threads(64, jobs[0], jobs) == 48
+    assert share_threads(16, jobs[1], jobs[1:]) == 16
+    assert share_threads(16, jobs[1], jobs[1:], max_threads=8) == 8
+
+    # each job gets at least one thread
+    assert share_threads(2, get_job("c", 1000, 0), [get_job("c", 1000, 0)] + jobs) == 1
+
+
+def test_schedule():
+    jobs = [
+        get_job("large", 400, 600),
+        get_job("medium", 200, 300),
+        get_job("small", 100, 300),
+        get_job("too_large", 100, 2000, expected_time=1),
+    ]
+
+    lock = threading.Lock()
+    state = {"threads": 0, "memory": 0, "max_threads": 0, "max_memory": 0}
+    started = []
+
+    def run(job, threads):
+        with lock:
+            started.append(job["scenario"])
+            state["threads"] += threads
+            state["memory"] += job["memory"]
+            state["max_threads"] = max(state["max_threads"], state["threads"])
+            state["max_memory"] = max(state["max_memory"], state["memory"])
+        time.sleep(job["size"] / 2000)
+        with lock:
+            state["threads"] -= threads
+            state["memory"] -= job["memory"]
+        return 1 if job["scenario"] == "small" else 0
+
+    records = schedule(jobs, run, threads=8, memory_mb=1000)
+
+    # the longest job is started first, budgets are kept, except for the job that exceeds the
+    # memory, which runs alone
+    assert started[0] == "large"
+    assert started[-1] == "too_large"
+    assert state["max_threads"] <= 8
+    assert state["max_memory"] == 2000
+
+    records = {record["scenario"]: record for record in records}
+    assert records["large"]["threads"] == 5
+    assert records["medium"]["threads"] == 3
+    assert records["small"]["returncode"] == 1
+    assert records["too_large"]["threads"] == 8
+    assert all(record["wall_time"] > 0 for record in records.values())
+
+
+def test_schedule_stale_profile(tmpdir):
+    def write_profile(scenario, rss_peak):
+        with open(os.path.join(tmpdir, f"{scenario}_profile.json"), "w") as f:
+            json.dump(
+                {"phases": {"solve": {"rss_peak": rss_peak, "children_rss_peak": 0}}}, f
+            )
+
+    jobs = [get_job("profiled", 100, 300), get_job("not_profiled", 100, 300)]
+    for job in jobs:
+        job["profile"] = os.path.join(tmpdir, f"{job['scenario']}_profile.json")
+        write_profile(job["scenario"], 100)
+        # profile of an earlier optimization
+        os.utime(job["profile"], (time.time() - 60, time.time() - 60))
+
+    def run(job, threads):
+        if job["scenario"] == "profiled":
+            write_profile(job["scenario"], 200)
+        return 0
+
+    records = schedule(jobs, run, threads=2, memory_mb=1000)
+
+    records = {record["scenario"]: record for record in records}
+    assert records["profiled"]["memory_peak"] == 200
+    assert records["not_profiled"]["memory_peak"] is None
@@ -0,0 +1,97 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+import oemof.solph as solph
+
+from oemof_b3.tools.set_idle_time import set_idle_time
+
+
+def create_model(n_timesteps):
+    timeindex = pd.date_range("1/1/2012", periods=n_timesteps, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="bus", balanced=False)
+    es.add(bus)
+
+    es.add(
+        solph.Source(
+            label="charge",
+            outputs={bus: solph.Flow(nominal_value=1, nonconvex=solph.NonConvex())},
+        ),
+        solph.Source(
+            label="discharge",
+            outputs={bus: solph.Flow(nominal_value=1, nonconvex=solph.NonConvex())},
+        ),
+    )
+
+    model = solph.Model(es)
+
+    f1 = [f for f in model.flows if f[0].label == "charge"][0]
+    f2 = [f for f in model.flows if f[0].label == "discharge"][0]
+
+    return model, f1, f2
+
+
+def is_feasible(constraint):
+    for index in constraint:
+        data = constraint[index]
+        value = data.body()
+        if data.lower is not None and value < data.lower - 1e-9:
+            return False
+        if data.upper is not None and value > data.upper + 1e-9:
+            return False
+    return True
+
+
+@pytest.mark.parametrize("n", [1, 2])
+@pytest.mark.parametrize("initial_status", [None, [1, 0], [0, 1]])
+def test_set_idle_time_linear_is_exact(n, initial_status):
+    n_timesteps = 5
+
+    bilinear, f1, f2 = create_model(n_timesteps)
+    set_idle_time(bilinear, f1, f2, n, initial_status=initial_status)
+
+    linear, g1, g2 = create_model(n_timesteps)
+    set_idle_time(
+        linear, g1, g2, n, formulation="linear", initial_status=initial_status
+    )
+
+    previous = list(initial_status or [])
+
+    # each timestep has at most four terms in the linear formulation
+    for ts in linear.TIMESTEPS:
+        assert len(list(linear.constraint_idle_time_window[ts].body.args)) <= 4
+
+    # compare feasibility of all combinations of status of both flows
+    for status in itertools.product([0, 1], repeat=2 * n_timesteps):
+        status_1, status_2 = status[:n_timesteps], status[n_timesteps:]
+
+        for model, (fi1, fo1), (fi2, fo2) in [
+            (bilinear, f1, f2),
+            (linear, g1, g2),
+        ]:
+            for ts in model.TIMESTEPS:
+                model.NonConvexFlow.status[fi1, fo1, ts].value = status_1[ts]
+                model.NonConvexFlow.status[fi2, fo2, ts].value = status_2[ts]
+
+        # the counter is determined by the status of f1 including previous timesteps
+        history = previous + list(status_1)
+        for ts in linear.TIMESTEPS:
+            t = ts + len(previous)
+            linear.constraint_idle_time_counter[ts].value = sum(
+                history[max(0, t - n) : t + 1]
+            )
+
+        assert is_feasible(linear.constraint_idle_time_window)
+        assert is_feasible(linear.constraint_idle_time) == is_feasible(
+            bilinear.constraint_idle_time
+        )
+
+
+def test_set_idle_time_invalid_formulation():
+    model, f1, f2 = create_model(3)
+
+    with pytest.raises(ValueError):
+        set_idle_time(model, f1, f2, 1, formulation="quadratic")
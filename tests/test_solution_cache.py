@@ -0,0 +1,134 @@
+import os
+import time
+
+import pandas as pd
+
+import oemof.solph as solph
+from oemof.solph import processing
+
+from oemof_b3.tools.matrix_model import MatrixModel
+from oemof_b3.tools.solution_cache import SolutionCache, hash_model
+
+
+def create_energysystem(demand=1, n_timesteps=3):
+    timeindex = pd.date_range("1/1/2012", periods=n_timesteps, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="heat")
+    es.add(bus)
+
+    es.add(
+        solph.Source(
+            label="gas-boiler",
+            outputs={bus: solph.Flow(variable_costs=1, emission_factor=0.2)},
+        ),
+        solph.Sink(
+            label="heat-demand",
+            inputs={bus: solph.Flow(nominal_value=demand, fix=[1] * n_timesteps)},
+        ),
+    )
+
+    return es
+
+
+def solved_model():
+    model = solph.Model(create_energysystem())
+
+    # no solver needed: set the solution of the variables
+    for var in model.flow.values():
+        var.value = 1
+
+    return model
+
+
+def test_hash_model_pyomo():
+    key = hash_model(solph.Model(create_energysystem()), "cbc")
+
+    # canonical: independent of the model instance and options without effect
+    assert key == hash_model(
+        solph.Model(create_energysystem()), "cbc", solve_kwargs={"tee": True}
+    )
+
+    # coefficients and solver options change the hash
+    assert key != hash_model(solph.Model(create_energysystem(demand=2)), "cbc")
+    assert key != hash_model(
+        solph.Model(create_energysystem()),
+        "cbc",
+        cmdline_options={"AllowableGap": 0.01},
+    )
+    assert key != hash_model(solph.Model(create_energysystem()), "gurobi")
+
+    # results with duals differ from those without
+    assert key != hash_model(
+        solph.Model(create_energysystem()), "cbc", receive_duals=True
+    )
+
+
+def test_hash_model_matrix():
+    key = hash_model(MatrixModel(create_energysystem()), "cbc")
+
+    assert key == hash_model(MatrixModel(create_energysystem()), "cbc")
+    assert key != hash_model(MatrixModel(create_energysystem(demand=2)), "cbc")
+    assert key != hash_model(solph.Model(create_energysystem()), "cbc")
+
+
+def test_solution_cache_roundtrip(tmpdir):
+    model = solved_model()
+    results = processing.results(model)
+
+    cache = SolutionCache(os.path.join(tmpdir, "cache"))
+    assert cache.get("key", model.es) is None
+
+    cache.put("key", results, {"objective": 3})
+
+    # results are mapped to the nodes of another EnergySystem with the same labels
+    es = create_energysystem()
+    cached_results, meta_results = cache.get("key", es)
+
+    assert meta_results == {"objective": 3}
+
+    nodes = {node.label: node for node in es.nodes}
+    flow = (nodes["gas-boiler"], nodes["heat"])
+    assert flow in cached_results
+    assert cached_results[flow]["sequences"].equals(
+        results[(model.es.groups["gas-boiler"], model.es.groups["heat"])]["sequences"]
+    )
+
+
+def test_solution_cache_stream(tmpdir):
+    model = solved_model()
+    results = processing.results(model)
+
+    cache = SolutionCache(str(tmpdir))
+
+    # the entry is written once all results are consumed
+    stream = cache.stream("key", iter(results.items()), {"objective": 3})
+    next(stream)
+    assert cache.entries() == []
+
+    streamed = list(stream)
+    assert len(streamed) == len(results) - 1
+    assert len(cache.entries()) == 1
+
+    cached_results, _ = cache.get("key", model.es)
+    assert set(cached_results) == set(results)
+
+
+def test_solution_cache_lru_eviction(tmpdir):
+    results = processing.results(solved_model())
+
+    cache = SolutionCache(str(tmpdir))
+    cache.put("a", results, {})
+    size = cache.entries()[0][1]
+
+    cache.max_size = int(2.5 * size)
+    cache.put("b", results, {})
+
+    # mark 'a' as used most recently
+    time.sleep(0.01)
+    assert cache.get("a", create_energysystem()) is not None
+
+    cache.put("c", results, {})
+
+    names = [os.path.basename(path) for path, _, _ in cache.entries()]
+    assert names == ["a.pkl", "c.pkl"]
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from oemof_b3.tools.solver_log import (
+    aggregate_telemetry,
+    load_telemetry,
+    read_cbc_log,
+    save_telemetry,
+)
+
+this_path = os.path.realpath(__file__)
+
+path_logs = os.path.join(os.path.dirname(this_path), "_files", "solver_logs")
+
+
+def test_read_cbc_log_mip():
+    telemetry = read_cbc_log(os.path.join(path_logs, "cbc_mip.log"))
+
+    assert telemetry["version"] == "2.10.5"
+    assert telemetry["status"] == "Optimal solution found (within gap tolerance)"
+    assert telemetry["allowable_gap"] == 0.01
+    assert telemetry["objective"] == 3834210000
+    assert telemetry["gap"] == 0.01
+    assert telemetry["nodes"] == 236
+    assert telemetry["iterations"] == 11532
+    assert telemetry["time_wallclock"] == 7.18
+    assert telemetry["n_integer"] == 96
+
+    assert telemetry["presolve"] == {
+        "rows": 2204,
+        "rows_removed": 6571,
+        "columns": 2915,
+        "columns_removed": 5836,
+        "elements": 8121,
+        "elements_removed": 15413,
+    }
+    assert telemetry["lp_relaxation"] == {"objective": 3.79845e09, "time": 0.21}
+
+    assert telemetry["n_solutions"] == 3
+    assert telemetry["time_first_solution"] == 0.45
+
+    trajectory = telemetry["trajectory"]
+    assert [point["time"] for point in trajectory] == [
+        0.45,
+        0.93,
+        1.52,
+        3.71,
+        5.02,
+        6.45,
+        7.12,
+    ]
+    # the gap closes over time
+    gaps = [point["gap"] for point in trajectory]
+    assert gaps == sorted(gaps, reverse=True)
+    # the first solution is found before the cuts at the root node
+    assert gaps[0] == pytest.approx((3.96201e09 - 3.79845e09) / 3.96201e09)
+    assert gaps[-1] == pytest.approx((3834210000 - 3809010000) / 3834210000)
+
+
+def test_read_cbc_log_lp():
+    telemetry = read_cbc_log(os.path.join(path_logs, "cbc_lp.log"))
+
+    assert telemetry["status"] == "Optimal solution found"
+    assert telemetry["objective"] == 1712240000
+    assert telemetry["nodes"] == 0
+    assert telemetry["lp_relaxation"] == {"objective": 1712240000, "time": 0.312}
+    assert telemetry["presolve"]["rows_removed"] == 2105
+    assert telemetry["lower_bound"] is None
+    assert telemetry["trajectory"] == []
+
+
+def test_aggregate_telemetry(tmpdir):
+    path = os.path.join(tmpdir, "telemetry.json")
+    save_telemetry(read_cbc_log(os.path.join(path_logs, "cbc_mip.log")), path)
+
+    telemetries = {
+        "mip": load_telemetry(path),
+        "lp": read_cbc_log(os.path.join(path_logs, "cbc_lp.log")),
+    }
+    summary, trajectories = aggregate_telemetry(telemetries)
+
+    assert list(summary.index) == ["mip", "lp"]
+    assert summary.loc["mip", "presolve_rows_removed"] == 6571
+    assert summary.loc["lp", "lp_relaxation_time"] == 0.312
+    assert "trajectory" not in summary.columns
+
+    assert set(trajectories["scenario"]) == {"mip"}
+    assert len(trajectories) == 7
@@ -0,0 +1,157 @@
+import logging
+import os
+import re
+import shutil
+
+import pandas as pd
+import pytest
+
+from oemof_b3.tools.delta_datapackage import write_delta
+from oemof_b3.tools.equate_flows import build_flow_keyword_index, equate_flows
+from oemof_b3.tools.solver_log import is_infeasible
+from oemof_b3.tools.sweep import (
+    EMISSION_LIMIT_CONSTRAINT,
+    SweepSolver,
+    add_mutable_emission_limit,
+    add_mutable_factor,
+    datapackages_equal,
+    update_emission_limit,
+    update_factors,
+)
+
+this_path = os.path.realpath(__file__)
+
+path_example = os.path.join(
+    os.path.abspath(os.path.join(this_path, os.pardir, os.pardir)),
+    "examples",
+    "example_base",
+    "preprocessed",
+)
+
+
+def read_lp(model, tmpdir):
+    path = os.path.join(tmpdir, "model.lp")
+    model.write(path, io_options={"symbolic_solver_labels": True})
+
+    with open(path) as f:
+        return f.read()
+
+
+def add_mutable_relation(model):
+    index = build_flow_keyword_index(model)
+    factor = add_mutable_factor(model, "equate_flows", 2)
+    equate_flows(model, index["gas-heat-B"], index["electricity-heat-B"], factor)
+
+
+def test_datapackages_equal(tmpdir):
+    base = os.path.join(tmpdir, "base", "preprocessed")
+    scenario = os.path.join(tmpdir, "scenario", "preprocessed")
+
+    shutil.copytree(path_example, base)
+    shutil.copytree(path_example, scenario)
+
+    assert datapackages_equal(base, scenario)
+
+    # delta datapackages are compared by their data
+    write_delta(scenario, base)
+    assert datapackages_equal(base, scenario)
+    assert datapackages_equal(scenario, base)
+
+    path = os.path.join(base, "data", "elements", "ch4-gt.csv")
+    elements = pd.read_csv(path)
+    elements.iloc[[0]].to_csv(path, index=False)
+    assert not datapackages_equal(base, path_example)
+
+
+def test_mutable_emission_limit(tmpdir, create_heat_model):
+    model = create_heat_model()
+    add_mutable_emission_limit(model, 10)
+
+    assert re.search(r"<= 10\n", read_lp(model, tmpdir))
+
+    changed = update_emission_limit(model, 5)
+    assert changed == [getattr(model, EMISSION_LIMIT_CONSTRAINT)]
+    assert re.search(r"<= 5\n", read_lp(model, tmpdir))
+
+    # no emission limit: constraint is not written
+    update_emission_limit(model, None)
+    assert "integral_limit_emission_factor_constraint" not in read_lp(model, tmpdir)
+
+    update_emission_limit(model, 7)
+    assert re.search(r"<= 7\n", read_lp(model, tmpdir))
+
+
+def test_mutable_factor(tmpdir, create_heat_model):
+    model = create_heat_model()
+    add_mutable_relation(model)
+
+    assert "+2 flow(gas_boiler_heat_0)" in read_lp(model, tmpdir)
+
+    assert update_factors(model, {"equate_flows": 2}) == []
+    assert update_factors(model, {"equate_flows": 3}) == [model.equate_flows]
+
+    lp = read_lp(model, tmpdir)
+    assert "+3 flow(gas_boiler_heat_0)" in lp
+    assert "+2 flow(gas_boiler_heat_0)" not in lp
+
+
+def test_mutable_factor_without_flows(create_heat_model):
+    model = create_heat_model()
+    add_mutable_relation(model)
+
+    # relation without flows, e.g. all flows pruned: no constraint is created
+    factor = add_mutable_factor(model, "equate_flows_pruned", 2)
+    equate_flows(model, [], [], factor, name="equate_flows_pruned")
+    assert not hasattr(model, "equate_flows_pruned")
+
+    changed = update_factors(model, {"equate_flows": 3, "equate_flows_pruned": 3})
+    assert changed == [model.equate_flows]
+
+
+def test_mutable_factor_matrix_raises(create_heat_model):
+    model = create_heat_model()
+    index = build_flow_keyword_index(model)
+    factor = add_mutable_factor(model, "equate_flows", 2)
+
+    with pytest.raises(ValueError):
+        equate_flows(
+            model,
+            index["gas-heat-B"],
+            index["electricity-heat-B"],
+            factor,
+            matrix=True,
+        )
+
+
+def test_sweep_solver_update_not_persistent(create_heat_model):
+    model = create_heat_model()
+    add_mutable_relation(model)
+
+    sweep_solver = SweepSolver(model, "cbc", cmdline_options={"AllowableGap": 0.01})
+
+    assert not sweep_solver.persistent
+    assert sweep_solver.opt.options["AllowableGap"] == 0.01
+
+    # nothing to update for solvers that are passed the model on every solve
+    sweep_solver.update(update_factors(model, {"equate_flows": 3}))
+
+
+def test_sweep_solver_infeasible(caplog, create_heat_model):
+    model = create_heat_model()
+
+    class InfeasibleSolver:
+        def warm_start_capable(self):
+            return False
+
+        def solve(self, model, **kwargs):
+            return {"Solver": [{"Termination condition": "infeasible"}]}
+
+    sweep_solver = SweepSolver(model, "cbc")
+    sweep_solver.opt = InfeasibleSolver()
+
+    with caplog.at_level(logging.WARNING):
+        sweep_solver.solve()
+
+    # results of the scenario are not saved by optimize_sweep
+    assert is_infeasible(model)
+    assert "infeasible" in caplog.text
@@ -0,0 +1,166 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from oemof_b3.tools.timeseries_aggregation import (
+    aggregate_sequences,
+    disaggregate,
+    get_period_length,
+    load_mapping,
+    load_resampling_factor,
+    load_weights,
+    resample_sequences,
+    rescale,
+    save_aggregation,
+)
+from oemof_b3.tools.data_processing import save_json
+
+timeindex = pd.date_range("2019-01-01", periods=8760, freq="H", name="timeindex")
+
+steps = np.arange(8760)
+
+sequences = {
+    "solar-pv_profile": pd.DataFrame(
+        {
+            "BB-solar-pv-profile": np.maximum(np.sin(steps / 24 * 2 * np.pi), 0),
+            "B-solar-pv-profile": np.maximum(np.sin(steps / 24 * 2 * np.pi), 0) * 0.9,
+        },
+        index=timeindex,
+    ),
+    "electricity-demand_profile": pd.DataFrame(
+        {"BB-electricity-demand-profile": 1 + np.cos(steps / 8760 * 2 * np.pi)},
+        index=timeindex,
+    ),
+}
+
+
+def test_get_period_length():
+    assert get_period_length(timeindex, "D") == 24
+    assert get_period_length(timeindex, "W") == 168
+
+    with pytest.raises(ValueError):
+        get_period_length(timeindex, "30min")
+
+
+@pytest.mark.parametrize("method", ["hierarchical", "k_medoids"])
+def test_aggregate_sequences(method):
+    reduced, weights, mapping, error = aggregate_sequences(
+        sequences, n_periods=12, period="D", method=method
+    )
+
+    assert len(weights) == 12 * 24
+    assert weights.sum() == len(timeindex)
+    assert list(reduced) == list(sequences)
+
+    for name, data in sequences.items():
+        assert list(reduced[name].columns) == list(data.columns)
+
+        # weighted sum is kept
+        np.testing.assert_allclose(
+            reduced[name].mul(weights, axis=0).sum(), data.sum(), rtol=1e-6
+        )
+
+    assert (mapping.index == timeindex).all()
+    assert mapping.isin(weights.index).all()
+
+    assert list(error.columns) == ["rmse", "energy_deviation"]
+    assert len(error) == 3
+
+
+def test_rescale():
+    values = np.array([[1.0, 1.0], [0.5, 1.0], [0.0, 1.0]])
+    weights = np.array([1.0, 2.0, 1.0])
+    upper = np.array([1.0, 1.0])
+
+    # the first column is clipped at its upper bound, the rest makes up for it
+    rescaled = rescale(values, weights, np.array([3.0, 6.0]), upper)
+
+    np.testing.assert_allclose((rescaled * weights[:, None]).sum(axis=0)[0], 3)
+    assert rescaled[0, 0] == 1
+    np.testing.assert_allclose(rescaled[1, 0], 1)
+
+    # the target of the second column cannot be reached within the upper bound
+    np.testing.assert_array_equal(rescaled[:, 1], [1, 1, 1])
+
+
+def test_aggregate_sequences_incomplete_period():
+    reduced, weights, mapping, error = aggregate_sequences(
+        sequences, n_periods=4, period="W", method="k_medoids"
+    )
+
+    # 52 full weeks and one incomplete week of 24 timesteps
+    assert len(weights) == 4 * 168 + 24
+    assert weights.sum() == len(timeindex)
+    assert (weights.iloc[-24:] == 1).all()
+
+
+def test_aggregate_sequences_too_many_periods():
+    with pytest.raises(ValueError):
+        aggregate_sequences(sequences, n_periods=400, period="D")
+
+
+def test_disaggregate():
+    reduced, weights, mapping, error = aggregate_sequences(
+        sequences, n_periods=12, period="D"
+    )
+
+    disaggregated = disaggregate(reduced["solar-pv_profile"], mapping)
+
+    assert (disaggregated.index == timeindex).all()
+    assert disaggregated.notna().all().all()
+
+
+def test_save_and_load_aggregation(tmpdir):
+    reduced, weights, mapping, error = aggregate_sequences(
+        sequences, n_periods=12, period="D"
+    )
+
+    assert load_weights(tmpdir) is None
+    assert load_mapping(tmpdir) is None
+
+    save_aggregation(tmpdir, weights, mapping, error)
+
+    np.testing.assert_array_equal(load_weights(tmpdir).values, weights.values)
+    assert (load_mapping(tmpdir).values == mapping.values).all()
+
+
+def test_resample_sequences():
+    absolute = pd.DataFrame({"BB-h2-demand-amount": np.ones(8760)}, index=timeindex)
+
+    resampled, factor = resample_sequences(dict(sequences, absolute=absolute), "3H")
+
+    assert factor == 3
+    assert len(resampled["solar-pv_profile"]) == 8760 / 3
+    assert resampled["solar-pv_profile"].index.freqstr == "3H"
+
+    # all sequences are averaged, power times timeincrement keeps the energy
+    np.testing.assert_allclose(
+        resampled["solar-pv_profile"].sum() * 3, sequences["solar-pv_profile"].sum()
+    )
+    assert (resampled["absolute"] == 1).all().all()
+    assert resampled["absolute"].sum().sum() * factor == absolute.sum().sum()
+
+
+def test_resample_sequences_same_freq():
+    resampled, factor = resample_sequences(sequences, "H")
+
+    assert factor == 1
+    assert resampled["solar-pv_profile"] is sequences["solar-pv_profile"]
+
+
+def test_resample_sequences_incomplete_timestep():
+    with pytest.raises(ValueError):
+        resample_sequences(sequences, "7H")
+
+
+def test_load_resampling_factor(tmpdir):
+    save_json({"name": "scenario"}, os.path.join(tmpdir, "datapackage.json"))
+    assert load_resampling_factor(tmpdir) == 1
+
+    save_json(
+        {"name": "scenario", "resampling": {"freq": "3H", "factor": 3}},
+        os.path.join(tmpdir, "datapackage.json"),
+    )
+    assert load_resampling_factor(tmpdir) == 3
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from pyomo.core.base.var import Var
+
+import oemof.solph as solph
+from oemof.solph import processing
+
+from oemof_b3.tools.results_extraction import results
+from oemof_b3.tools.results_store import write_results
+from oemof_b3.tools.warm_start import (
+    compare_time_first_solution,
+    load_reference,
+    set_warm_start,
+)
+
+N_TIMESTEPS = 5
+
+
+def create_model(methanation=False):
+    timeindex = pd.date_range("1/1/2012", periods=N_TIMESTEPS, freq="H")
+    es = solph.EnergySystem(timeindex=timeindex)
+
+    bus = solph.Bus(label="electricity")
+    es.add(bus)
+
+    es.add(
+        solph.Source(
+            label="pp",
+            outputs={bus: solph.Flow(nominal_value=10, variable_costs=1)},
+        ),
+        solph.Source(
+            label="pp-nonconvex",
+            outputs={
+                bus: solph.Flow(nominal_value=10, min=0.2, nonconvex=solph.NonConvex())
+            },
+        ),
+        solph.GenericStorage(
+            label="battery",
+            inputs={bus: solph.Flow()},
+            outputs={bus: solph.Flow()},
+            nominal_storage_capacity=10,
+        ),
+        solph.Sink(
+            label="demand",
+            inputs={bus: solph.Flow(nominal_value=5, fix=[1] * N_TIMESTEPS)},
+        ),
+    )
+
+    if methanation:
+        es.add(solph.Sink(label="methanation", inputs={bus: solph.Flow()}))
+
+    return solph.Model(es)
+
+
+def solve(model):
+    # set a solution instead of solving
+    rng = np.random.default_rng(1)
+    for var in model.component_data_objects(Var):
+        if not var.fixed:
+            var.value = rng.integers(0, 2) if var.is_binary() else rng.random() * 12
+
+
+def save_reference(path):
+    model = create_model()
+    solve(model)
+
+    es = model.es
+    es.results = results(model)
+    es.meta_results = {"objective": 0}
+    es.params = processing.parameter_as_dict(es)
+
+    write_results(es, path)
+    es.dump(str(path))
+
+    return model
+
+
+def get_variables(model):
+    return {
+        var.name: var
+        for var in model.component_data_objects(Var)
+        if var.name.startswith(
+            ("flow", "NonConvexFlow.status", "GenericStorageBlock.storage_content")
+        )
+    }
+
+
+def test_set_warm_start(tmpdir):
+    reference = save_reference(tmpdir)
+    expected = {name: var.value for name, var in get_variables(reference).items()}
+
+    # the scenario has a further component
+    model = create_model(methanation=True)
+    n_set, n_variables = set_warm_start(model, load_reference(tmpdir))
+
+    variables = get_variables(model)
+    assert n_variables == len(variables) == len(expected) + N_TIMESTEPS
+
+    # the values of fixed flows (demand) are not set
+    assert n_set == len(expected) - N_TIMESTEPS
+
+    for name, var in variables.items():
+        if "methanation" in name or var.fixed:
+            assert var.value is None or var.fixed
+        elif var.ub is not None and expected[name] > var.ub:
+            # values are clipped to the bounds
+            assert var.value == var.ub
+        else:
+            assert var.value == expected[name]
+
+
+def test_load_reference_es_dump(tmpdir):
+    save_reference(tmpdir)
+
+    store = load_reference(tmpdir)
+    (tmpdir / "results.json").remove()
+    dump = load_reference(tmpdir)
+
+    assert set(store) == set(dump) == {"flow", "status", "storage_content"}
+    for name in store:
+        pd.testing.assert_frame_equal(
+            store[name].sort_index(axis=1),
+            dump[name].sort_index(axis=1),
+            check_names=False,
+            check_freq=False,
+        )
+
+
+def test_compare_time_first_solution():
+    comparison = compare_time_first_solution(
+        {"time_first_solution": 2.0},
+        cold_telemetry={"time_first_solution": 4.0},
+        reference_telemetry={"time_first_solution": 8.0},
+    )
+    assert comparison == {
+        "time_first_solution": 2.0,
+        "baseline": "cold",
+        "baseline_time_first_solution": 4.0,
+        "reduction": 0.5,
+    }
+
+    # the reference scenario is only used as proxy without a cold start of the scenario
+    comparison = compare_time_first_solution(
+        {"time_first_solution": 2.0}, reference_telemetry={"time_first_solution": 8.0}
+    )
+    assert comparison["baseline"] == "reference_scenario"
+    assert comparison["reduction"] == 0.75
+
+    comparison = compare_time_first_solution({"time_first_solution": 2.0})
+    assert comparison["baseline"] is None
+    assert comparison["reduction"] is None